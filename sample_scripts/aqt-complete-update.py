@@ -49,6 +49,7 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
 
 log = None
 
@@ -109,6 +110,8 @@ def parseargv(argv):
         help="Path where license accept information has been stored (default: lic).",
     )
 
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -127,7 +130,13 @@ def parseargv(argv):
     print("License accept path: %s" % options.licPath)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.credentials_file, options.licPath, options.verbose)
+    return (
+        lparAccess,
+        options.credentials_file,
+        options.licPath,
+        options.verbose,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -141,7 +150,7 @@ def main(argv):
     print()
     print("***********************************************************")
     try:
-        lparAccess, credentials_file, licPath, verbose = parseargv(argv)
+        lparAccess, credentials_file, licPath, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -156,7 +165,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -185,7 +194,7 @@ def main(argv):
         # After startup, it takes a bit until we reach
         # the UPDATE_CLUSTER_WAIT_CREDENTIALS state. During this time, complete_update would fail
         # Therefore, loop and wait until we reach this state.
-        status = ssc.wait_until_update_credentials(lparAccess, 100, 15)
+        status = ssc.wait_until_update_credentials(lparAccess)
         log.debug(status)
 
         _, json, _ = ssc.complete_update(credentials_file)
@@ -198,10 +207,10 @@ def main(argv):
         print()
         print("Complete update triggered (please wait)")
 
-        status = ssc.wait_until_accelerator_is_starting(lparAccess, 160, 15)
+        status = ssc.wait_until_accelerator_is_starting(lparAccess)
         log.debug(status)
 
-        status = ssc.wait_until_server_is_operational(lparAccess, 120, 15)
+        status = ssc.wait_until_server_is_operational(lparAccess)
         log.debug(status)
 
     except Exception as e:
@@ -48,6 +48,8 @@ import argparse
 import time
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import FcpTopologyIndex
+from lib.aqtSSC import add_api_arguments, api_options
 
 
 log = None
@@ -91,11 +93,12 @@ def parseargv(argv):
         help="Password of the Appliance user",
     )
     parser.add_argument(
-        "deviceid",
+        "deviceids",
         metavar="DEVICE_ID",
         action="store",
         type=str,
-        help="FCP device bus ID (e.g. 0.0.9100)",
+        nargs="+",
+        help="FCP device bus ID (e.g. 0.0.9100), several devices are listed in parallel",
     )
 
     parser.add_argument(
@@ -106,6 +109,8 @@ def parseargv(argv):
         default="lic",
         help="Path where license accept information has been stored (default: lic).",
     )
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -119,11 +124,17 @@ def parseargv(argv):
 
     print("IP address or FQDN of SSC LPAR: ", options.lparip)
     print("Name of Appliance user: ", options.lparusername)
-    print("FCP device bus ID: ", options.deviceid)
+    print("FCP device bus IDs: ", ", ".join(options.deviceids))
     print("License accept path: %s" % options.licPath)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.deviceid, options.verbose)
+    return (
+        lparAccess,
+        options.licPath,
+        options.deviceids,
+        options.verbose,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -137,7 +148,7 @@ def main(argv):
     print()
     print("***********************************************************")
     try:
-        lparAccess, licPath, device_id, verbose = parseargv(argv)
+        lparAccess, licPath, device_ids, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -152,7 +163,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -160,16 +171,21 @@ def main(argv):
 
         ssc.accept_license(lparAccess, licPath, appliance_version)
 
-        print()
-        print("Disk IDs")
-        print("------------------------------------")
-        resultCode, json, _ = ssc.get_fcp_disks(device_id)
-        log.debug(resultCode)
-        log.debug(json)
-        for instance in json["instances"]:
-            print((instance["id"]))
-        print("------------------------------------")
-        print("Total disks: ", len(json["instances"]))
+        # the index of the API only holds the free disks, list all of them
+        topology = FcpTopologyIndex(ssc.iter_fcp_disks, include_all=True)
+        topology.refresh(device_ids)
+
+        for device_id in device_ids:
+            print()
+            print("Disk IDs of FCP device %s" % topology.device_id(device_id))
+            print("------------------------------------")
+            total = 0
+            for disk in topology.disks(device_id):
+                log.debug(disk)
+                print((disk["id"]))
+                total += 1
+            print("------------------------------------")
+            print("Total disks: ", total)
 
     except Exception as e:
         log.critical(e)
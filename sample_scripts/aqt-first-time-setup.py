@@ -50,6 +50,8 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import RetryableError, DeadlineExceeded
+from lib.aqtSSC import add_api_arguments, api_options
 
 log = None
 
@@ -120,6 +122,8 @@ def parseargv(argv):
         default="lic",
         help="Path where license accept information has been stored (default: lic).",
     )
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -149,6 +153,7 @@ def parseargv(argv):
         options.licPath,
         options.verbose,
         options.lparip,
+        api_options(options),
     )
 
 
@@ -171,6 +176,7 @@ def main(argv):
             licPath,
             verbose,
             lparip,
+            apiOptions,
         ) = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
@@ -186,14 +192,14 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
         )
 
         print("wait for license accept to come up...")
-        time.sleep(180)
+        ssc.deadline.sleep(180, "Wait for license accept")
         ssc.accept_license(lparAccess, licPath, appliance_version)
 
         print()
@@ -223,27 +229,37 @@ def main(argv):
         # If a config file upload happens quickly after system (re) start,
         # it might fail because the back-end service is still initializing
         # In this case, the service request returns an error and has to be re-tried after some time.
-        status = ""
-        first_time_setup_retry_attempts = 5
-        for t in range(first_time_setup_retry_attempts):
-            try:
-                resultCode, json, _ = ssc.accelerator_first_time_setup(
-                    def_config_file, credentials_file
+        def first_time_setup():
+            resultCode, json, _ = ssc.accelerator_first_time_setup(
+                def_config_file, credentials_file
+            )
+            log.debug(resultCode.status_code)
+            if resultCode.status_code != 200:
+                raise RetryableError(
+                    "First time setup returned unexpected status %d"
+                    % resultCode.status_code
                 )
-                log.debug(resultCode.status_code)
-                if resultCode.status_code == 200:
-                    log.debug(json)
-                    status = json["status"]
-                    log.debug(status)
-                    if status != "TRIGGERED":
-                        # http call was successful, but service failed
-                        raise Exception("First time setup call failed " + status)
-                    break
-                log.debug("First time setup returned unexpected status, try again")
-            except:
-                log.debug("First time setup returned an exception, try again")
-            # In case of HHTP error or unexpected status code, retry
-            time.sleep(15)
+            log.debug(json)
+            status = json["status"]
+            log.debug(status)
+            if status != "TRIGGERED":
+                # http call was successful, but service failed
+                raise Exception("First time setup call failed " + status)
+            return status
+
+        def try_again(attempt, delay, outcome):
+            log.debug("First time setup returned an exception, try again")
+            log.debug(outcome)
+
+        try:
+            status = ssc.retry_policy("first-time-setup").call(
+                first_time_setup, on_retry=try_again, deadline=ssc.deadline
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            log.debug(e)
+            status = ""
 
         if status != "TRIGGERED":
             raise Exception("First time setup failed")
@@ -251,14 +267,16 @@ def main(argv):
         print()
         print("First time setup triggered (please wait)")
 
-        attempts = 160
+        # without additional_wait_time, the lifecycle history decides
+        attempts = None
         if additional_wait_time:
             # additional_wait_time are minutes,
             # each loop takes 40 seconds
+            attempts = ssc.wait_attempts("accelerator STARTING")
             attempts += int(additional_wait_time * 60 / 40)
         print("additional_wait_time: ", additional_wait_time)
 
-        status = ssc.wait_until_accelerator_is_starting(lparAccess, attempts, 15)
+        status = ssc.wait_until_accelerator_is_starting(lparAccess, attempts)
         log.debug(status)
 
     except Exception as e:
@@ -49,6 +49,8 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
+from lib.aqtSSC import APPLIANCE_ACCELERATOR
 
 log = None
 
@@ -109,6 +111,8 @@ def parseargv(argv):
         help="Path where license accept information has been stored (default: lic).",
     )
 
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -127,7 +131,13 @@ def parseargv(argv):
     print("License accept path: ", options.licPath)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.configfile, options.verbose)
+    return (
+        lparAccess,
+        options.licPath,
+        options.configfile,
+        options.verbose,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -141,7 +151,7 @@ def main(argv):
     print()
     print("*************************************************************")
     try:
-        lparAccess, licPath, configfile, verbose = parseargv(argv)
+        lparAccess, licPath, configfile, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -156,7 +166,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -175,7 +185,9 @@ def main(argv):
             else:
                 raise Exception("Import of configuration file failed")
 
-        available = ssc.wait_for_reboot_to_complete(lparAccess, 30)
+        available = ssc.wait_for_reboot_to_complete(
+            lparAccess, expected_name=APPLIANCE_ACCELERATOR
+        )
 
     except Exception as e:
         log.critical(e)
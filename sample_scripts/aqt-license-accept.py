@@ -49,6 +49,7 @@ import logging
 import argparse
 import time
 from lib.aqtSSC import SecureServiceContainerAPI, LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
 
 log = None
 
@@ -103,6 +104,8 @@ def parseargv(argv):
         action="store_true",
         help="Do not prompt, but confirm license silently. License files will be downloaded.",
     )
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -117,7 +120,13 @@ def parseargv(argv):
     print(f"Name of Appliance user: {options.lparusername}")
     print(f"License information path: {options.licPath}")
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.confirm, options.verbose)
+    return (
+        lparAccess,
+        options.licPath,
+        options.confirm,
+        options.verbose,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -131,7 +140,7 @@ def main(argv):
     print()
     print("***********************************************************")
     try:
-        lparAccess, licPath, confirm, verbose = parseargv(argv)
+        lparAccess, licPath, confirm, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -146,7 +155,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
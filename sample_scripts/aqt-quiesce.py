@@ -49,6 +49,7 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
 
 log = None
 
@@ -100,6 +101,8 @@ def parseargv(argv):
         help="Path where license accept information has been stored (default: lic).",
     )
 
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -117,7 +120,7 @@ def parseargv(argv):
     print("License accept path: ", options.licPath)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.verbose)
+    return (lparAccess, options.licPath, options.verbose, api_options(options))
 
 
 def main(argv):
@@ -131,7 +134,7 @@ def main(argv):
     print()
     print("*************************************************************")
     try:
-        lparAccess, licPath, verbose = parseargv(argv)
+        lparAccess, licPath, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -146,7 +149,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -155,24 +158,28 @@ def main(argv):
         ssc.accept_license(lparAccess, licPath, appliance_version)
 
         print("Request quiesce (please wait, can take several minutes)")
-        resultCode, json, message = ssc.quiesce_force()
-        log.debug(resultCode)
-        attempts = 30
-        while resultCode.status_code != 200 and attempts > 0:
-            attempts -= 1
-            print("...")
-            log.debug("attempts %d" % attempts)
-            time.sleep(30)
-            log.debug("Attempt to quiesce accelerator again")
+
+        def quiesce():
+            log.debug("Attempt to quiesce accelerator")
             resultCode, json, message = ssc.quiesce_force()
             log.debug(resultCode)
-            if resultCode.status_code == 200:
-                print("***********************************************************")
-                print("Accelerator quiesced")
-                print("***********************************************************")
-            else:
-                log.debug("Quiesce attempt still in progress")
-                log.debug(resultCode.status_code)
+            return resultCode
+
+        def in_progress(attempt, delay, outcome):
+            print("...")
+            log.debug("Quiesce attempt %d still in progress" % attempt)
+            log.debug(outcome)
+
+        resultCode = ssc.retry_policy("quiesce").call(
+            quiesce,
+            accept=lambda resultCode: resultCode.status_code == 200,
+            on_retry=in_progress,
+            deadline=ssc.deadline,
+        )
+        if resultCode.status_code == 200:
+            print("***********************************************************")
+            print("Accelerator quiesced")
+            print("***********************************************************")
 
         if resultCode.status_code != 200:
             raise Exception("Error during Accelerator quiesce")
@@ -47,9 +47,15 @@ import json
 import logging
 import argparse
 import time
+import threading
+from concurrent.futures import Future
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
 from lib.aqtSSC import LPARBootDevice
+from lib.aqtSSC import ProgressPrinter
+from lib.aqtSSC import open_image, prepare_image, read_checksum_file
+from lib.aqtSSC import APPLIANCE_INSTALLER, APPLIANCE_ACCELERATOR
 
 log = None
 
@@ -61,6 +67,25 @@ def has_dasd(dasdId, instances):
     return False
 
 
+def run_in_background(function, *args):
+    """
+    Run function in a daemon thread, which does not hold up the exit of the
+    script, and return the Future of its result
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
 def panic(self, msg):
     log.critical(msg)
     self.error(msg)
@@ -128,8 +153,46 @@ def parseargv(argv):
         metavar="IMAGE_NAME",
         action="store",
         type=str,
-        help="Db2 Analytics Accelerator image to install",
+        help="Db2 Analytics Accelerator image to install, also a zip or tar archive "
+        "or a gz, xz or zst compressed image, which is uploaded without extracting it",
     )
+    parser.add_argument(
+        "--member",
+        dest="member",
+        action="store",
+        type=str,
+        help="Name of the image in the archive (default: its only file, "
+        "the first file of a tar archive)",
+    )
+    parser.add_argument(
+        "--zero-copy",
+        dest="zero_copy",
+        action="store_true",
+        help="Send the image from a memory mapping in large writes, "
+        "with kernel TLS where supported (see sample-upload-benchmark.py)",
+    )
+    parser.add_argument(
+        "--sha256",
+        dest="sha256",
+        action="store",
+        type=str,
+        help="Expected SHA-256 checksum of the image, verified while uploading",
+    )
+    parser.add_argument(
+        "--sha256-file",
+        dest="sha256_file",
+        action="store",
+        type=str,
+        help="File with the SHA-256 checksum of the image (sha256sum or BSD format)",
+    )
+    parser.add_argument(
+        "--verify-first",
+        dest="verify_first",
+        action="store_true",
+        help="Verify the checksum before the upload starts (reads the image twice)",
+    )
+
+    add_api_arguments(parser)
 
     parser.add_argument(
         "-v",
@@ -141,6 +204,12 @@ def parseargv(argv):
     )
 
     options = parser.parse_args(argv[1:])
+    if options.sha256 and options.sha256_file:
+        parser.error("--sha256 and --sha256-file are mutually exclusive")
+    if options.sha256_file:
+        options.sha256 = read_checksum_file(options.sha256_file, options.image)
+    if options.verify_first and not options.sha256:
+        parser.error("--verify-first needs --sha256 or --sha256-file")
 
     print("IP address or FQDN of SSC LPAR: ", options.lparip)
     print("Name of Appliance user: ", options.lparusername)
@@ -162,12 +231,32 @@ def parseargv(argv):
 
     print("License accept path: ", options.licPath)
     print("Image name: ", options.image)
+    if options.member:
+        print("Image archive member: ", options.member)
+    if options.zero_copy:
+        print("Zero-copy upload: ", options.zero_copy)
+    if options.sha256:
+        print("Image SHA-256 checksum: ", options.sha256)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
     lparBootDevice = LPARBootDevice(
         options.bootdeviceid, options.boot_wwpn, options.boot_lun
     )
-    return (lparAccess, lparBootDevice, options.image, options.licPath, options.verbose)
+    apiOptions = api_options(options)
+    if options.zero_copy:
+        apiOptions["ktls"] = True
+    uploadOptions = {"zero_copy": options.zero_copy, "checksum": options.sha256}
+    return (
+        lparAccess,
+        lparBootDevice,
+        options.image,
+        options.member,
+        options.licPath,
+        options.verify_first,
+        uploadOptions,
+        options.verbose,
+        apiOptions,
+    )
 
 
 def main(argv):
@@ -181,7 +270,17 @@ def main(argv):
     print()
     print("***********************************************************")
     try:
-        lparAccess, lparBootDevice, image, licPath, verbose = parseargv(argv)
+        (
+            lparAccess,
+            lparBootDevice,
+            image,
+            member,
+            licPath,
+            verifyFirst,
+            uploadOptions,
+            verbose,
+            apiOptions,
+        ) = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -196,7 +295,18 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        # the image (and its archive member) is checked before the LPAR leaves
+        # the accelerator, the checksum is verified in the background while the
+        # LPAR reboots into the installer, the upload waits for it
+        imageSize = prepare_image(image, uploadOptions["checksum"], False, member)
+        imageVerified = None
+        if verifyFirst:
+            print("Verifying image checksum: ", image)
+            imageVerified = run_in_background(
+                prepare_image, image, uploadOptions["checksum"], True, member
+            )
+
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -204,7 +314,7 @@ def main(argv):
 
         # appliance_name is "Db2 Analytics Accelerator for z/OS"
         # or "Secure Service Container Installer"
-        if appliance_name == "Secure Service Container Installer":
+        if appliance_name == APPLIANCE_INSTALLER:
             log.debug("Already in installer")
         else:
             if ssc.is_license_accepted():
@@ -236,35 +346,50 @@ def main(argv):
 
             else:
                 log.debug("Switch to installer successfully submitted")
-                available = ssc.wait_for_reboot_to_complete(lparAccess, 30)
-                ssc = SecureServiceContainerAPI(lparAccess)
+                available = ssc.wait_for_reboot_to_complete(
+                    lparAccess, expected_name=APPLIANCE_INSTALLER, prewarm=True
+                )
 
         if lparBootDevice.boot_wwpn is None and lparBootDevice.boot_lun is None:
             print(
                 "Check if DASD %s is assigned to LPAR" % lparBootDevice.boot_device_id
             )
-            resultCode, json, message = ssc.get_ECKD()
-            log.debug(resultCode)
-            if not has_dasd(lparBootDevice.boot_device_id, json["instances"]):
+            if not has_dasd(lparBootDevice.boot_device_id, ssc.iter_ECKD()):
                 raise Exception(
                     "Missing boot DASD {0}".format(lparBootDevice.boot_device_id)
                 )
 
-        print("Uploading image: ", image)
-        with open(image, "rb") as f:
-            resultCode, _, _ = ssc.upload_image(f, lparBootDevice, lparAccess)
+        # FCP discovery, then wait for the verification if it is still running,
+        # a checksum mismatch stops before the upload
+        uploadUrl = ssc.prepare_upload(lparBootDevice)
+        if imageVerified is not None:
+            imageVerified.result()
+            print("Image checksum verified")
+
+        if imageSize is None:
+            print("Uploading image: %s (size unknown, chunked transfer)" % image)
+        else:
+            print("Uploading image: %s (%d bytes)" % (image, imageSize))
+        with open_image(image, member) as f:
+            resultCode, _, _ = ssc.upload_image(
+                f,
+                lparBootDevice,
+                lparAccess,
+                progress=ProgressPrinter("  "),
+                upload_url=uploadUrl,
+                **uploadOptions,
+            )
             log.debug(resultCode)
             resultCode.raise_for_status()
 
-        # In case uploading the image took longer than session timout, get new token
-        ssc = SecureServiceContainerAPI(lparAccess)
-
         print("Rebooting LPAR")
         resultCode, _, _ = ssc.reboot(lparBootDevice)
         log.debug(resultCode)
         if resultCode.status_code == 202:
             log.debug("LPAR Reboot successfully submitted")
-        available = ssc.wait_for_reboot_to_complete(lparAccess, 30)
+        available = ssc.wait_for_reboot_to_complete(
+            lparAccess, expected_name=APPLIANCE_ACCELERATOR
+        )
         print("***********************************************************")
         print("Image upload completed")
         print("***********************************************************")
@@ -41,70 +41,3870 @@
 
 
 import json
+import argparse
+import codecs
 import logging
 import os
-import subprocess
 import io
 import time
 import datetime
 import shutil
 import requests
 import random
+import threading
+import tempfile
+import asyncio
+import functools
+import contextlib
+import collections
+import queue
+import hashlib
+import base64
+import math
+import mmap
+import ssl
+import sys
+import fnmatch
+import socket
+import struct
+import urllib.parse
+import gzip
+import lzma
+import tarfile
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.poolmanager import PoolManager
+from requests.packages.urllib3.util.ssl_ import create_urllib3_context
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 requests.packages.urllib3.disable_warnings()
 
-log = logging.getLogger(__name__)
-log.addHandler(logging.NullHandler())
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Number of keep-alive connections kept per LPAR address
+DEFAULT_POOL_SIZE = 4
+# Seconds after which idle keep-alive connections are dropped instead of reused
+DEFAULT_IDLE_TIMEOUT = 60
+# Worker threads shared by all AsyncSecureServiceContainerAPI objects for blocking HTTP calls
+ASYNC_MAX_WORKERS = 64
+# Seconds an SSC API token is assumed to stay valid after login, unless the token
+# states its expiry (JWT exp claim). An assumption, the SSC API does not document it.
+DEFAULT_TOKEN_LIFETIME = 900
+# Seconds before the assumed expiry at which a token is renewed proactively
+DEFAULT_TOKEN_RENEW_MARGIN = 120
+# Environment variable naming the opt-in token cache file of the sample scripts
+TOKEN_CACHE_ENV = "AQT_TOKEN_CACHE"
+# HTTP status codes worth retrying, the SSC answers 503 while services (re)start
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+# Seconds an FCP discovery may take, and the first and longest interval of the
+# polls for its completion (the interval grows by half after every poll)
+FCP_DISCOVERY_TIMEOUT = 120
+FCP_DISCOVERY_POLL_INTERVAL = 2
+FCP_DISCOVERY_MAX_POLL_INTERVAL = 15
+# FCP devices whose disks are listed at the same time when building the FCP index
+FCP_INDEX_MAX_WORKERS = 8
+# Environment variable naming the FCP path health file of the sample scripts
+PATH_HEALTH_ENV = "AQT_PATH_HEALTH"
+# Weight of the latest upload in the averaged throughput and latency of a path
+PATH_HEALTH_WEIGHT = 0.3
+# Seconds a target port is only used as a last resort after a failed upload
+PATH_FAILURE_COOLDOWN = 900
+# First and longest interval of status polls, and the growth per poll
+STATUS_POLL_INITIAL_INTERVAL = 2
+STATUS_POLL_MAX_INTERVAL = 40
+STATUS_POLL_MULTIPLIER = 1.5
+# Interval of status polls around the expected completion time of a wait,
+# and the window around it as a fraction of the expected time
+STATUS_POLL_NEAR_INTERVAL = 5
+STATUS_POLL_NEAR_WINDOW = 0.25
+# Seconds per attempt of the wait_until_* methods
+STATUS_WAIT_STEP = 40
+# Environment variable naming the lifecycle history file of the sample scripts
+LIFECYCLE_HISTORY_ENV = "AQT_LIFECYCLE_HISTORY"
+# Most recent successful waits of a kind used to predict the next one
+LIFECYCLE_HISTORY_SAMPLES = 50
+# Waits of a kind needed before timeouts are derived from the history, and the
+# multiple of the longest of them a wait may take
+LIFECYCLE_MIN_SAMPLES = 5
+LIFECYCLE_TIMEOUT_FACTOR = 2
+# Failed polls in a row after which a StatusPoller hands the error to its waiters
+STATUS_POLL_MAX_ERRORS = 3
+# States of the accelerator status (not of the accelerator server status)
+# a wait for another state cannot recover from
+ACCELERATOR_FAILURE_STATES = ("ERROR", "FAILED")
+# Seconds a reachability probe waits for the LPAR to answer,
+# and seconds its result is reused
+PROBE_TIMEOUT = 0.5
+PROBE_MAX_AGE = 5
+# Seconds between the probes of a rebooting LPAR, their connects wait PROBE_TIMEOUT
+REBOOT_PROBE_INTERVAL = 0.25
+# Seconds the HTTPS probe of a rebooting LPAR waits for the answer once connected
+REBOOT_HTTPS_TIMEOUT = 5
+# Seconds to wait for a rebooting LPAR to go down before assuming it was missed
+REBOOT_DOWN_TIMEOUT = 120
+# Seconds per attempt of wait_for_reboot_to_complete
+REBOOT_WAIT_STEP = 30
+# Appliance names reported by /appliance after a reboot
+APPLIANCE_INSTALLER = "Secure Service Container Installer"
+APPLIANCE_ACCELERATOR = "Db2 Analytics Accelerator for z/OS"
+# Attempts of the waits, raised where the lifecycle history suggests a longer timeout
+DEFAULT_WAIT_ATTEMPTS = {
+    "accelerator READY": 120,
+    "accelerator STARTING": 160,
+    "accelerator UPDATE_CLUSTER_WAIT_CREDENTIALS": 100,
+    "accelerator server RUNNING": 120,
+    "reboot": 30,
+    "reboot to " + APPLIANCE_INSTALLER: 30,
+    "reboot to " + APPLIANCE_ACCELERATOR: 30,
+}
+# Bytes read from the network at a time when parsing list responses incrementally
+STREAM_CHUNK_SIZE = 64 * 1024
+# Seconds GET responses of read-only endpoints are reused without asking the LPAR,
+# afterwards they are revalidated (If-None-Match / If-Modified-Since). Other endpoints
+# are not cached, e.g. fcp-disks (GETs trigger FCP discovery) and the accelerator status
+DEFAULT_CACHE_TTLS = {
+    "/api/com.ibm.zaci.system/appliance": 30,
+    "/api/com.ibm.zaci.system/software-license": 60,
+    "/api/com.ibm.zaci.system/storage-devices": 30,
+}
+# Responses larger than this (or of unknown size) are not cached
+CACHE_MAX_ENTRY_SIZE = 1024 * 1024
+# (connect, read) timeouts in seconds per operation class. The read timeout limits
+# how long the LPAR may stay silent, not the whole transfer, so it suits long
+# uploads and downloads. While a request body is sent, stalls are limited by the
+# connect timeout.
+DEFAULT_TIMEOUTS = {
+    "default": (10, 60),
+    # status polls, fail fast and let the wait loops poll again
+    "status": (5, 20),
+    "login": (10, 30),
+    # fcp-disks may trigger a discovery and answer slowly
+    "discovery": (10, 180),
+    # the LPAR writes the image to disk before it answers
+    "upload": (30, 900),
+    "download": (10, 300),
+}
+# Bytes read from the image and sent to the LPAR at a time during uploads
+DEFAULT_UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Bytes sent per write when uploading from a memory-mapped image
+ZERO_COPY_CHUNK_SIZE = 16 * 1024 * 1024
+# Chunks buffered per LPAR when one image is uploaded to several LPARs at once,
+# bounds how far the fastest upload can get ahead of the slowest
+DEFAULT_BROADCAST_BUFFER_CHUNKS = 16
+# Seconds an upload of a broadcast may hold up the others before it is aborted
+DEFAULT_BROADCAST_STALL_TIMEOUT = 300
+# Upload priority classes of the bandwidth limiter, lower values are served first
+UPLOAD_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+# Digest verifying images against the checksums published with them
+CHECKSUM_ALGORITHM = "sha256"
+# Seconds between the throughput log messages of uploads, and window of the rolling rate
+UPLOAD_LOG_INTERVAL = 10
+# File name suffixes of the image packages open_image reads from
+ARCHIVE_FORMATS = (
+    (".zip", "zip"),
+    (".tar", "tar"),
+    (".tar.gz", "tar"),
+    (".tgz", "tar"),
+    (".tar.xz", "tar"),
+    (".txz", "tar"),
+    (".tar.zst", "tar.zst"),
+    (".gz", "gz"),
+    (".xz", "xz"),
+    (".zst", "zst"),
+)
+# Operation class of the API paths (fnmatch patterns, first match wins)
+TIMEOUT_CLASSES = (
+    ("/api/com.ibm.zaci.system/api-tokens", "login"),
+    ("/api/com.ibm.zaci.system/appliance", "status"),
+    ("/api/com.ibm.zaci.system/appliance/is-operational", "status"),
+    ("/api/com.ibm.aqt/components/*", "status"),
+    ("/api/com.ibm.zaci.system/fcp-disks", "discovery"),
+    ("/api/com.ibm.zaci.system/sw-appliances/install", "upload"),
+    ("*/diag-info", "download"),
+)
+
+
+class LPARAccess(object):
+    """
+    An object describing the target SSC LPAR
+    by address, username and password
+    """
+
+    def __init__(self, address, username, password):
+        self.address = address
+        self.username = username
+        self.password = password
+
+    def set(self, address=None, username=None, password=None):
+        self.address = address
+        self.username = username
+        self.password = password
+
+
+class LPARBootDevice(object):
+    """
+    An object describing the target SSC LPAR boot device
+    wwpn and lun are only used for SCSI devices
+    """
+
+    def __init__(self, boot_device_id, boot_wwpn, boot_lun):
+        self.boot_device_id = boot_device_id
+        self.boot_wwpn = boot_wwpn
+        self.boot_lun = boot_lun
+
+    def set(self, boot_device_id=None, boot_wwpn=None, boot_lun=None):
+        self.boot_device_id = boot_device_id
+        self.boot_wwpn = boot_wwpn
+        self.boot_lun = boot_lun
+
+    def get_udid(self):
+        if self.boot_wwpn is not None and self.boot_lun is not None:
+            _wwpn = self.boot_wwpn
+            _lun = self.boot_lun
+
+            # Check for leading 0x in lun and wwpn
+            if _wwpn.startswith("0x") or _wwpn.startswith("0X"):
+                _wwpn = _wwpn[2:]
+            if _lun.startswith("0x") or _lun.startswith("0X"):
+                _lun = _lun[2:]
+            return _wwpn + _lun
+
+        return None
+
+
+class RetryableError(Exception):
+    """
+    Raised by retried operations for results which are worth another attempt
+    """
+
+
+class ChecksumMismatch(Exception):
+    """
+    Raised when an image does not match its expected checksum
+    """
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the time budget of an operation is used up
+    """
+
+
+class StateError(Exception):
+    """
+    Raised when a watched status reaches a failure state
+    """
+
+
+class Deadline(object):
+    """
+    Point in time by which an operation, including everything it calls, must be done
+
+    The same object is passed down the call chain, so nested retries and waits
+    stop as soon as the overall budget is exhausted. A Deadline without seconds
+    never expires.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def __repr__(self):
+        return "Deadline(remaining=%s)" % self.remaining()
+
+    def remaining(self):
+        """
+        Seconds left, None if the deadline never expires
+        """
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0)
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def check(self, what="operation"):
+        """
+        Raise DeadlineExceeded if the deadline has passed
+        """
+        if self.expired():
+            raise DeadlineExceeded(
+                "%s: deadline of %ds exceeded" % (what, self.seconds)
+            )
+
+    def allows(self, seconds):
+        """
+        Check if there are at least 'seconds' left
+        """
+        remaining = self.remaining()
+        return remaining is None or remaining >= seconds
+
+    def within(self, seconds):
+        """
+        Return a deadline 'seconds' from now, but not later than this one
+        """
+        deadline = Deadline(seconds)
+        if self.expires is not None and self.expires < deadline.expires:
+            deadline.seconds = self.seconds
+            deadline.expires = self.expires
+        return deadline
+
+    def sleep(self, seconds, what="operation"):
+        """
+        Sleep, but raise DeadlineExceeded instead of sleeping past the deadline
+        """
+        if not self.allows(seconds):
+            time.sleep(self.remaining())
+            self.check(what)
+        time.sleep(seconds)
+
+    async def async_sleep(self, seconds, what="operation"):
+        """
+        Coroutine version of sleep
+        """
+        if not self.allows(seconds):
+            await asyncio.sleep(self.remaining())
+            self.check(what)
+        await asyncio.sleep(seconds)
+
+
+class RetryPolicy(object):
+    """
+    Retry an operation with exponential backoff and jitter
+
+    The delay before attempt n+1 is initial_delay * multiplier**(n-1), capped
+    at max_delay and randomized by +/- jitter (fraction of the delay).
+    Exceptions are retried if they are instances of retry_exceptions or
+    HTTP errors with a status code in retry_statuses, all others are raised.
+    """
+
+    def __init__(
+        self,
+        name,
+        max_attempts=5,
+        initial_delay=1.0,
+        max_delay=60.0,
+        multiplier=2.0,
+        jitter=0.2,
+        retry_statuses=RETRYABLE_STATUS_CODES,
+        retry_exceptions=(
+            requests.ConnectionError,
+            requests.Timeout,
+            RetryableError,
+        ),
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.retry_exceptions = retry_exceptions
+
+    def __repr__(self):
+        return "RetryPolicy(%r, max_attempts=%d, initial_delay=%s, max_delay=%s)" % (
+            self.name,
+            self.max_attempts,
+            self.initial_delay,
+            self.max_delay,
+        )
+
+    def copy(self, **kwargs):
+        """
+        Return a copy of this policy with some settings changed
+        """
+        policy = RetryPolicy(self.name)
+        policy.__dict__.update(self.__dict__)
+        policy.__dict__.update(kwargs)
+        return policy
+
+    def delay(self, attempt):
+        """
+        Seconds to wait after failed attempt number 'attempt' (starting at 1)
+        """
+        delay = min(
+            self.initial_delay * self.multiplier ** (attempt - 1), self.max_delay
+        )
+        return max(delay * (1 + random.uniform(-self.jitter, self.jitter)), 0)
+
+    def is_retryable(self, exception):
+        if isinstance(exception, DeadlineExceeded):
+            return False
+        if isinstance(exception, self.retry_exceptions):
+            return True
+        if isinstance(exception, requests.HTTPError):
+            response = exception.response
+            return response is not None and response.status_code in self.retry_statuses
+        return False
+
+    def call(self, operation, accept=None, on_retry=None, deadline=None):
+        """
+        Call operation until it succeeds, the attempts are used up
+        or the deadline does not leave time for another attempt
+
+        Parameters:
+          operation (callable): Called without parameters
+          accept (callable): Called with the result, a false return value
+            retries the operation (default: every result is accepted)
+          on_retry (callable): Called with the attempt number, the delay and
+            the rejected result or exception before waiting for the next attempt
+          deadline (Deadline): Overall time budget (default: none)
+
+        Returns:
+          The accepted result, or the last result if no result was accepted
+
+        Raises:
+          The exception of the last attempt, or any non retryable exception
+          DeadlineExceeded if the deadline is reached before an accepted result
+        """
+        deadline = deadline or Deadline()
+        attempt = 0
+        while True:
+            deadline.check(self.name)
+            attempt += 1
+            try:
+                result = operation()
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+                outcome = e
+            else:
+                if accept is None or accept(result):
+                    return result
+                if attempt >= self.max_attempts:
+                    log.debug("%s: giving up after %d attempts" % (self.name, attempt))
+                    return result
+                outcome = result
+            delay = self.delay(attempt)
+            if not deadline.allows(delay):
+                raise DeadlineExceeded(
+                    "%s: deadline exceeded after %d attempts, last outcome: %s"
+                    % (self.name, attempt, outcome)
+                )
+            log.debug(
+                "%s: attempt %d/%d failed (%s), retrying in %.1fs"
+                % (self.name, attempt, self.max_attempts, outcome, delay)
+            )
+            if on_retry is not None:
+                on_retry(attempt, delay, outcome)
+            time.sleep(delay)
+
+
+def poll_until(
+    check,
+    timeout,
+    initial_interval=1,
+    max_interval=15,
+    multiplier=1.5,
+    deadline=None,
+    what="poll",
+):
+    """
+    Call check until it returns something else than None or timeout seconds
+    have passed. The interval between the calls starts short and grows by
+    multiplier up to max_interval, so quick completions are seen early.
+
+    Returns:
+      The result of check, None on timeout
+
+    Raises:
+      DeadlineExceeded if the deadline is reached first
+    """
+    deadline = deadline or Deadline()
+    window = Deadline(timeout)
+    interval = initial_interval
+    polls = 0
+    while True:
+        polls += 1
+        result = check()
+        if result is not None:
+            log.debug("%s: done after %d polls" % (what, polls))
+            return result
+        remaining = window.remaining()
+        if remaining <= 0:
+            log.debug("%s: not done after %d polls in %ds" % (what, polls, timeout))
+            return None
+        deadline.sleep(min(interval, remaining), what)
+        interval = min(interval * multiplier, max_interval)
+
+
+def _percentile(values, percentile):
+    """
+    Return the percentile (0-100) of the sorted values, interpolated linearly
+    """
+    position = (len(values) - 1) * percentile / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _format_eta(seconds):
+    """
+    Return the predicted seconds as h:mm:ss
+    """
+    return str(datetime.timedelta(seconds=int(round(seconds))))
+
+
+class LifecycleHistory(object):
+    """
+    Durations and state transitions of the waits for LPAR state changes, by
+    what was waited for, the LPAR and the appliance version
+
+    Every wait for a status and every reboot adds a record with the states
+    seen on the way, when they were seen, and the result. The records give
+    percentiles of the durations, predict how long a running wait still
+    takes and suggest timeouts. With a path, the records are appended to a
+    JSON lines file shared by consecutive script invocations, without it
+    they are only kept in memory.
+    """
+
+    FORMAT = 1
+
+    # serializes the appends of all histories in the process
+    _file_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path) if path else None
+        self._lock = threading.Lock()
+        self._records = self._read()
+
+    def _read(self):
+        """
+        Read the history file, return the list of records
+        """
+        if self.path is None:
+            return []
+        records = []
+        try:
+            with open(self.path, "r") as file:
+                for number, line in enumerate(file, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        log.debug(
+                            "%s:%d: ignoring invalid record" % (self.path, number)
+                        )
+                        continue
+                    if isinstance(record, dict) and record.get("format") == self.FORMAT:
+                        records.append(record)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("Ignoring lifecycle history file %s: %s" % (self.path, e))
+        return records
+
+    def record(
+        self,
+        what,
+        started,
+        duration,
+        result,
+        transitions=(),
+        lpar=None,
+        version=None,
+    ):
+        """
+        Add the record of a wait
+
+        Parameters:
+          what (string): What was waited for, e.g. "accelerator READY"
+          started (float): Time the wait started (time.time())
+          duration (float): Seconds the wait took
+          result (string): "reached", "failed" or "timeout"
+          transitions (list): (state, seconds after the start) of every state seen
+          lpar (string): Address of the LPAR
+          version (string): Appliance version of the LPAR
+        """
+        record = {
+            "format": self.FORMAT,
+            "what": what,
+            "lpar": lpar,
+            "appliance_version": version,
+            "started": round(started, 3),
+            "duration": round(duration, 3),
+            "result": result,
+            "transitions": [
+                {
+                    "state": str(state),
+                    "time": round(started + elapsed, 3),
+                    "elapsed": round(elapsed, 3),
+                }
+                for state, elapsed in transitions
+            ],
+        }
+        with self._lock:
+            self._records.append(record)
+        log.debug("Lifecycle history: %s" % record)
+        if self.path is None:
+            return
+        with self._file_lock:
+            try:
+                with open(self.path, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                log.warning(
+                    "Cannot write lifecycle history file %s: %s" % (self.path, e)
+                )
+
+    def kinds(self):
+        """
+        Return the sorted (what, lpar, version) combinations in the history
+        """
+        with self._lock:
+            kinds = set(
+                (r.get("what"), r.get("lpar"), r.get("appliance_version"))
+                for r in self._records
+            )
+        return sorted(kinds, key=lambda kind: tuple(str(k) for k in kind))
+
+    def waits(self, what, lpar=None, version=None, result="reached"):
+        """
+        Return the records of the waits for what, oldest first
+
+        Parameters:
+          lpar (string): Only waits of this LPAR (default: all)
+          version (string): Only waits on this appliance version (default: all)
+          result (string): Only waits with this result (None: all)
+        """
+        with self._lock:
+            return [
+                r
+                for r in self._records
+                if r.get("what") == what
+                and (lpar is None or r.get("lpar") == lpar)
+                and (version is None or r.get("appliance_version") == version)
+                and (result is None or r.get("result") == result)
+            ]
+
+    def durations(self, what, lpar=None, version=None):
+        """
+        Return the durations of the successful waits for what, oldest first
+        """
+        return [r["duration"] for r in self.waits(what, lpar, version)]
+
+    def percentiles(self, what, percentiles=(50, 90, 95), lpar=None, version=None):
+        """
+        Return {percentile: seconds} of the durations of the successful waits
+        for what, None if there are none
+        """
+        durations = sorted(self.durations(what, lpar, version))
+        if not durations:
+            return None
+        return dict((p, _percentile(durations, p)) for p in percentiles)
+
+    def _samples(self, what, lpar, version, minimum=1):
+        """
+        Return the recent successful waits to predict a wait from: those of
+        the same LPAR and version if there are enough, else those of the
+        LPAR, else those of all LPARs
+        """
+        for filters in ((lpar, version), (lpar, None), (None, None)):
+            waits = self.waits(what, *filters)
+            if len(waits) >= minimum:
+                return waits[-LIFECYCLE_HISTORY_SAMPLES:]
+        return []
+
+    def expected(self, what, lpar=None, version=None):
+        """
+        Return the median duration of the recent waits for what, None if unknown
+        """
+        waits = self._samples(what, lpar, version)
+        if not waits:
+            return None
+        return _percentile(sorted(w["duration"] for w in waits), 50)
+
+    def eta(self, what, elapsed, state=None, in_state=0, lpar=None, version=None):
+        """
+        Predict the seconds until a running wait for what completes
+
+        Earlier waits which went through the current state give the median
+        time from that state to the end, otherwise the median duration is
+        used. Only earlier waits which took longer than the running one so far
+        count, so the prediction moves on for a wait which is late.
+
+        Parameters:
+          elapsed (float): Seconds since the wait started
+          state (string): Current state (default: unknown)
+          in_state (float): Seconds since the current state was reached
+
+        Returns:
+          Seconds, None if there is no history to predict from
+        """
+        waits = self._samples(what, lpar, version)
+        remaining = []
+        if state is not None:
+            for wait in waits:
+                reached = [
+                    t["elapsed"]
+                    for t in wait.get("transitions", ())
+                    if t["state"] == str(state)
+                ]
+                if reached and wait["duration"] - reached[0] > in_state:
+                    remaining.append(wait["duration"] - reached[0] - in_state)
+        if not remaining:
+            remaining = [
+                w["duration"] - elapsed for w in waits if w["duration"] > elapsed
+            ]
+        if not remaining:
+            return None
+        return _percentile(sorted(remaining), 50)
+
+    def timeout(self, what, lpar=None, version=None):
+        """
+        Return the seconds a wait for what may take: LIFECYCLE_TIMEOUT_FACTOR
+        times the longest recent wait, None with less than LIFECYCLE_MIN_SAMPLES
+        """
+        waits = self._samples(what, lpar, version, LIFECYCLE_MIN_SAMPLES)
+        if not waits:
+            return None
+        return LIFECYCLE_TIMEOUT_FACTOR * max(w["duration"] for w in waits)
+
+
+# History of the waits of this process, if no history file is used
+_lifecycle_history = LifecycleHistory()
+
+
+class PollSchedule(object):
+    """
+    Intervals between status polls: short at first so quick transitions are
+    seen early, growing by multiplier up to max_interval, and short again in a
+    window around the expected completion time
+    """
+
+    def __init__(
+        self,
+        initial=STATUS_POLL_INITIAL_INTERVAL,
+        multiplier=STATUS_POLL_MULTIPLIER,
+        max_interval=STATUS_POLL_MAX_INTERVAL,
+        expected=None,
+        near_interval=STATUS_POLL_NEAR_INTERVAL,
+        near_window=STATUS_POLL_NEAR_WINDOW,
+    ):
+        """
+        Parameters:
+          expected (float): Seconds the wait usually takes (default: unknown)
+          near_interval (float): Interval within the window around expected
+          near_window (float): Half width of the window, fraction of expected
+        """
+        self.initial = initial
+        self.multiplier = multiplier
+        self.max_interval = max_interval
+        self.expected = expected
+        self.near_interval = near_interval
+        self.near_window = near_window
+
+    def interval(self, polls, elapsed):
+        """
+        Return the seconds to wait after poll number 'polls',
+        'elapsed' seconds after the wait started
+        """
+        interval = min(
+            self.initial * self.multiplier ** max(polls - 1, 0), self.max_interval
+        )
+        if self.expected:
+            start = self.expected * (1 - self.near_window)
+            end = self.expected * (1 + self.near_window)
+            if elapsed < start:
+                # do not sleep past the start of the window
+                interval = min(interval, max(start - elapsed, self.near_interval))
+            elif elapsed <= end:
+                interval = min(interval, self.near_interval)
+        return interval
+
+
+class StateWatcher(object):
+    """
+    Wait for a polled status to reach one of the target states
+
+    Failure states end the wait right away with StateError instead of
+    polling on until the time is up. The states seen and the result are
+    recorded in a LifecycleHistory, the polls follow a PollSchedule, by
+    default with the median duration of the earlier waits for the same thing
+    as the expected time.
+    """
+
+    def __init__(
+        self,
+        targets,
+        failures=(),
+        timeout=None,
+        schedule=None,
+        what="status",
+        history=None,
+        labels=None,
+    ):
+        """
+        Parameters:
+          targets (tuple): States which end the wait successfully
+          failures (tuple): States which end the wait with StateError
+          timeout (float): Seconds after which the wait gives up (default: never)
+          schedule (PollSchedule): Intervals between the polls
+          what (string): Description of the wait, also the key of its history
+          history (LifecycleHistory): History of the waits
+                                      (default: the waits of this process)
+          labels (dict): lpar and version of the wait in the history
+        """
+        self.targets = tuple(targets)
+        self.failures = tuple(failures)
+        self.timeout = timeout
+        self.what = what
+        self.history = history or _lifecycle_history
+        self.labels = labels or {}
+        if schedule is None:
+            schedule = PollSchedule(expected=self.history.expected(what, **self.labels))
+        self.schedule = schedule
+        self.state = None
+        self.polls = 0
+        self.transitions = []
+        self.result = None
+        self.started = time.monotonic()
+        self.started_at = time.time()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def finish(self, result):
+        """
+        Record the end of the wait in the history, the first call only
+        """
+        if self.result is not None:
+            return
+        self.result = result
+        self.history.record(
+            self.what,
+            self.started_at,
+            self.elapsed,
+            result,
+            self.transitions,
+            **self.labels,
+        )
+
+    def eta(self, state=None):
+        """
+        Return the predicted seconds until the wait completes, None if unknown
+
+        Parameters:
+          state (string): Status just polled (default: the last observed one)
+        """
+        in_state = 0
+        if state is None or state == self.state:
+            state = self.state
+            if self.transitions:
+                in_state = self.elapsed - self.transitions[-1][1]
+        return self.history.eta(self.what, self.elapsed, state, in_state, **self.labels)
+
+    def observe(self, state):
+        """
+        Record a polled state, return True if it is a target state
+
+        Raises:
+          StateError for a failure state
+        """
+        self.polls += 1
+        if state != self.state:
+            self.transitions.append((state, self.elapsed))
+        self.state = state
+        if state in self.targets:
+            self.finish("reached")
+            log.debug(
+                "%s: %s after %d polls in %.1fs"
+                % (self.what, state, self.polls, self.elapsed)
+            )
+            return True
+        if state in self.failures:
+            self.finish("failed")
+            raise StateError(
+                "%s: failed with state %s after %.0fs"
+                % (self.what, state, self.elapsed)
+            )
+        return False
+
+    def next_interval(self):
+        """
+        Return the seconds until the next poll, None if the time is up
+        """
+        interval = self.schedule.interval(self.polls, self.elapsed)
+        if self.timeout is None:
+            return interval
+        remaining = self.timeout - self.elapsed
+        if remaining <= 0:
+            self.finish("timeout")
+            return None
+        return min(interval, remaining)
+
+    def watch(self, get_state, deadline=None, on_poll=None):
+        """
+        Poll get_state until it returns a target state or the time is up
+
+        Parameters:
+          get_state (callable): Returns the current state
+          deadline (Deadline): Overall time budget (default: none)
+          on_poll (callable): Called with the state after every poll
+
+        Returns:
+          The target state reached, None on timeout
+
+        Raises:
+          StateError if a failure state is reached
+          DeadlineExceeded if the deadline is reached first
+        """
+        deadline = deadline or Deadline()
+        while True:
+            state = get_state()
+            if on_poll is not None:
+                on_poll(state)
+            if self.observe(state):
+                return state
+            interval = self.next_interval()
+            if interval is None:
+                return None
+            deadline.sleep(interval, self.what)
+
+    async def async_watch(self, get_state, deadline=None, on_poll=None):
+        """
+        Coroutine version of watch, get_state is a coroutine function
+        """
+        deadline = deadline or Deadline()
+        while True:
+            state = await get_state()
+            if on_poll is not None:
+                on_poll(state)
+            if self.observe(state):
+                return state
+            interval = self.next_interval()
+            if interval is None:
+                return None
+            await deadline.async_sleep(interval, self.what)
+
+
+class StatusPoller(object):
+    """
+    Background poller of one status of an LPAR, shared by any number of
+    subscribers
+
+    A thread polls while there are subscribers and hands every change of the
+    status to them, through callbacks, queues or asyncio events. The LPAR
+    sees one stream of status requests however many consumers wait. The
+    interval follows a PollSchedule which starts over after every change.
+    Subscribers can bring their own schedule (e.g. the one of a StateWatcher
+    polling faster around the expected completion), the poller waits for the
+    shortest interval any of them asks for. A new subscriber gets the
+    current status right away, unless the poller was stopping or stopped,
+    then it gets the status of a fresh poll.
+    """
+
+    def __init__(self, fetch, what="status", schedule=None):
+        """
+        Parameters:
+          fetch (callable): Returns the current status
+          what (string): Name of the status for log messages
+          schedule (PollSchedule): Intervals between the polls
+        """
+        self._fetch = fetch
+        self.what = what
+        self.schedule = schedule or PollSchedule()
+        self.state = None
+        self.error = None
+        self.updated = None
+        self._subscribers = dict()  # token -> (callback, schedule, started)
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._poll_now = False
+        self._thread = None
+
+    def subscribe(self, callback, schedule=None, started=None):
+        """
+        Call callback with every new status, and with an exception once the
+        polls failed STATUS_POLL_MAX_ERRORS times in a row.
+        Returns the token for unsubscribe.
+
+        Parameters:
+          schedule (PollSchedule): Intervals the subscriber wants the status
+                                   polled at, its expected time counted from
+                                   started (default: the poller's schedule only)
+          started (float): time.monotonic() the wait of the subscriber started
+                           (default: now)
+        """
+        if started is None:
+            started = time.monotonic()
+        with self._lock:
+            stopping = not self._subscribers
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = (callback, schedule, started)
+            if self._thread is not None and not self._thread.is_alive():
+                self._thread = None
+            if stopping or self._thread is None:
+                # nobody polled since the last subscriber left, the status is stale
+                self.state = None
+            if stopping and self._thread is not None:
+                # the thread was about to stop, make it poll for the new subscriber
+                self._poll_now = True
+            state = self.state
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="StatusPoller " + self.what, daemon=True
+                )
+                self._thread.start()
+        # the poller may sleep longer than the new schedule allows
+        self._wakeup.set()
+        if state is not None:
+            callback(state)
+        return token
+
+    def unsubscribe(self, token):
+        """
+        Stop the callbacks of the subscription, the polling stops with the last one
+        """
+        with self._lock:
+            self._subscribers.pop(token, None)
+        self._wakeup.set()
+
+    def subscribe_queue(self, maxsize=0, schedule=None, started=None):
+        """
+        Return (token, queue.Queue) receiving every new status
+        (schedule and started: see subscribe)
+        """
+        updates = queue.Queue(maxsize)
+        return self.subscribe(updates.put, schedule, started), updates
+
+    def subscribe_event(self, targets, loop=None):
+        """
+        Return (token, asyncio.Event) which is set once the status is one of targets
+
+        Parameters:
+          loop (asyncio.AbstractEventLoop): Loop of the event (default: running loop)
+        """
+        loop = loop or asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def update(state):
+            if not isinstance(state, Exception) and state in targets:
+                loop.call_soon_threadsafe(event.set)
+
+        return self.subscribe(update), event
+
+    def poll_now(self):
+        """
+        Poll right away instead of at the next scheduled time
+        """
+        with self._lock:
+            self._poll_now = True
+        self._wakeup.set()
+
+    def _publish(self, update):
+        with self._lock:
+            callbacks = [callback for callback, _, _ in self._subscribers.values()]
+        for callback in callbacks:
+            try:
+                callback(update)
+            except Exception as e:
+                log.debug("%s: subscriber failed: %s" % (self.what, e))
+
+    def _run(self):
+        polls = 0
+        errors = 0
+        changed = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # the status is stale once nobody polls it
+                    self._thread = None
+                    self.state = None
+                    return
+            try:
+                state = self._fetch()
+            except Exception as e:
+                errors += 1
+                log.debug("%s: poll failed (%d): %s" % (self.what, errors, e))
+                if errors >= STATUS_POLL_MAX_ERRORS:
+                    self.error = e
+                    self._publish(e)
+            else:
+                errors = 0
+                self.error = None
+                self.updated = time.monotonic()
+                if state != self.state:
+                    log.debug("%s: %s -> %s" % (self.what, self.state, state))
+                    self.state = state
+                    polls = 0
+                    changed = self.updated
+                    self._publish(state)
+            polls += 1
+            self._sleep(polls, time.monotonic(), changed)
+
+    def _interval(self, polls, changed):
+        """
+        Return the shortest interval the poller's and the subscribers'
+        schedules ask for after poll number 'polls' since the status changed
+        """
+        now = time.monotonic()
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        intervals = [self.schedule.interval(polls, now - changed)]
+        for _, schedule, started in subscribers:
+            if schedule is not None:
+                intervals.append(schedule.interval(polls, now - started))
+        return min(intervals)
+
+    def _sleep(self, polls, polled, changed):
+        """
+        Sleep until the next poll is due, the interval is recomputed whenever
+        the subscribers change
+        """
+        while True:
+            with self._lock:
+                if not self._subscribers or self._poll_now:
+                    self._poll_now = False
+                    return
+            wait = polled + self._interval(polls, changed) - time.monotonic()
+            if wait <= 0:
+                return
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def watch(self, watcher, deadline=None, on_poll=None):
+        """
+        Wait with the StateWatcher on the status changes of this poller
+
+        Parameters:
+          watcher (StateWatcher): Target and failure states and timeout of the wait
+          deadline (Deadline): Overall time budget (default: none)
+          on_poll (callable): Called with the status after every change, and at
+                              least every STATUS_WAIT_STEP seconds while waiting
+
+        Returns:
+          The target state reached, None on timeout
+
+        Raises:
+          StateError if a failure state is reached
+          DeadlineExceeded if the deadline is reached first
+          The exception of the polls if they keep failing
+        """
+        deadline = deadline or Deadline()
+        token, updates = self.subscribe_queue(
+            schedule=watcher.schedule, started=watcher.started
+        )
+        try:
+            while True:
+                wait = self._wait_time(watcher, deadline)
+                if wait is None:
+                    return None
+                try:
+                    update = updates.get(timeout=wait)
+                except queue.Empty:
+                    deadline.check(watcher.what)
+                    if on_poll is not None and self.state is not None:
+                        on_poll(self.state)
+                    continue
+                if isinstance(update, Exception):
+                    raise update
+                if on_poll is not None:
+                    on_poll(update)
+                if watcher.observe(update):
+                    return update
+        finally:
+            self.unsubscribe(token)
+
+    async def async_watch(self, watcher, deadline=None, on_poll=None):
+        """
+        Coroutine version of watch
+        """
+        deadline = deadline or Deadline()
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        token = self.subscribe(
+            lambda update: loop.call_soon_threadsafe(updates.put_nowait, update),
+            watcher.schedule,
+            watcher.started,
+        )
+        try:
+            while True:
+                wait = self._wait_time(watcher, deadline)
+                if wait is None:
+                    return None
+                try:
+                    update = await asyncio.wait_for(updates.get(), wait)
+                except asyncio.TimeoutError:
+                    deadline.check(watcher.what)
+                    if on_poll is not None and self.state is not None:
+                        on_poll(self.state)
+                    continue
+                if isinstance(update, Exception):
+                    raise update
+                if on_poll is not None:
+                    on_poll(update)
+                if watcher.observe(update):
+                    return update
+        finally:
+            self.unsubscribe(token)
+
+    @staticmethod
+    def _wait_time(watcher, deadline):
+        """
+        Seconds to wait for the next update, None if the watcher timed out
+        """
+        wait = STATUS_WAIT_STEP
+        if watcher.timeout is not None:
+            remaining = watcher.timeout - watcher.elapsed
+            if remaining <= 0:
+                watcher.finish("timeout")
+                return None
+            wait = min(wait, remaining)
+        if deadline.remaining() is not None:
+            deadline.check(watcher.what)
+            wait = min(wait, deadline.remaining())
+        return wait
+
+
+# Retry behaviour of the individual operations, tune the whole toolkit here
+RETRY_PROFILES = {
+    # GET fcp-disks of one FCP device until it lists disks
+    "fcp-data": RetryPolicy("fcp-data", max_attempts=6, initial_delay=2, max_delay=15),
+    # scan the FCP devices until an active path to the disk shows up
+    "fcp-path": RetryPolicy("fcp-path", max_attempts=6, initial_delay=3, max_delay=15),
+    # trigger FCP discovery until the boot disk can be found
+    "fcp-discovery": RetryPolicy(
+        "fcp-discovery",
+        max_attempts=10,
+        initial_delay=5,
+        max_delay=60,
+        retry_exceptions=(Exception,),
+    ),
+    # wait for the appliance to be operational after accepting the license
+    "license-operational": RetryPolicy(
+        "license-operational", max_attempts=20, initial_delay=1, max_delay=5
+    ),
+    # repeat quiesce requests until the accelerator is quiesced
+    "quiesce": RetryPolicy("quiesce", max_attempts=31, initial_delay=5, max_delay=30),
+    # the configuration service rejects requests while it is still initializing
+    "first-time-setup": RetryPolicy(
+        "first-time-setup",
+        max_attempts=5,
+        initial_delay=5,
+        max_delay=15,
+        retry_exceptions=(Exception,),
+    ),
+}
+
+
+class ConnectionStats(object):
+    """
+    Counters for the requests sent over a connection pool
+    and the connections which had to be opened for them
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.requests = 0
+        self.new_connections = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    @property
+    def reused_connections(self):
+        return max(self.requests - self.new_connections, 0)
+
+    def start_timings(self):
+        """
+        Start collecting the connection timings of the requests of this thread
+        """
+        self._local.timings = dict()
+
+    def add_timing(self, name, seconds):
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + seconds
+
+    def stop_timings(self):
+        """
+        Return the connection timings collected since start_timings
+        """
+        timings = getattr(self._local, "timings", None)
+        self._local.timings = None
+        return timings or dict()
+
+    def __repr__(self):
+        return "ConnectionStats(requests=%d, new=%d, reused=%d)" % (
+            self.requests,
+            self.new_connections,
+            self.reused_connections,
+        )
+
+
+class _CountingPoolManager(PoolManager):
+    """
+    urllib3 pool manager which reports every newly opened connection
+    """
+
+    def __init__(self, stats, *args, **kwargs):
+        self._stats = stats
+        super(_CountingPoolManager, self).__init__(*args, **kwargs)
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(_CountingPoolManager, self)._new_pool(
+            scheme, host, port, request_context
+        )
+        stats = self._stats
+        new_conn = pool._new_conn
+
+        def _counting_new_conn():
+            stats.count_new_connection()
+            return _timed_connection(new_conn(), stats)
+
+        pool._new_conn = _counting_new_conn
+        return pool
+
+
+def _ktls_context():
+    """
+    Return an SSL context asking OpenSSL to hand encryption to the kernel (kTLS),
+    None if this Python does not support it. OpenSSL silently keeps encrypting in
+    user space if the kernel or cipher does not support kTLS.
+    """
+    option = getattr(ssl, "OP_ENABLE_KTLS", None)
+    if option is None:
+        log.debug("Kernel TLS offload is not supported by this Python")
+        return None
+    context = create_urllib3_context(cert_reqs=ssl.CERT_NONE)
+    context.check_hostname = False
+    context.options |= option
+    return context
+
+
+def _timed_connection(conn, stats):
+    """
+    Report how long a urllib3 connection takes to open its socket
+    (DNS lookup and TCP connect) and to connect in total (including TLS)
+    """
+    open_socket = conn._new_conn
+    connect = conn.connect
+
+    def _timed_open_socket():
+        start = time.monotonic()
+        try:
+            return open_socket()
+        finally:
+            stats.add_timing("tcp", time.monotonic() - start)
+
+    def _timed_connect():
+        start = time.monotonic()
+        try:
+            return connect()
+        finally:
+            stats.add_timing("connect", time.monotonic() - start)
+
+    conn._new_conn = _timed_open_socket
+    conn.connect = _timed_connect
+    return conn
+
+
+def _endpoint_template(url):
+    """
+    Return the path and query of url with identifiers (anything
+    containing a digit) replaced by {}, e.g.
+    /api/com.ibm.zaci.system/fcp-disks?fcp-device={}&status=free
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = "/".join(
+        "{}" if any(c.isdigit() for c in segment) else segment
+        for segment in parts.path.split("/")
+    )
+    query = "&".join(
+        "%s=%s" % (name, "{}" if any(c.isdigit() for c in value) else value)
+        for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    )
+    return path + ("?" + query if query else "")
+
+
+class TraceWriter(object):
+    """
+    Instrumentation callback appending one JSON line per request to a file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+
+    def __call__(self, record):
+        line = json.dumps(record, sort_keys=True)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReachabilityProbe(object):
+    """
+    In-process check whether the LPAR answers on the network, replacing
+    calls of the ping command
+
+    By default a TCP connection to the HTTPS port is opened: an accepted or
+    refused connection means the LPAR is up. With icmp, an echo request is
+    sent through an unprivileged ICMP socket first (Linux, if the group is in
+    net.ipv4.ping_group_range), falling back to TCP where that is not allowed.
+    The last result is kept, probes can run in the background.
+    """
+
+    def __init__(self, address, port=443, timeout=PROBE_TIMEOUT, icmp=False):
+        """
+        Parameters:
+          address (string): IP address or FQDN of the LPAR, optionally with :port
+          port (int): TCP port probed if address has none
+          timeout (float): Seconds to wait for an answer
+          icmp (bool): Try an ICMP echo request before the TCP connect
+        """
+        parts = urllib.parse.urlsplit("//" + address)
+        self.host = parts.hostname or address
+        self.port = parts.port or port
+        self.timeout = timeout
+        self.icmp = icmp
+        self.reachable = None
+        self.port_open = None
+        self.latency = None
+        self.checked = None
+        self._running = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "ReachabilityProbe(%s:%d, reachable=%s, port_open=%s)" % (
+            self.host,
+            self.port,
+            self.reachable,
+            self.port_open,
+        )
+
+    def _tcp(self):
+        """
+        Return (reachable, port_open), None for what could not be determined
+        """
+        try:
+            with socket.create_connection((self.host, self.port), self.timeout):
+                return True, True
+        except ConnectionRefusedError:
+            return True, False
+        except socket.timeout:
+            return None, None
+        except OSError as e:
+            log.debug("TCP probe of %s:%d: %s" % (self.host, self.port, e))
+            return False, False
+
+    @staticmethod
+    def _checksum(data):
+        if len(data) % 2:
+            data += b"\0"
+        total = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+        total = (total >> 16) + (total & 0xFFFF)
+        total += total >> 16
+        return ~total & 0xFFFF
+
+    def _icmp(self):
+        """
+        Return True if the LPAR answered an ICMP echo request, False if not,
+        None if unprivileged ICMP sockets are not available
+        """
+        try:
+            family, _, _, _, sockaddr = socket.getaddrinfo(
+                self.host, None, type=socket.SOCK_DGRAM
+            )[0]
+            if family == socket.AF_INET6:
+                protocol, request, reply = socket.IPPROTO_ICMPV6, 128, 129
+            else:
+                protocol, request, reply = socket.IPPROTO_ICMP, 8, 0
+            sock = socket.socket(family, socket.SOCK_DGRAM, protocol)
+        except (OSError, AttributeError) as e:
+            log.debug("ICMP probe not available: %s" % e)
+            return None
+        with sock:
+            sock.settimeout(self.timeout)
+            payload = b"aqtSSC"
+            header = struct.pack("!BBHHH", request, 0, 0, 0, 1)
+            packet = struct.pack(
+                "!BBHHH", request, 0, self._checksum(header + payload), 0, 1
+            )
+            try:
+                sock.sendto(packet + payload, sockaddr)
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    data = sock.recv(1024)
+                    if data and data[0] == reply:
+                        return True
+                    sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            except socket.timeout:
+                return False
+            except OSError as e:
+                log.debug("ICMP probe of %s: %s" % (self.host, e))
+                return None
+
+    def probe(self):
+        """
+        Probe the LPAR now and return whether it is reachable,
+        None if it did not answer in time
+        """
+        start = time.monotonic()
+        reachable = self._icmp() if self.icmp else None
+        reachable_tcp, port_open = self._tcp()
+        if reachable is None or reachable_tcp:
+            reachable = reachable_tcp
+        with self._lock:
+            self.reachable = reachable
+            self.port_open = port_open
+            self.latency = time.monotonic() - start
+            self.checked = time.monotonic()
+        log.debug("Probed %r in %.3fs" % (self, self.latency))
+        return reachable
+
+    def probe_async(self):
+        """
+        Probe in a background thread, return a Future of the result.
+        Concurrent calls share the running probe.
+        """
+        with self._lock:
+            if self._running is None:
+                self._running = Future()
+                threading.Thread(
+                    target=self._run, args=(self._running,), daemon=True
+                ).start()
+            return self._running
+
+    def _run(self, future):
+        try:
+            future.set_result(self.probe())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running = None
+
+    def cached(self, max_age=PROBE_MAX_AGE):
+        """
+        Return the result of the last probe if it is at most max_age seconds
+        old, None otherwise
+        """
+        with self._lock:
+            if self.checked is None or time.monotonic() - self.checked > max_age:
+                return None
+            return self.reachable
+
+
+class SSCHTTPAdapter(HTTPAdapter):
+    """
+    Keep-alive HTTP adapter holding the connection pool to one SSC LPAR
+    """
+
+    def __init__(self, stats, pool_size=DEFAULT_POOL_SIZE, ssl_context=None, **kwargs):
+        self._stats = stats
+        self._ssl_context = ssl_context
+        super(SSCHTTPAdapter, self).__init__(
+            pool_connections=1, pool_maxsize=pool_size, **kwargs
+        )
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        if self._ssl_context is not None:
+            pool_kwargs["ssl_context"] = self._ssl_context
+        self.poolmanager = _CountingPoolManager(
+            self._stats,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            **pool_kwargs,
+        )
+
+    def evict_idle(self):
+        """
+        Close the idle connections of the pools and return their number.
+        Connections in use by requests of other threads are not in the
+        pools and stay open, their slots are refilled with placeholders
+        so the pools keep their size.
+        """
+        closed = 0
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            idle = list()
+            while True:
+                try:
+                    idle.append(pool.pool.get(block=False))
+                except queue.Empty:
+                    break
+            for conn in idle:
+                if conn is not None:
+                    conn.close()
+                    closed += 1
+                try:
+                    pool.pool.put(None, block=False)
+                except queue.Full:
+                    break
+        return closed
+
+
+class TokenCache(object):
+    """
+    Opt-in on-disk cache of API tokens, shared by consecutive script invocations
+
+    Tokens are stored per LPAR address and user together with the time they
+    were issued and their assumed expiry. The file is only readable by its
+    owner (0600). Files with wider permissions, of another owner or with
+    unexpected content are ignored.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    @staticmethod
+    def _key(address, username):
+        return "{0}@{1}".format(username, address)
+
+    def _read(self):
+        """
+        Read and validate the cache file, return the dict of cached tokens
+        """
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return {}
+        with os.fdopen(fd, "r") as file:
+            st = os.fstat(fd)
+            if hasattr(os, "getuid") and st.st_uid != os.getuid():
+                log.warning("Ignoring token cache %s: wrong owner" % self.path)
+                return {}
+            if st.st_mode & 0o077:
+                log.warning("Ignoring token cache %s: not mode 0600" % self.path)
+                return {}
+            try:
+                data = json.load(file)
+            except ValueError:
+                log.warning("Ignoring token cache %s: invalid content" % self.path)
+                return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        tokens = data.get("tokens")
+        return tokens if isinstance(tokens, dict) else {}
+
+    def _write(self, tokens):
+        """
+        Atomically replace the cache file, the new file is created with mode 0600
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".aqt-token-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                os.fchmod(file.fileno(), 0o600)
+                json.dump({"version": self.VERSION, "tokens": tokens}, file)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, address, username, min_validity=0):
+        """
+        Return the cached (token, issued) for the LPAR user,
+        None if there is no token valid for at least 'min_validity' seconds
+        """
+        entry = self._read().get(self._key(address, username))
+        try:
+            token = entry["token"]
+            issued = float(entry["issued"])
+            expires = float(entry["expires"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not isinstance(token, str) or not token:
+            return None
+        now = time.time()
+        if issued > now or expires - min_validity <= now:
+            return None
+        log.debug("Using cached API token for %s" % self._key(address, username))
+        return (token, issued)
+
+    def store(self, address, username, token, issued, expires):
+        try:
+            tokens = self._read()
+            tokens[self._key(address, username)] = {
+                "token": token,
+                "issued": issued,
+                "expires": expires,
+            }
+            self._write(tokens)
+        except OSError as e:
+            log.warning("Cannot write token cache %s: %s" % (self.path, e))
+
+    def remove(self, address, username):
+        try:
+            tokens = self._read()
+            if tokens.pop(self._key(address, username), None) is not None:
+                self._write(tokens)
+        except OSError as e:
+            log.warning("Cannot write token cache %s: %s" % (self.path, e))
+
+
+def _token_lifetime(token):
+    """
+    Return the seconds a JWT token is valid according to its iat and exp
+    claims, None for other tokens
+    """
+    parts = token.split(".") if isinstance(token, str) else ()
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode("ascii")))
+        lifetime = claims["exp"] - claims["iat"]
+    except (ValueError, TypeError, KeyError):
+        return None
+    return lifetime if lifetime > 0 else None
+
+
+class ApiTokenManager(object):
+    """
+    Keep the API token of one LPAR user valid
+
+    The token is requested on first use and renewed when it gets close to its
+    lifetime, either lazily before the next request or from a background
+    thread while a long running operation is in progress (see keepalive).
+    The lifetime is taken from the token if it is a JWT with an expiry,
+    otherwise it is assumed. The API object invalidates and renews the token
+    after a 401. With a TokenCache, valid tokens of earlier processes are
+    reused.
+    """
+
+    def __init__(
+        self,
+        login,
+        lifetime=DEFAULT_TOKEN_LIFETIME,
+        renew_margin=DEFAULT_TOKEN_RENEW_MARGIN,
+        cache=None,
+    ):
+        """
+        Parameters:
+          login (callable): Performs the login and returns a new token
+          lifetime (int): Seconds a token is assumed to stay valid if it does
+                          not state its expiry
+          renew_margin (int): Seconds before expiry at which a token is renewed
+          cache (TokenCache): Optional on-disk cache shared between processes
+        """
+        self._login = login
+        self.lifetime = lifetime
+        self.renew_margin = renew_margin
+        self.cache = cache
+        # (address, username) the cached token belongs to
+        self.cache_key = None
+        self.token = None
+        self.issued = None
+        # lifetime of the current token
+        self.token_lifetime = lifetime
+        self.logins = 0
+        self._lock = threading.RLock()
+        self._keepalive_users = 0
+        self._keepalive_stop = None
+
+    def age(self):
+        """
+        Seconds since the current token was issued, None without token
+        """
+        if self.token is None:
+            return None
+        return time.time() - self.issued
+
+    def needs_renewal(self):
+        age = self.age()
+        return age is None or age >= self.token_lifetime - self.renew_margin
+
+    def renew(self):
+        """
+        Log in and return the new token
+        """
+        with self._lock:
+            token = self._login()
+            self.token = token
+            self.issued = time.time()
+            self.token_lifetime = _token_lifetime(token) or self.lifetime
+            self.logins += 1
+            log.debug("New API token (login #%d)" % self.logins)
+            if self.cache is not None and self.cache_key is not None:
+                self.cache.store(
+                    *self.cache_key,
+                    token=token,
+                    issued=self.issued,
+                    expires=self.issued + self.token_lifetime,
+                )
+            return token
+
+    def _load_cached(self):
+        if self.cache is None or self.cache_key is None:
+            return
+        cached = self.cache.load(*self.cache_key, min_validity=self.renew_margin)
+        if cached is not None:
+            self.token, self.issued = cached
+            self.token_lifetime = _token_lifetime(self.token) or self.lifetime
+
+    def get(self):
+        """
+        Return a valid token, logging in if there is none or it is about to expire
+        """
+        with self._lock:
+            if self.token is None:
+                self._load_cached()
+            if self.needs_renewal():
+                return self.renew()
+            return self.token
+
+    def invalidate(self, token=None):
+        """
+        Forget the current token, e.g. after the server rejected it.
+        If 'token' is given, only forget it if it is still the current one.
+        """
+        with self._lock:
+            if token is None or token == self.token:
+                self.token = None
+                self.issued = None
+                if self.cache is not None and self.cache_key is not None:
+                    self.cache.remove(*self.cache_key)
+
+    def _keepalive_loop(self, stop):
+        while True:
+            with self._lock:
+                age = self.age()
+                wait = 1
+                if age is not None:
+                    wait = max(self.token_lifetime - self.renew_margin - age, 1)
+            if stop.wait(wait):
+                return
+            try:
+                self.get()
+            except Exception as e:
+                # the next request retries the login and reports the error
+                log.debug("Background token renewal failed: %s" % e)
+
+    @contextlib.contextmanager
+    def keepalive(self):
+        """
+        Context manager renewing the token in the background before it expires
+
+        Only the requests sent after a renewal use the new token, a request
+        already in flight (e.g. a long upload) keeps the header it was sent
+        with. The renewal spares the requests following a long operation a
+        login, it does not extend the token of the running request.
+        """
+        with self._lock:
+            self._keepalive_users += 1
+            if self._keepalive_users == 1:
+                self._keepalive_stop = threading.Event()
+                threading.Thread(
+                    target=self._keepalive_loop,
+                    args=(self._keepalive_stop,),
+                    name="aqtSSC-token-keepalive",
+                    daemon=True,
+                ).start()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._keepalive_users -= 1
+                if self._keepalive_users == 0:
+                    self._keepalive_stop.set()
+                    self._keepalive_stop = None
+
+
+class _CacheEntry(object):
+    """
+    Status, headers and body of a cached response. Every hit gets its own
+    requests.Response built from them, so callers never share one.
+    """
+
+    def __init__(self, response, ttl):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.content
+        self.encoding = response.encoding
+        self.url = response.url
+        self.renew(ttl)
+        self.validators = dict()
+        if response.headers.get("ETag"):
+            self.validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            self.validators["If-Modified-Since"] = response.headers["Last-Modified"]
+
+    def renew(self, ttl):
+        self.expires = time.monotonic() + ttl
+
+    def fresh(self):
+        return time.monotonic() < self.expires
+
+    def response(self):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.reason = "OK"
+        response.headers = requests.structures.CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.url = self.url
+        response._content = self.content
+        response._content_consumed = True
+        return response
+
+
+class ResponseCache(object):
+    """
+    Cache of GET responses of read-only API endpoints
+
+    Responses are reused for the TTL of their endpoint, afterwards they are
+    revalidated with the ETag / Last-Modified validators of the LPAR if it sent
+    any. Only status, headers and body are kept, streamed GETs are never
+    cached. SecureServiceContainerAPI clears the whole cache after every
+    authenticated POST or PUT, not only after the lifecycle calls (reboot,
+    switch_to_installer, import_configuration, quiesce_force): which endpoints
+    a request changes is not known, so state is never reused across any
+    change. Logins do not clear the cache.
+    """
+
+    def __init__(self, ttls=None, max_entry_size=CACHE_MAX_ENTRY_SIZE):
+        """
+        Parameters:
+          ttls (dict): Seconds per URL path, replacing DEFAULT_CACHE_TTLS entries,
+                       None or 0 disables caching of the path
+          max_entry_size (int): Largest response body cached in bytes
+        """
+        self.ttls = dict(DEFAULT_CACHE_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entry_size = max_entry_size
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._entries = dict()
+        self._lock = threading.Lock()
+
+    def ttl(self, url):
+        """
+        Return the TTL of the endpoint of url, None if it is not cached
+        """
+        return self.ttls.get(urllib.parse.urlsplit(url).path) or None
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key, response, ttl):
+        """
+        Cache the body of the response if it is small enough and ttl is not 0.
+        Returns the response.
+        """
+        try:
+            length = int(response.headers.get("Content-Length"))
+        except (TypeError, ValueError):
+            # missing, or e.g. joined by a proxy: the size is unknown
+            length = None
+        if not ttl or length is None or length > self.max_entry_size:
+            self.discard(key)
+            return response
+        entry = _CacheEntry(response, ttl)
+        with self._lock:
+            self._entries[key] = entry
+        return response
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                log.debug("Clearing %d cached responses" % len(self._entries))
+            self._entries.clear()
+
+
+class TimeoutConfig(object):
+    """
+    Connect and read timeouts of the API requests per operation class
+    """
+
+    def __init__(self, timeouts=None, classes=TIMEOUT_CLASSES):
+        """
+        Parameters:
+          timeouts (dict): (connect, read) tuples per class, replacing DEFAULT_TIMEOUTS entries
+          classes (tuple): (fnmatch pattern of the URL path, class) pairs
+        """
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.classes = classes
+
+    def classify(self, url):
+        """
+        Return the operation class of url
+        """
+        path = urllib.parse.urlsplit(url).path
+        for pattern, name in self.classes:
+            if fnmatch.fnmatchcase(path, pattern):
+                return name
+        return "default"
+
+    def for_url(self, url):
+        """
+        Return the (connect, read) timeout for a request to url
+        """
+        name = self.classify(url)
+        return self.timeouts.get(name, self.timeouts["default"])
+
+    def override(self, spec):
+        """
+        Apply a command line override "[CLASS=]CONNECT[,READ]",
+        without CLASS it applies to all classes
+
+        Raises:
+          ValueError if spec is invalid
+        """
+        name, _, values = spec.rpartition("=")
+        values = [float(value) for value in values.split(",")]
+        if len(values) not in (1, 2) or min(values) <= 0:
+            raise ValueError("Invalid timeout " + spec)
+        if name and name not in self.timeouts:
+            raise ValueError(
+                "Unknown timeout class %s, use one of %s"
+                % (name, ", ".join(sorted(self.timeouts)))
+            )
+        for key in [name] if name else list(self.timeouts):
+            connect, read = self.timeouts[key]
+            self.timeouts[key] = (values[0], values[1] if len(values) > 1 else read)
+
+
+class TokenBucket(object):
+    """
+    Token bucket allowing rate bytes per second with bursts of up to burst bytes.
+    Not thread-safe, BandwidthLimiter serializes the access.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate / 4, DEFAULT_UPLOAD_CHUNK_SIZE))
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, count):
+        """
+        Seconds until count bytes may be sent. Requests larger than the burst
+        only wait for a full bucket and leave a debt paid off by later requests.
+        """
+        needed = min(count, self.burst)
+        if self.tokens >= needed:
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, count):
+        self.tokens -= count
+
+
+class _Transfer(object):
+    """
+    Throttle of one upload (for UploadStream), measuring the rate it achieves
+    """
+
+    def __init__(self, limiter, address, priority):
+        self.address = address
+        self.priority = priority
+        self.sent = 0
+        self.started = None
+        self.last = None
+        self._limiter = limiter
+
+    def __call__(self, count):
+        if self.started is None:
+            self.started = time.monotonic()
+        self._limiter.consume(self.address, count, self.priority)
+        self.sent += count
+        self.last = time.monotonic()
+
+    @property
+    def rate(self):
+        """
+        Bytes per second from the first chunk asked for to the latest chunk sent
+        """
+        if self.started is None or self.last <= self.started:
+            return 0.0
+        return self.sent / (self.last - self.started)
+
+    def close(self):
+        """
+        End the transfer, it no longer counts for achieved_rate
+        """
+        self._limiter._end(self)
+
+
+class BandwidthLimiter(object):
+    """
+    Shares upload bandwidth between all uploads of a process
+
+    Uploads are limited by a global rate and by a rate per LPAR (token
+    buckets, None for no limit). While uploads of a higher priority class
+    wait for global bandwidth, lower classes wait too, so they only get
+    what the higher classes leave. Every upload gets its own throttle
+    measuring the rate it achieves.
+    """
+
+    def __init__(self, global_rate=None, lpar_rate=None):
+        """
+        Parameters:
+          global_rate (float): Bytes per second of all uploads together
+          lpar_rate (float): Bytes per second of the uploads to one LPAR
+        """
+        self._condition = threading.Condition()
+        self._global = None
+        self._lpar_rate = None
+        self._limits = None
+        self._buckets = dict()
+        self._waiting = collections.Counter()
+        self._transfers = set()
+        if global_rate or lpar_rate:
+            self.configure(global_rate, lpar_rate)
+
+    def configure(self, global_rate=None, lpar_rate=None):
+        """
+        Set the limits. They are set once, so an upload never sees the limits
+        change under it, later calls must ask for the same limits.
+
+        Raises:
+          ValueError if different limits are set already
+        """
+        limits = (global_rate or None, lpar_rate or None)
+        with self._condition:
+            if self._limits is not None:
+                if limits != self._limits:
+                    raise ValueError(
+                        "Bandwidth limits are set to %s/%s bytes per second "
+                        "already, cannot change them to %s/%s" % (self._limits + limits)
+                    )
+                return
+            self._limits = limits
+            self._global = TokenBucket(global_rate) if global_rate else None
+            self._lpar_rate = lpar_rate
+            self._condition.notify_all()
+
+    def _bucket(self, address):
+        if not self._lpar_rate:
+            return None
+        if address not in self._buckets:
+            self._buckets[address] = TokenBucket(self._lpar_rate)
+        return self._buckets[address]
+
+    def consume(self, address, count, priority="normal"):
+        """
+        Wait until count bytes may be sent to the LPAR at address
+        """
+        level = UPLOAD_PRIORITIES[priority]
+        with self._condition:
+            waiting = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    buckets = [b for b in (self._global, self._bucket(address)) if b]
+                    for bucket in buckets:
+                        bucket.refill(now)
+                    higher = any(self._waiting[l] for l in range(level))
+                    wait = max([b.wait_time(count) for b in buckets] or [0])
+                    if wait == 0 and not higher:
+                        for bucket in buckets:
+                            bucket.take(count)
+                        break
+                    # only waiting for global bandwidth holds back lower classes
+                    global_wait = (
+                        self._global is not None and self._global.wait_time(count) > 0
+                    )
+                    if global_wait != waiting:
+                        self._waiting[level] += 1 if global_wait else -1
+                        waiting = global_wait
+                        if not waiting:
+                            self._condition.notify_all()
+                    # held back by a higher class only: sleep until it is served
+                    self._condition.wait(wait if wait > 0 else None)
+            finally:
+                if waiting:
+                    self._waiting[level] -= 1
+                    self._condition.notify_all()
+
+    def throttle(self, address, priority="normal"):
+        """
+        Return the throttle of a new upload to address, a callable for
+        UploadStream. Close it when the upload is done.
+        """
+        if priority not in UPLOAD_PRIORITIES:
+            raise ValueError(
+                "Unknown upload priority %s, use one of %s"
+                % (priority, ", ".join(UPLOAD_PRIORITIES))
+            )
+        transfer = _Transfer(self, address, priority)
+        with self._condition:
+            self._transfers.add(transfer)
+        return transfer
+
+    def _end(self, transfer):
+        with self._condition:
+            self._transfers.discard(transfer)
+
+    def achieved_rate(self, address=None):
+        """
+        Bytes per second of the running uploads to address
+        (default: to all LPARs), the sum of their achieved rates
+        """
+        with self._condition:
+            transfers = list(self._transfers)
+        return sum(
+            transfer.rate
+            for transfer in transfers
+            if address is None or transfer.address == address
+        )
+
+
+_shared_bandwidth_limiter = BandwidthLimiter()
+
+
+def shared_bandwidth_limiter(global_rate=None, lpar_rate=None):
+    """
+    Return the bandwidth limiter shared by all uploads of this process,
+    configured with the given limits (bytes per second) by the first call
+
+    Raises:
+      ValueError if an earlier call set different limits
+    """
+    _shared_bandwidth_limiter.configure(global_rate, lpar_rate)
+    return _shared_bandwidth_limiter
+
+
+class UploadProgress(object):
+    """
+    Progress of an upload: bytes sent, average and rolling throughput, ETA
+    """
+
+    def __init__(self, total, window=UPLOAD_LOG_INTERVAL):
+        """
+        Parameters:
+          total (int): Size of the upload in bytes, None if unknown
+          window (int): Seconds the rolling throughput is averaged over
+        """
+        self.total = total
+        self.sent = 0
+        self.window = window
+        self.started = time.monotonic()
+        self.finished = None
+        self._samples = collections.deque([(self.started, 0)])
+
+    def update(self, count):
+        now = time.monotonic()
+        self.sent += count
+        self._samples.append((now, self.sent))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+        if self.total is not None and self.sent >= self.total:
+            self.finished = now
+
+    def finish(self):
+        """
+        Mark an upload of unknown size as complete, its size is now known
+        """
+        self.total = self.sent
+        self.finished = time.monotonic()
+
+    def restart(self):
+        """
+        Start over, e.g. when the upload is replayed
+        """
+        self.__init__(self.total, self.window)
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def percent(self):
+        if self.total is None:
+            return None
+        return 100.0 * self.sent / self.total if self.total else 100.0
+
+    @property
+    def rate(self):
+        """
+        Average bytes per second since the start
+        """
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def rolling_rate(self):
+        """
+        Bytes per second during the last window seconds
+        """
+        (start, sent_start), (end, sent_end) = self._samples[0], self._samples[-1]
+        if end <= start:
+            return self.rate
+        return (sent_end - sent_start) / (end - start)
+
+    @property
+    def eta(self):
+        """
+        Seconds until the upload completes at the rolling rate, None if unknown
+        """
+        rate = self.rolling_rate
+        if rate <= 0 or self.total is None:
+            return None
+        return (self.total - self.sent) / rate
+
+    def __str__(self):
+        if self.total is None:
+            return "%.1f MB, %.1f MB/s" % (self.sent / 1e6, self.rolling_rate / 1e6)
+        eta = self.eta
+        return "%.1f/%.1f MB (%3.0f%%), %.1f MB/s, ETA %s" % (
+            self.sent / 1e6,
+            self.total / 1e6,
+            self.percent,
+            self.rolling_rate / 1e6,
+            datetime.timedelta(seconds=int(eta)) if eta is not None else "?",
+        )
+
+
+class ImageFile(object):
+    """
+    Image read from an archive member or decompressed on the fly,
+    see open_image. Behaves like the binary file of the image, size is
+    its uncompressed size if the package records it, None otherwise.
+    """
+
+    def __init__(self, file, size, name, resources):
+        self._file = file
+        self.size = size
+        self.name = name
+        self._resources = resources
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def fileno(self):
+        # the descriptor is the one of the package, not of the image
+        raise io.UnsupportedOperation("fileno")
+
+    def seekable(self):
+        try:
+            return self._file.seekable()
+        except (AttributeError, OSError, ValueError):
+            return False
+
+    def close(self):
+        self._resources.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _image_format(path):
+    name = os.path.basename(path).lower()
+    for suffix, kind in sorted(ARCHIVE_FORMATS, key=lambda f: -len(f[0])):
+        if name.endswith(suffix):
+            return kind
+    return None
+
+
+def _zstd_reader(file):
+    if zstandard is None:
+        raise Exception("Reading zstd images needs the zstandard package")
+    header = file.read(18)
+    file.seek(0)
+    size = None
+    try:
+        size = zstandard.frame_content_size(header)
+    except zstandard.ZstdError:
+        pass
+    if size is not None and size < 0:
+        size = None
+    reader = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
+    return reader, size
+
+
+def _pick_member(names, member, package):
+    if member is not None:
+        if member not in names:
+            raise Exception("%s has no member %s" % (package, member))
+        return member
+    if len(names) != 1:
+        raise Exception(
+            "%s has %d members, choose the image from: %s"
+            % (package, len(names), ", ".join(names))
+        )
+    return names[0]
+
+
+def open_image(path, member=None):
+    """
+    Open an image file for upload, also from inside an image package
+    without extracting it to disk. Packages are recognized by their name
+    (ARCHIVE_FORMATS): zip and tar archives (also gz, xz or zstd compressed),
+    and gz, xz or zstd compressed images. zstd needs the zstandard package.
+
+    Parameters:
+      path (str): Image file or image package
+      member (str): Name of the image in an archive (default: its only file,
+                    the first file of tar archives, which are read as a stream)
+
+    Returns:
+      The binary file of the image, for packages an ImageFile
+
+    Raises:
+      Exception if the archive member cannot be determined
+    """
+    kind = _image_format(path)
+    if kind is None:
+        return open(path, "rb")
+    resources = contextlib.ExitStack()
+    try:
+        size = None
+        if kind == "zip":
+            archive = resources.enter_context(zipfile.ZipFile(path))
+            names = [i.filename for i in archive.infolist() if not i.is_dir()]
+            member = _pick_member(names, member, path)
+            size = archive.getinfo(member).file_size
+            file = resources.enter_context(archive.open(member))
+        elif kind in ("tar", "tar.zst"):
+            if kind == "tar.zst":
+                raw, _ = _zstd_reader(resources.enter_context(open(path, "rb")))
+                archive = tarfile.open(fileobj=resources.enter_context(raw), mode="r|")
+            else:
+                # stream mode, the member is read while the archive is scanned
+                archive = tarfile.open(path, mode="r|*")
+            resources.enter_context(archive)
+            info = None
+            files = list()
+            for entry in archive:
+                if not entry.isfile():
+                    continue
+                if member is None or entry.name == member:
+                    info = entry
+                    break
+                files.append(entry.name)
+            if info is None:
+                raise Exception(
+                    "%s has no member %s, it contains: %s"
+                    % (path, member, ", ".join(files))
+                )
+            if member is None:
+                log.info("Uploading %s, the first file of %s" % (info.name, path))
+            member = info.name
+            size = info.size
+            file = archive.extractfile(info)
+        elif kind == "gz":
+            file = resources.enter_context(gzip.open(path, "rb"))
+        elif kind == "xz":
+            file = resources.enter_context(lzma.open(path, "rb"))
+        else:
+            file, size = _zstd_reader(resources.enter_context(open(path, "rb")))
+            resources.enter_context(file)
+    except Exception:
+        resources.close()
+        raise
+    name = path if member is None else "%s(%s)" % (path, member)
+    log.debug("Image %s: %s bytes" % (name, size if size is not None else "unknown"))
+    return ImageFile(file, size, name, resources)
+
+
+class UploadStream(object):
+    """
+    Request body sending an image in chunks of a fixed size
+
+    At most one chunk is held in memory, whether the image is given as a
+    file name, an open binary file or a bytes-like object (which is sent in
+    slices without copying). The length is known up front, so requests sends
+    a Content-Length header instead of chunked transfer encoding.
+    Seekable sources can be replayed (e.g. after a 401).
+    Images of unknown size (ImageFile of a compressed image) are sent with
+    chunked transfer encoding instead, one chunk is read ahead to recognize
+    the end of the image.
+
+    With a checksum, the image is hashed while it is sent. The last chunk is
+    held back until the digest is verified, so on a mismatch the LPAR never
+    receives a complete image and ChecksumMismatch is raised.
+
+    With use_mmap, image files are memory-mapped and sent in large slices
+    straight from the page cache, saving the copy into a Python buffer and
+    most of the per-chunk overhead. Sources which cannot be mapped (pipes,
+    in-memory files, empty files) fall back to reading.
+    """
+
+    def __init__(
+        self,
+        source,
+        chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE,
+        progress=None,
+        use_mmap=False,
+        checksum=None,
+        throttle=None,
+    ):
+        """
+        Parameters:
+          source (str, file or bytes): Image file name, binary file or image data
+          chunk_size (int): Bytes read and sent at a time
+          progress (callable): Called with the UploadProgress after every chunk
+          use_mmap (bool): Send image files from a memory mapping
+          checksum (string): Expected CHECKSUM_ALGORITHM hex digest of the image
+          throttle (callable): Called with the size of every chunk before it is
+                               sent, blocks to limit the bandwidth
+        """
+        self.chunk_size = chunk_size
+        self.callback = progress
+        self.throttle = throttle
+        self.checksum = checksum.lower() if checksum else None
+        self._hash = hashlib.new(CHECKSUM_ALGORITHM) if checksum else None
+        self._owned = None
+        self._mmap = None
+        # exception reading or verifying the image during the last send
+        self.error = None
+        if isinstance(source, (str, os.PathLike)):
+            source = self._owned = open(source, "rb")
+        if use_mmap and not isinstance(
+            source, (bytes, bytearray, memoryview, ImageFile)
+        ):
+            self._mmap = self._map(source)
+            if self._mmap is not None:
+                source = memoryview(self._mmap)[source.tell() :]
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._data = memoryview(source).cast("B")
+            self._file = None
+            self._start = 0
+            size = len(self._data)
+        else:
+            self._data = None
+            self._file = source
+            self._start = source.tell() if self._seekable() else 0
+            if isinstance(source, ImageFile):
+                size = source.size
+            else:
+                size = self._file_size(source) - self._start
+        self.progress = UploadProgress(size)
+        self._position = 0
+        self._logged = self.progress.started
+
+    @staticmethod
+    def _map(source):
+        """
+        Return a read-only memory mapping of the file, None if it cannot be mapped
+        """
+        try:
+            mapping = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation) as e:
+            log.debug("Cannot memory-map image, reading it instead: %s" % e)
+            return None
+        if hasattr(mapping, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        return mapping
+
+    @staticmethod
+    def _file_size(source):
+        try:
+            return os.fstat(source.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            if hasattr(source, "__len__"):
+                return len(source)
+            position = source.tell()
+            size = source.seek(0, io.SEEK_END)
+            source.seek(position)
+            return size
+
+    def _seekable(self):
+        try:
+            return self._file.seekable()
+        except AttributeError:
+            return False
+
+    def __len__(self):
+        # requests subtracts tell() itself
+        return self.progress.total
+
+    @property
+    def size_known(self):
+        return self.progress.total is not None
+
+    def body(self):
+        """
+        Return the request body: the stream itself, or for an image of unknown
+        size a generator, which requests sends with chunked transfer encoding
+        """
+        return self if self.size_known else iter(self)
+
+    def seekable(self):
+        return self._data is not None or self._seekable()
+
+    def tell(self):
+        return self._position
+
+    def seek(self, position):
+        """
+        Restart the upload at position (bytes from the start of the image)
+        """
+        if self._hash is not None:
+            if position != 0:
+                raise ValueError("Cannot verify the checksum of a resumed upload")
+            self._hash = hashlib.new(CHECKSUM_ALGORITHM)
+        if self._file is not None:
+            self._file.seek(self._start + position)
+        self._position = position
+        self.progress.restart()
+        self.progress.sent = position
+
+    def _chunks(self):
+        if self._data is not None:
+            while self._position < len(self._data):
+                yield self._data[self._position : self._position + self.chunk_size]
+            return
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        readinto = None
+        if self.size_known:
+            # the chunks read ahead for an unknown size need their own buffers
+            readinto = getattr(self._file, "readinto", None)
+        while True:
+            if readinto is not None:
+                count = readinto(buffer)
+                chunk = view[:count]
+            else:
+                chunk = self._file.read(self.chunk_size)
+                count = len(chunk)
+            if not count:
+                return
+            yield chunk
+
+    def _last_chunks(self):
+        """
+        Yield the chunks with a flag marking the last one
+        """
+        if self.size_known:
+            for chunk in self._chunks():
+                yield chunk, self._position + len(chunk) >= self.progress.total
+            return
+        previous = None
+        for chunk in self._chunks():
+            if previous is not None:
+                yield previous, False
+            previous = chunk
+        if previous is not None:
+            yield previous, True
+
+    def _verify(self, chunk, last):
+        self._hash.update(chunk)
+        if not last:
+            return
+        digest = self._hash.hexdigest()
+        if digest != self.checksum:
+            raise ChecksumMismatch(
+                "Image %s checksum %s does not match the expected %s, upload aborted"
+                % (CHECKSUM_ALGORITHM, digest, self.checksum)
+            )
+        log.info("Image %s checksum verified: %s" % (CHECKSUM_ALGORITHM, digest))
+
+    def __iter__(self):
+        self.error = None
+        chunks = self._send()
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            except Exception as e:
+                # requests reports it as a connection error, keep the cause
+                self.error = e
+                raise
+            yield chunk
+
+    def _send(self):
+        """
+        Yield the chunks to send, raises if the image cannot be read or verified
+        """
+        for chunk, last in self._last_chunks():
+            if self._hash is not None:
+                # raises before the last chunk is sent
+                self._verify(chunk, last)
+            if self.throttle is not None:
+                self.throttle(len(chunk))
+            # the chunk is sent before the next one is read into the buffer
+            yield chunk
+            self._position += len(chunk)
+            self.progress.update(len(chunk))
+            if self.callback is not None:
+                self.callback(self.progress)
+            now = time.monotonic()
+            if now - self._logged >= UPLOAD_LOG_INTERVAL:
+                self._logged = now
+                log.info("Upload: %s" % self.progress)
+        if not self.size_known:
+            if self._hash is not None and self._position == 0:
+                self._verify(b"", True)
+            self.progress.finish()
+            if self.callback is not None:
+                self.callback(self.progress)
+        if self._position != self.progress.total:
+            raise IOError(
+                "Image size changed during upload, sent %d of %d bytes"
+                % (self._position, self.progress.total)
+            )
+        log.info(
+            "Upload: %.1f MB sent in %.1fs, %.1f MB/s"
+            % (
+                self.progress.sent / 1e6,
+                self.progress.elapsed,
+                self.progress.rate / 1e6,
+            )
+        )
+
+    def close(self):
+        if self._mmap is not None:
+            self._data.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # slices still referenced somewhere, unmapped once they are gone
+                pass
+        if self._owned is not None:
+            self._owned.close()
+
+
+def image_checksum(source, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE):
+    """
+    Return the CHECKSUM_ALGORITHM hex digest of an image file (name or open
+    binary file, which is read from its current position and rewound
+    if it is seekable)
+    """
+    digest = hashlib.new(CHECKSUM_ALGORITHM)
+    with contextlib.ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            source = stack.enter_context(open(source, "rb"))
+        position = source.tell() if source.seekable() else None
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            count = source.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+        if source.seekable():
+            source.seek(position)
+    return digest.hexdigest()
+
+
+def prepare_image(image, checksum=None, verify=False, member=None):
+    """
+    Check an image file before it is uploaded, e.g. while the LPAR reboots
+    into the installer. Without verification, the kernel is asked to read
+    the image (or image package) ahead so the upload starts from the page cache.
+
+    Parameters:
+      image (str): Image file or image package name (see open_image)
+      checksum (string): Expected CHECKSUM_ALGORITHM digest of the image
+      verify (bool): Read the whole image and verify the checksum now
+      member (str): Name of the image in an archive
+
+    Returns:
+      The size of the image in bytes, None if the package does not record it
+
+    Raises:
+      Exception if the image is empty or does not match the checksum
+      OSError if the image cannot be read
+    """
+    with open_image(image, member) as file:
+        if isinstance(file, ImageFile):
+            size = file.size
+        else:
+            size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            raise Exception("Image %s is empty" % image)
+        if verify and checksum:
+            digest = image_checksum(file)
+            if digest != checksum.lower():
+                raise Exception(
+                    "Image checksum %s does not match the expected %s"
+                    % (digest, checksum)
+                )
+            log.debug("Image %s checksum verified: %s" % (image, digest))
+    if not verify and hasattr(os, "posix_fadvise"):
+        with open(image, "rb") as file:
+            os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+    return size
+
+
+def read_checksum_file(path, image):
+    """
+    Return the checksum of image from a checksum file, either in the
+    "<digest>  <file name>" format of sha256sum or in the BSD format
+    "SHA256 (<file name>) = <digest>". A file listing a single digest
+    applies to any image name.
+
+    Raises:
+      Exception if the file holds no checksum for image
+    """
+    name = os.path.basename(image)
+    found = list()
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.upper().startswith(CHECKSUM_ALGORITHM.upper() + " ("):
+                listed, _, digest = line[len(CHECKSUM_ALGORITHM) + 2 :].rpartition(
+                    ") = "
+                )
+            else:
+                digest, _, listed = line.partition(" ")
+                listed = listed.strip().lstrip("*")
+            found.append((os.path.basename(listed), digest.strip().lower()))
+    for listed, digest in found:
+        if listed == name:
+            return digest
+    if len(found) == 1:
+        return found[0][1]
+    raise Exception("No checksum for %s in %s" % (name, path))
+
+
+class ProgressPrinter(object):
+    """
+    Progress callback for uploads showing the progress on the terminal,
+    in place on a tty, otherwise as a line every interval seconds
+    """
+
+    def __init__(self, prefix="", out=None, interval=None, in_place=None):
+        self.prefix = prefix
+        self.out = out or sys.stdout
+        self.tty = self.out.isatty() if in_place is None else in_place
+        self.interval = interval or (0.5 if self.tty else UPLOAD_LOG_INTERVAL)
+        self._printed = None
+
+    def __call__(self, progress):
+        now = time.monotonic()
+        done = progress.finished is not None
+        if (
+            not done
+            and self._printed is not None
+            and now - self._printed < self.interval
+        ):
+            return
+        self._printed = now
+        line = self.prefix + str(progress)
+        if self.tty:
+            self.out.write("\r" + line.ljust(79) + ("\n" if done else ""))
+        else:
+            self.out.write(line + "\n")
+        self.out.flush()
+
+
+class _BroadcastBranch(object):
+    """
+    Read-only file object handing the chunks of an ImageBroadcast to one upload
+    """
+
+    _END = object()
+
+    def __init__(self, broadcast, index, buffer_chunks):
+        self.index = index
+        self.progress = None
+        self.error = None
+        self.closed = False
+        self._broadcast = broadcast
+        self._queue = queue.Queue(buffer_chunks)
+        self._done = False
+
+    def __len__(self):
+        return self._broadcast.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def seekable(self):
+        return False
+
+    def read(self, size=-1):
+        """
+        Return the next chunk of the image (of the broadcast chunk size),
+        an empty bytes object at its end
+        """
+        self._broadcast.start()
+        while not self._done:
+            if self.error is not None:
+                raise self.error
+            try:
+                chunk = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if chunk is self._END:
+                self._done = True
+                break
+            return chunk
+        return b""
+
+    def put(self, chunk, stall_timeout):
+        """
+        Queue a chunk, wait while the buffer is full. Detach the branch
+        if it does not make room for stall_timeout seconds.
+        """
+        stalled = time.monotonic()
+        while not self.closed and self.error is None:
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+            if stall_timeout is not None and time.monotonic() - stalled > stall_timeout:
+                self.fail(
+                    IOError(
+                        "Upload %d fell behind the others for more than %ds"
+                        % (self.index, stall_timeout)
+                    )
+                )
+
+    def finish(self, stall_timeout):
+        self.put(self._END, stall_timeout)
+
+    def fail(self, error):
+        self.error = error
+        self._drain()
+
+    def close(self):
+        self.closed = True
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class ImageBroadcast(object):
+    """
+    Read an image once and hand every chunk to several uploads
+
+    Each upload reads from its own branch (a file object for upload_image).
+    A background thread reads the image only when a branch asks for data and
+    queues every chunk to all branches. The queues are bounded, so memory
+    stays at about buffer_chunks * chunk_size per branch. The fastest upload
+    is at most that far ahead of the slowest; a branch whose buffer stays
+    full for stall_timeout is failed so the others go on.
+    With a checksum, the last chunk is only queued once the digest is verified.
+    """
+
+    def __init__(
+        self,
+        source,
+        count,
+        chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE,
+        buffer_chunks=DEFAULT_BROADCAST_BUFFER_CHUNKS,
+        checksum=None,
+        stall_timeout=DEFAULT_BROADCAST_STALL_TIMEOUT,
+    ):
+        """
+        Parameters:
+          source (str or file): Image file name or binary file
+          count (int): Number of branches (uploads)
+          chunk_size (int): Bytes read at a time
+          buffer_chunks (int): Chunks buffered per branch
+          checksum (string): Expected CHECKSUM_ALGORITHM hex digest of the image
+          stall_timeout (int): Seconds a branch may block the others,
+                               None waits for the slowest branch forever
+        """
+        self._owned = None
+        if isinstance(source, (str, os.PathLike)):
+            source = self._owned = open(source, "rb")
+        self._source = source
+        self.size = UploadStream._file_size(source) - source.tell()
+        self.chunk_size = chunk_size
+        self.checksum = checksum.lower() if checksum else None
+        self.stall_timeout = stall_timeout
+        self.branches = [
+            _BroadcastBranch(self, index, buffer_chunks) for index in range(count)
+        ]
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="image-broadcast", daemon=True
+                )
+                self._thread.start()
+
+    def _open_branches(self):
+        return [b for b in self.branches if not b.closed and b.error is None]
+
+    def _run(self):
+        digest = hashlib.new(CHECKSUM_ALGORITHM) if self.checksum else None
+        read = 0
+        try:
+            while self._open_branches():
+                chunk = self._source.read(self.chunk_size)
+                if not chunk:
+                    break
+                read += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                    if read >= self.size and digest.hexdigest() != self.checksum:
+                        raise ChecksumMismatch(
+                            "Image %s checksum %s does not match the expected %s, "
+                            "upload aborted"
+                            % (CHECKSUM_ALGORITHM, digest.hexdigest(), self.checksum)
+                        )
+                for branch in self._open_branches():
+                    branch.put(chunk, self.stall_timeout)
+            if read != self.size:
+                raise IOError(
+                    "Image size changed during upload, read %d of %d bytes"
+                    % (read, self.size)
+                )
+            for branch in self._open_branches():
+                branch.finish(self.stall_timeout)
+            log.debug("Image broadcast: %d bytes read once" % read)
+        except Exception as e:
+            for branch in self.branches:
+                branch.fail(e)
+
+    def close(self):
+        for branch in self.branches:
+            branch.close()
+        if self._thread is not None:
+            self._thread.join()
+        if self._owned is not None:
+            self._owned.close()
+
+
+def broadcast_upload(
+    uploads,
+    image,
+    chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE,
+    buffer_chunks=DEFAULT_BROADCAST_BUFFER_CHUNKS,
+    checksum=None,
+    stall_timeout=DEFAULT_BROADCAST_STALL_TIMEOUT,
+    progress=None,
+    deadline=None,
+):
+    """
+    Upload one image to several LPARs concurrently, reading it only once.
+    The boot devices of all LPARs are prepared (FCP discovery) first,
+    then all uploads start together.
+
+    Parameters:
+      uploads (list): (SecureServiceContainerAPI, LPARBootDevice) per LPAR
+      image (str or file): Image file name or binary file
+      chunk_size, buffer_chunks, checksum, stall_timeout: See ImageBroadcast
+      progress (callable): Called with (index, UploadProgress) after every chunk
+      deadline (Deadline): Time budget of every upload (default: of its API object)
+
+    Returns:
+      List with (response or exception, UploadProgress or None) per LPAR
+    """
+    broadcast = ImageBroadcast(
+        image, len(uploads), chunk_size, buffer_chunks, checksum, stall_timeout
+    )
+    ready = threading.Barrier(len(uploads))
+
+    def upload(index):
+        ssc, lpar_boot_device = uploads[index]
+        branch = broadcast.branches[index]
+
+        def report(upload_progress):
+            branch.progress = upload_progress
+            if progress is not None:
+                progress(index, upload_progress)
+
+        with branch:
+            try:
+                upload_url = ssc.prepare_upload(lpar_boot_device, deadline)
+            finally:
+                ready.wait()
+            response, _, _ = ssc.upload_image(
+                branch,
+                lpar_boot_device,
+                None,
+                deadline,
+                chunk_size=chunk_size,
+                progress=report,
+                upload_url=upload_url,
+            )
+            return response
+
+    results = list()
+    try:
+        with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+            futures = [executor.submit(upload, i) for i in range(len(uploads))]
+            for index, future in enumerate(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                results.append((result, broadcast.branches[index].progress))
+    finally:
+        broadcast.close()
+    return results
+
+
+def _with_token(header, token):
+    """
+    Return a copy of the header using the given API token
+    """
+    header = dict(header)
+    header["Authorization"] = "Bearer " + token
+    return header
+
+
+def _replay_position(data):
+    """
+    Check if request data can be sent a second time
+
+    Returns:
+      True for data held in memory, the current position for seekable files,
+      None if the data cannot be replayed (e.g. generators)
+    """
+    if data is None or isinstance(data, (str, bytes, bytearray, dict)):
+        return True
+    try:
+        if data.seekable():
+            return data.tell()
+    except (AttributeError, OSError, ValueError):
+        pass
+    return None
+
+
+class _JsonStream(object):
+    """
+    Incremental reader of a JSON document arriving in chunks
+
+    Only as much of the document is kept in memory as is needed to decode
+    the value at the current position.
+    """
+
+    _WHITESPACE = " \t\n\r"
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """
+        Append the next chunk to the buffer, return False at the end of the document
+        """
+        if self._eof:
+            return False
+        # drop what has been consumed already
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decoder.decode(chunk)
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character, None at the end of the document
+        """
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in self._WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, characters):
+        """
+        Consume the next character, which must be one of characters
+        """
+        c = self.peek()
+        if c is None or c not in characters:
+            raise ValueError(
+                "Invalid JSON: expected %r, got %r" % (characters, c or "end of data")
+            )
+        self._pos += 1
+        return c
+
+    def value(self):
+        """
+        Decode and consume the JSON value at the current position
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # incomplete value, or invalid JSON once all data has been read
+                if not self._fill():
+                    raise
+                continue
+            # a number could continue in the next chunk, only trust a value
+            # that is followed by another character
+            if end < len(self._buffer) or self._eof:
+                self._pos = end
+                return value
+            self._fill()
+
+
+def _iter_json_array(chunks, key):
+    """
+    Yield the items of the array stored under key in the top level object
+    of a JSON document, parsing it while it arrives
+
+    Parameters:
+      chunks (iterable): The JSON document as chunks of bytes
+      key (string): Name of the array in the top level object
+
+    Returns:
+      Generator of the decoded array items, nothing if the key does not exist
+
+    Raises:
+      ValueError if the document is not valid JSON
+    """
+    stream = _JsonStream(chunks)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        name = stream.value()
+        stream.expect(":")
+        if name == key and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                return
+            while True:
+                yield stream.value()
+                if stream.expect(",]") == "]":
+                    return
+        stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+class FcpTopologyIndex(object):
+    """
+    Index of the free FCP disks of the LPAR: udid -> FCP device -> active paths
+
+    The disks of several FCP devices are listed in parallel, and each device
+    is only listed again after it was invalidated. Upload and reboot can
+    look up the boot disk without scanning the SAN twice.
+    """
+
+    def __init__(self, fetch, max_workers=FCP_INDEX_MAX_WORKERS, include_all=False):
+        """
+        Parameters:
+          fetch (callable): Called with an FCP device, returns an iterable of
+                            its fcp-disks instances (e.g. iter_fcp_disks)
+          max_workers (int): FCP devices listed at the same time
+          include_all (bool): Index the disks of every status, not only the
+                              free ones
+        """
+        self._fetch = fetch
+        self.max_workers = max_workers
+        self.include_all = include_all
+        self._devices = dict()  # device -> list of disks
+        self._udids = dict()  # udid -> device -> disk
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def device_id(device):
+        """
+        Return the full bus ID of an FCP device, e.g. 0.0.9100 for 9100
+        """
+        if len(device) == 4:
+            return "0.0." + device
+        return device
+
+    @staticmethod
+    def udid(disk_id):
+        """
+        Return the 32 digit udid of an fcp-disks instance ID
+        """
+        if len(disk_id) == 33:
+            return disk_id[1:]
+        return disk_id
+
+    def _scan(self, device):
+        disks = list()
+        for instance in self._fetch(device):
+            if not self.include_all and instance.get("status") != "free":
+                continue
+            paths = [
+                (path["target"], path["lun"])
+                for path in instance.get("paths") or ()
+                if path.get("status") == "active"
+            ]
+            disks.append(
+                {
+                    "id": instance["id"],
+                    "udid": self.udid(instance["id"]),
+                    "status": instance.get("status"),
+                    "paths": paths,
+                }
+            )
+        return disks
+
+    def _store(self, device, disks):
+        with self._lock:
+            self._drop(device)
+            self._devices[device] = disks
+            for disk in disks:
+                self._udids.setdefault(disk["udid"], dict())[device] = disk
+
+    def _drop(self, device):
+        for disk in self._devices.pop(device, ()):
+            by_device = self._udids.get(disk["udid"], {})
+            by_device.pop(device, None)
+            if not by_device:
+                self._udids.pop(disk["udid"], None)
+
+    def refresh(self, devices):
+        """
+        List the disks of the FCP devices in parallel and replace their entries
+
+        Raises:
+          The first exception of a listing, the other devices are indexed anyway
+        """
+        devices = [self.device_id(device) for device in devices]
+        if not devices:
+            return
+        start = time.monotonic()
+        workers = min(len(devices), self.max_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (device, executor.submit(self._scan, device)) for device in devices
+            ]
+        error = None
+        for device, future in futures:
+            try:
+                self._store(device, future.result())
+            except Exception as e:
+                log.debug("FCP index: listing device %s failed: %s" % (device, e))
+                error = error or e
+        log.debug(
+            "FCP index: listed %d devices in %.2fs"
+            % (len(devices), time.monotonic() - start)
+        )
+        if error is not None:
+            raise error
+
+    def ensure(self, devices):
+        """
+        List the FCP devices which are not indexed yet
+        """
+        with self._lock:
+            missing = [
+                device
+                for device in map(self.device_id, devices)
+                if device not in self._devices
+            ]
+        self.refresh(missing)
+
+    def invalidate(self, devices=None):
+        """
+        Forget the disks of the FCP devices (default: all), e.g. after a
+        discovery or a reboot changed the SAN view of the LPAR
+        """
+        with self._lock:
+            if devices is None:
+                self._devices.clear()
+                self._udids.clear()
+            else:
+                for device in devices:
+                    self._drop(self.device_id(device))
+
+    def __contains__(self, device):
+        with self._lock:
+            return self.device_id(device) in self._devices
+
+    def disks(self, device):
+        """
+        Return the indexed disks of an FCP device as dicts with
+        id, udid, status and paths (list of (wwpn, lun) of the active paths)
+        """
+        with self._lock:
+            return list(self._devices.get(self.device_id(device), ()))
 
+    def paths(self, udid, devices=None):
+        """
+        Return the active paths to the disk as (wwpn, lun, device) tuples
 
-class LPARAccess(object):
+        Parameters:
+          udid (string): Disk in 32 digit hexadecimal format
+          devices (list): Only paths through these FCP devices (default: all)
+        """
+        if devices is not None:
+            devices = set(map(self.device_id, devices))
+        with self._lock:
+            by_device = dict(self._udids.get(self.udid(udid), {}))
+        return [
+            (wwpn, lun, device)
+            for device, disk in sorted(by_device.items())
+            if devices is None or device in devices
+            for wwpn, lun in disk["paths"]
+        ]
+
+
+class PathHealthStore(object):
     """
-    An object describing the target SSC LPAR
-    by address, username and password
+    Upload history of the FCP target ports, used to pick the path to a disk
+
+    For every target WWPN the uploads and failures are counted, and the
+    throughput and the completion latency (from the last byte sent to the
+    response) are averaged. With a path, the history is kept in a JSON file
+    shared by consecutive script invocations, without it only in memory.
     """
 
-    def __init__(self, address, username, password):
-        self.address = address
-        self.username = username
-        self.password = password
+    VERSION = 1
 
-    def set(self, address=None, username=None, password=None):
-        self.address = address
-        self.username = username
-        self.password = password
+    # serializes the read-modify-write cycles of all stores in the process
+    _file_lock = threading.Lock()
 
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path) if path else None
+        self._lock = threading.Lock()
+        self._entries = self._read()
 
-class LPARBootDevice(object):
+    def _read(self):
+        """
+        Read the health file, return the dict of entries per WWPN
+        """
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring path health file %s: %s" % (self.path, e))
+            return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        entries = data.get("targets")
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self, entries):
+        """
+        Atomically replace the health file
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".aqt-paths-")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump({"version": self.VERSION, "targets": entries}, file)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, wwpn):
+        with self._lock:
+            return dict(self._entries.get(wwpn.lower(), {}))
+
+    def _update(self, wwpn, change):
+        """
+        Apply change to the entry of the WWPN, merged with the file content
+        written by other processes in the meantime
+        """
+        wwpn = wwpn.lower()
+        with self._file_lock, self._lock:
+            if self.path is not None:
+                self._entries.update(self._read())
+            entry = dict(self._entries.get(wwpn, {}))
+            change(entry)
+            entry["updated"] = time.time()
+            self._entries[wwpn] = entry
+            if self.path is not None:
+                try:
+                    self._write(self._entries)
+                except OSError as e:
+                    log.warning("Cannot write path health file %s: %s" % (self.path, e))
+
+    @staticmethod
+    def _average(entry, name, value):
+        if entry.get(name) is None:
+            entry[name] = value
+        else:
+            entry[name] += PATH_HEALTH_WEIGHT * (value - entry[name])
+
+    def record_success(self, wwpn, size, duration, latency):
+        """
+        Record an upload of size bytes through the target port
+
+        Parameters:
+          duration (float): Seconds from the start of the upload to the response
+          latency (float): Seconds from the last byte sent to the response
+        """
+
+        def change(entry):
+            entry["uploads"] = entry.get("uploads", 0) + 1
+            if duration > 0:
+                self._average(entry, "throughput", size / duration)
+            self._average(entry, "latency", max(latency, 0.0))
+
+        self._update(wwpn, change)
+        log.debug("Path health of %s: %s" % (wwpn, self.get(wwpn)))
+
+    def record_failure(self, wwpn, error):
+        def change(entry):
+            entry["failures"] = entry.get("failures", 0) + 1
+            entry["last_failure"] = time.time()
+
+        self._update(wwpn, change)
+        log.info("Upload through target port %s failed: %s" % (wwpn, error))
+
+    def rank(self, paths):
+        """
+        Return the paths ordered from the healthiest to the least healthy
+
+        Paths are scored by their averaged throughput, weighted with their
+        success ratio. Target ports without throughput history get the best
+        throughput of the candidates so they are tried, ports which failed
+        within PATH_FAILURE_COOLDOWN come last. Ties are broken by the latency,
+        then randomly to spread the load.
+
+        Parameters:
+          paths (list): (wwpn, lun, device) tuples
+
+        Returns:
+          The sorted list of paths
+        """
+        paths = list(paths)
+        random.shuffle(paths)
+        entries = [self.get(path[0]) for path in paths]
+        known = [e["throughput"] for e in entries if e.get("throughput")]
+        best = max(known) if known else 1.0
+        now = time.time()
+
+        def key(index):
+            entry = entries[index]
+            uploads = entry.get("uploads", 0)
+            failures = entry.get("failures", 0)
+            ratio = (uploads + 1.0) / (uploads + failures + 2.0)
+            cooling = now - entry.get("last_failure", 0) < PATH_FAILURE_COOLDOWN
+            return (
+                cooling,
+                -ratio * entry.get("throughput", best),
+                entry.get("latency", 0),
+            )
+
+        return [paths[index] for index in sorted(range(len(paths)), key=key)]
+
+
+class RebootTracker(object):
     """
-    An object describing the target SSC LPAR boot device
-    wwpn and lun are only used for SCSI devices
+    Follow an LPAR through a reboot in phases, each detected by sub-second
+    probes: the LPAR goes down (its HTTPS port no longer accepts TCP
+    connections), its HTTPS port opens, the HTTPS server answers, the API
+    answers /appliance with 200 after a new login, and the appliance reports
+    the expected name. The duration of every phase is recorded in timings,
+    the end of every phase in the lifecycle history of the API object, which
+    predicts the time left. wait blocks, async_wait only runs the probes in
+    threads.
+
+    If the LPAR is not seen going down within REBOOT_DOWN_TIMEOUT (a reboot
+    quicker than the probes), the tracker goes on with the next phase.
+
+    With prewarm, the login of the API phase starts in a background thread
+    as soon as the HTTPS port is open, so the TLS handshake and the login
+    overlap the probes of the HTTPS server.
     """
 
-    def __init__(self, boot_device_id, boot_wwpn, boot_lun):
-        self.boot_device_id = boot_device_id
-        self.boot_wwpn = boot_wwpn
-        self.boot_lun = boot_lun
+    PHASES = (
+        ("down", "LPAR is down"),
+        ("tcp", "HTTPS port is open"),
+        ("https", "HTTPS server answers"),
+        ("api", "API is ready"),
+        ("appliance", "Appliance is started"),
+    )
 
-    def set(self, boot_device_id=None, boot_wwpn=None, boot_lun=None):
-        self.boot_device_id = boot_device_id
-        self.boot_wwpn = boot_wwpn
-        self.boot_lun = boot_lun
+    def __init__(
+        self,
+        api,
+        lpar_access,
+        expected_name=None,
+        interval=REBOOT_PROBE_INTERVAL,
+        down_timeout=REBOOT_DOWN_TIMEOUT,
+        prefix="",
+        prewarm=False,
+    ):
+        """
+        Parameters:
+          api (SecureServiceContainerAPI): API object of the LPAR
+          lpar_access (Object): Adress of the LPAR, username and password
+          expected_name (string): Appliance name to wait for, e.g.
+                                  APPLIANCE_INSTALLER (default: any)
+          interval (float): Seconds between the probes
+          down_timeout (float): Seconds to wait for the LPAR to go down
+          prefix (string): Printed in front of the progress messages
+          prewarm (bool): Log in once the HTTPS port is open
+        """
+        self.api = api
+        self.lpar_access = lpar_access
+        self.expected_name = expected_name
+        self.interval = interval
+        self.down_timeout = down_timeout
+        self.prefix = prefix
+        self.appliance_name = None
+        self.timings = collections.OrderedDict()
+        self.phase = None
+        self.what = "reboot" if expected_name is None else "reboot to " + expected_name
+        self.labels = api.lifecycle_labels()
+        self.prewarm = prewarm
+        self._logged_in = False
+        self._session = None
+        self._stopped = threading.Event()
+
+    def _prewarm_session(self):
+        """
+        Log in until it succeeds or the tracker stops, returns whether it did
+        """
+        while not self._stopped.is_set():
+            try:
+                self.api._renew_token()
+                log.debug("%sSession prewarmed" % self.prefix)
+                return True
+            except Exception as e:
+                log.debug("Login not possible yet: %s" % e)
+                self._stopped.wait(self.interval)
+        return False
 
-    def get_udid(self):
-        if self.boot_wwpn is not None and self.boot_lun is not None:
-            _wwpn = self.boot_wwpn
-            _lun = self.boot_lun
+    def _start_session(self):
+        self._session = Future()
+        threading.Thread(
+            target=self._run_session, args=(self._session,), daemon=True
+        ).start()
 
-            # Check for leading 0x in lun and wwpn
-            if _wwpn.startswith("0x") or _wwpn.startswith("0X"):
-                _wwpn = _wwpn[2:]
-            if _lun.startswith("0x") or _lun.startswith("0X"):
-                _lun = _lun[2:]
-            return _wwpn + _lun
+    def _run_session(self, future):
+        try:
+            future.set_result(self._prewarm_session())
+        except Exception as e:
+            future.set_exception(e)
 
-        return None
+    def _https(self):
+        return self.api.ping_appliance(REBOOT_HTTPS_TIMEOUT)
+
+    def _down(self):
+        return not self._tcp()
+
+    def _tcp(self):
+        self.api.reachability.probe()
+        return bool(self.api.reachability.port_open)
+
+    def _api(self):
+        try:
+            if not self._logged_in and self._session is not None:
+                if not self._session.done():
+                    # the login started when the port opened is still running
+                    return False
+                self._logged_in = self._session.result()
+            if not self._logged_in:
+                # after reboot, the API token needs to be re-established (new log in)
+                self.api._renew_token()
+                self._logged_in = True
+            return self._appliance_status()
+        except Exception as e:
+            log.debug("API not ready yet: %s" % e)
+            return False
+
+    def _appliance_status(self):
+        self.api.invalidate_cache()
+        resultCode, json, message = self.api.get_appliance_status()
+        if resultCode.status_code != 200:
+            log.debug("Appliance status %d" % resultCode.status_code)
+            return False
+        self.appliance_name = json["properties"]["name"]
+        self.api.appliance_version = json["properties"].get("version")
+        return True
+
+    def _appliance(self):
+        if self.expected_name is None or self.appliance_name == self.expected_name:
+            return True
+        log.debug(
+            "Appliance %s, waiting for %s" % (self.appliance_name, self.expected_name)
+        )
+        try:
+            self._appliance_status()
+        except Exception as e:
+            log.debug("Appliance status: %s" % e)
+        return self.appliance_name == self.expected_name
+
+    def wait(self, timeout=None, deadline=None):
+        """
+        Wait for all phases of the reboot
+
+        Parameters:
+          timeout (float): Seconds the whole reboot may take (default: no limit)
+          deadline (Deadline): Overall time budget (default: none)
+
+        Returns:
+          True once the appliance is up, False if timeout was reached
+
+        Raises:
+          DeadlineExceeded if the deadline is reached first
+        """
+        steps = self._track(timeout, deadline)
+        result = None
+        try:
+            while True:
+                step = steps.send(result)
+                if callable(step):
+                    result = step()
+                else:
+                    time.sleep(step)
+                    result = None
+        except StopIteration as e:
+            return e.value
+        finally:
+            self._stopped.set()
+
+    async def async_wait(self, timeout=None, deadline=None, run=None):
+        """
+        Coroutine version of wait, sleeping with asyncio.sleep
+
+        Parameters:
+          run (coroutine function): Runs a probe without blocking the event
+                                    loop (default: in the default executor)
+        """
+        if run is None:
+            loop = asyncio.get_running_loop()
+
+            async def run(probe):
+                return await loop.run_in_executor(None, probe)
+
+        steps = self._track(timeout, deadline)
+        result = None
+        try:
+            while True:
+                step = steps.send(result)
+                if callable(step):
+                    result = await run(step)
+                else:
+                    await asyncio.sleep(step)
+                    result = None
+        except StopIteration as e:
+            return e.value
+        finally:
+            self._stopped.set()
+
+    def _track(self, timeout, deadline):
+        """
+        The phase loop of wait and async_wait, as a generator: yields the
+        probes to run, which are sent back their result, and the seconds to
+        sleep. Returns the result of the wait.
+        """
+        deadline = deadline or Deadline()
+        limit = deadline.within(timeout) if timeout is not None else deadline
+        history = self.api.lifecycle_history
+        started = time.monotonic()
+        started_at = time.time()
+        transitions = []
+        for phase, description in self.PHASES:
+            self.phase = phase
+            phase_start = time.monotonic()
+            if phase == "down":
+                phase_limit = limit.within(self.down_timeout)
+            else:
+                phase_limit = limit
+            check = getattr(self, "_" + phase)
+            while not (yield check):
+                remaining = phase_limit.remaining()
+                if remaining is not None and remaining <= 0:
+                    if phase == "down" and not limit.expired():
+                        log.warning(
+                            "%sLPAR not seen going down, it may have rebooted already"
+                            % self.prefix
+                        )
+                        break
+                    history.record(
+                        self.what,
+                        started_at,
+                        time.monotonic() - started,
+                        "timeout",
+                        transitions,
+                        **self.labels,
+                    )
+                    deadline.check("Wait for reboot (%s)" % phase)
+                    log.debug("%sReboot timings: %s" % (self.prefix, self.timings))
+                    return False
+                yield (
+                    self.interval
+                    if remaining is None
+                    else min(self.interval, remaining)
+                )
+            self.timings[phase] = time.monotonic() - phase_start
+            if phase == "tcp" and self.prewarm:
+                self._start_session()
+            elapsed = time.monotonic() - started
+            transitions.append((phase, elapsed))
+            eta = None
+            if phase != self.PHASES[-1][0]:
+                eta = history.eta(self.what, elapsed, phase, **self.labels)
+            print(
+                "%s... %s (%.1fs%s)"
+                % (
+                    self.prefix,
+                    description,
+                    elapsed,
+                    "" if eta is None else ", ETA %s" % _format_eta(eta),
+                )
+            )
+        history.record(
+            self.what,
+            started_at,
+            time.monotonic() - started,
+            "reached",
+            transitions,
+            **self.labels,
+        )
+        self.phase = None
+        log.info(
+            "%sReboot completed in %.1fs: %s"
+            % (
+                self.prefix,
+                time.monotonic() - started,
+                ", ".join("%s %.1fs" % timing for timing in self.timings.items()),
+            )
+        )
+        return True
 
 
 class SecureServiceContainerAPI(object):
@@ -115,7 +3915,24 @@ class SecureServiceContainerAPI(object):
     _lpar_address = None
     _header = dict()
 
-    def __init__(self, lpar_access):
+    def __init__(
+        self,
+        lpar_access,
+        pool_size=DEFAULT_POOL_SIZE,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        token_lifetime=DEFAULT_TOKEN_LIFETIME,
+        token_cache=None,
+        retry_policies=None,
+        deadline=None,
+        response_cache=None,
+        instrumentation=None,
+        timeouts=None,
+        ktls=False,
+        bandwidth_limiter=None,
+        upload_priority="normal",
+        path_health=None,
+        lifecycle_history=None,
+    ):
         """
         Initialize object and set default headers
         Request and set the authentication token needed to interface with the API
@@ -123,8 +3940,302 @@ class SecureServiceContainerAPI(object):
         Parameters:
           lpar_access (Object): Adress of the LPAR, username and password
           lpar (string): Address of the LPAR, either IP or FQDN
+          pool_size (int): Maximum number of keep-alive connections to the LPAR
+          idle_timeout (int): Seconds after which idle connections are not reused
+          token_lifetime (int): Seconds an API token is assumed to stay valid
+          token_cache (TokenCache): Reuse valid tokens of earlier processes
+          retry_policies (dict): RetryPolicy objects replacing RETRY_PROFILES entries
+          deadline (Deadline): Default time budget of all operations (default: none)
+          response_cache (ResponseCache): Reuse GET responses of read-only endpoints
+                                          (default: no caching)
+          instrumentation (callable): Called with a dict describing every
+                                      request sent, see _trace (e.g. TraceWriter)
+          timeouts (TimeoutConfig): Connect and read timeouts (default: DEFAULT_TIMEOUTS)
+          ktls (bool): Let the kernel encrypt, where Python and OpenSSL support it
+          bandwidth_limiter (BandwidthLimiter): Limits the upload bandwidth
+                                                (e.g. shared_bandwidth_limiter())
+          upload_priority (string): Default priority class of uploads (UPLOAD_PRIORITIES)
+          path_health (PathHealthStore): Upload history of the FCP target ports
+                                         (default: kept in memory)
+          lifecycle_history (LifecycleHistory): History of the waits for state
+                                                changes and reboots
+                                                (default: kept in memory)
+        """
+        self.idle_timeout = idle_timeout
+        self.connection_stats = ConnectionStats()
+        self._session = requests.Session()
+        self._session.mount(
+            "https://",
+            SSCHTTPAdapter(
+                self.connection_stats,
+                pool_size=pool_size,
+                ssl_context=_ktls_context() if ktls else None,
+            ),
+        )
+        self._last_used = None
+        self._idle_lock = threading.Lock()
+        self.retry_policies = dict(RETRY_PROFILES)
+        self.retry_policies.update(retry_policies or {})
+        self.deadline = deadline or Deadline()
+        self.response_cache = response_cache
+        self.instrumentation = instrumentation
+        self.timeouts = timeouts or TimeoutConfig()
+        self.bandwidth_limiter = bandwidth_limiter
+        self.upload_priority = upload_priority
+        self.fcp_topology = FcpTopologyIndex(self.iter_fcp_disks)
+        # (wwpn, lun) each FCP boot device was last uploaded through
+        self._upload_paths = dict()
+        self._status_pollers = dict()
+        self.last_reboot = None
+        self.appliance_version = None
+        self.lifecycle_history = lifecycle_history or _lifecycle_history
+        self.path_health = path_health or PathHealthStore()
+        self.token_manager = ApiTokenManager(
+            self._login, lifetime=token_lifetime, cache=token_cache
+        )
+        self._set_lpar_access(lpar_access)
+        self._header["Authorization"] = "Bearer " + self.token_manager.get()
+
+    def retry_policy(self, name):
+        """
+        Return the RetryPolicy for the operation 'name'
+        """
+        return self.retry_policies[name]
+
+    def close(self):
+        """
+        Close all pooled connections to the LPAR
+        """
+        self._session.close()
+        log.debug(
+            "Closed connections to %s: %s" % (self._lpar_address, self.connection_stats)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _request(self, method, url, header=None, **kwargs):
+        """
+        Send a request over the pooled keep-alive connections of this LPAR
+
+        Authenticated requests (header with Authorization) always use the
+        current token. If the server rejects it with 401, the request is
+        replayed once with a new token, provided its data can be sent again.
+        With a response cache, authenticated GETs which are not streamed go through
+        the cache and all other authenticated requests clear it.
+
+        Parameters:
+          method (string): HTTP method
+          url (string): The full URL to query
+          header (dict): HTTP Headers to send
+          kwargs: Passed on to requests.Session.request
+
+        Returns:
+          requests.Response of the API call
+        """
+        if header is None or "Authorization" not in header:
+            return self._send(method, url, header, **kwargs)
+        if self.response_cache is None:
+            return self._authorized_request(method, url, header, **kwargs)
+        if method == "GET":
+            if kwargs.get("stream"):
+                # caching would read the whole body the caller wants to stream
+                return self._authorized_request(method, url, header, **kwargs)
+            return self._cached_get(url, header, **kwargs)
+        try:
+            return self._authorized_request(method, url, header, **kwargs)
+        finally:
+            # the request may change what any cached endpoint returns
+            self.response_cache.clear()
+
+    def _authorized_request(self, method, url, header, **kwargs):
+        """
+        Send a request with the current token, replay it once on 401
+        """
+        data = kwargs.get("data")
+        position = _replay_position(data)
+        token = self.token_manager.get()
+        response = self._send(method, url, _with_token(header, token), **kwargs)
+        if response.status_code != 401 or position is None:
+            return response
+        log.debug("Token rejected (401), log in again and replay request")
+        response.close()
+        self.token_manager.invalidate(token)
+        if position is not True:
+            data.seek(position)
+        token = self.token_manager.get()
+        return self._send(method, url, _with_token(header, token), **kwargs)
+
+    def _cached_get(self, url, header, **kwargs):
+        """
+        Answer a GET from the response cache, revalidate or fetch and cache it
+        """
+        cache = self.response_cache
+        ttl = cache.ttl(url)
+        if ttl is None:
+            return self._authorized_request("GET", url, header, **kwargs)
+        key = (url, header.get("Accept"))
+        entry = cache.get(key)
+        if entry is not None and entry.fresh():
+            cache.hits += 1
+            log.debug("GET %s answered from cache" % url)
+            return entry.response()
+        if entry is not None and entry.validators:
+            header = dict(header)
+            header.update(entry.validators)
+        response = self._authorized_request("GET", url, header, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            cache.revalidations += 1
+            log.debug("GET %s not modified, using cached response" % url)
+            entry.renew(ttl)
+            return entry.response()
+        cache.misses += 1
+        if response.status_code == 200:
+            return cache.store(key, response, ttl)
+        cache.discard(key)
+        return response
+
+    def _evict_if_idle(self, now):
+        """
+        Close the pooled connections if none was used for idle_timeout,
+        they are likely closed by the LPAR already. Other threads may send
+        requests on the same session at the same time, so only the idle
+        connections are closed, never the session.
+        """
+        with self._idle_lock:
+            idle = (
+                self._last_used is not None
+                and now - self._last_used > self.idle_timeout
+            )
+            if idle:
+                log.debug(
+                    "Connections idle for %ds, reconnecting" % (now - self._last_used)
+                )
+                for adapter in self._session.adapters.values():
+                    if isinstance(adapter, SSCHTTPAdapter):
+                        adapter.evict_idle()
+            self._last_used = now
+
+    def _mark_used(self):
+        finished = time.monotonic()
+        with self._idle_lock:
+            self._last_used = max(self._last_used or finished, finished)
+        return finished
+
+    def _send(self, method, url, header, **kwargs):
+        now = time.monotonic()
+        self._evict_if_idle(now)
+        self.connection_stats.count_request()
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self._timeout(url)
+        if self.instrumentation is None:
+            try:
+                return self._session.request(
+                    method, url, headers=header, verify=False, **kwargs
+                )
+            finally:
+                self._mark_used()
+
+        started = time.time()
+        self.connection_stats.start_timings()
+        response = None
+        error = None
+        try:
+            response = self._session.request(
+                method, url, headers=header, verify=False, **kwargs
+            )
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            finished = self._mark_used()
+            self._trace(
+                method,
+                url,
+                header,
+                kwargs,
+                started,
+                finished - now,
+                self.connection_stats.stop_timings(),
+                response,
+                error,
+            )
+
+    def _timeout(self, url):
+        """
+        Return the (connect, read) timeout of a request to url,
+        never waiting beyond the deadline of the object
+        """
+        timeout = self.timeouts.for_url(url)
+        remaining = self.deadline.remaining()
+        if remaining is not None:
+            self.deadline.check(_endpoint_template(url))
+            timeout = tuple(min(value, max(remaining, 0.01)) for value in timeout)
+        return timeout
+
+    def _trace(
+        self, method, url, header, kwargs, started, total, timings, response, error
+    ):
         """
-        self.getApiToken(lpar_access)
+        Pass the record of a request to the instrumentation callback:
+          time: Wall clock time the request started (seconds since the epoch)
+          address, method, status, endpoint (URL with identifiers replaced by {})
+          bytes_sent, bytes_received: Body sizes, None if unknown
+          new_connection: Whether a connection had to be opened for the request
+          tcp, tls: Seconds for DNS lookup and TCP connect, and for the TLS
+                    handshake, 0 if a keep-alive connection was reused
+          ttfb: Seconds from start to the response headers (including connecting)
+          total: Seconds until the call returned, including the response body
+                 unless it is streamed (streamed: True)
+          error: Exception raised by the request, None if it completed
+        """
+        bytes_sent = None
+        if response is not None:
+            bytes_sent = response.request.headers.get("Content-Length")
+        elif header and header.get("Content-length"):
+            bytes_sent = header["Content-length"]
+        elif isinstance(kwargs.get("data"), (str, bytes)):
+            bytes_sent = len(kwargs["data"])
+        streamed = bool(kwargs.get("stream"))
+        bytes_received = None
+        if response is not None:
+            if streamed:
+                bytes_received = response.headers.get("Content-Length")
+            else:
+                bytes_received = len(response.content)
+        connect = timings.get("connect", 0)
+        tcp = min(timings.get("tcp", 0), connect)
+        record = {
+            "time": started,
+            "address": self._lpar_address,
+            "method": method,
+            "endpoint": _endpoint_template(url),
+            "status": response.status_code if response is not None else None,
+            "bytes_sent": int(bytes_sent) if bytes_sent is not None else None,
+            "bytes_received": (
+                int(bytes_received) if bytes_received is not None else None
+            ),
+            "new_connection": "connect" in timings,
+            "tcp": round(tcp, 6),
+            "tls": round(connect - tcp, 6),
+            "ttfb": (
+                round(response.elapsed.total_seconds(), 6)
+                if response is not None
+                else None
+            ),
+            "total": round(total, 6),
+            "streamed": streamed,
+            "error": repr(error) if error is not None else None,
+        }
+        try:
+            self.instrumentation(record)
+        except Exception as e:
+            log.debug("Instrumentation callback failed: %s" % e)
 
     def _try_decode_content(self, response):
         """
@@ -184,7 +4295,7 @@ class SecureServiceContainerAPI(object):
         """
         url = "https://{0}{1}".format(self._lpar_address, url)
         log.debug("GET: %s" % url)
-        return requests.get(url, headers=header, verify=False, stream=stream)
+        return self._request("GET", url, header, stream=stream)
 
     def _post(self, url, header, data=None):
         """
@@ -200,7 +4311,7 @@ class SecureServiceContainerAPI(object):
         """
         url = "https://{0}{1}".format(self._lpar_address, url)
         log.debug("POST: %s" % url)
-        return requests.post(url, headers=header, verify=False, data=data)
+        return self._request("POST", url, header, data=data)
 
     def _put(self, url, header, data=None):
         """
@@ -216,7 +4327,7 @@ class SecureServiceContainerAPI(object):
         """
         url = "https://{0}{1}".format(self._lpar_address, url)
         log.debug("PUT: %s" % url)
-        return requests.put(url, headers=header, verify=False, data=data)
+        return self._request("PUT", url, header, data=data)
 
     def get(self, url):
         """
@@ -259,36 +4370,118 @@ class SecureServiceContainerAPI(object):
         response = self._put(url, self._header, data)
         return (response,) + self._get_data(response)
 
+    def invalidate_cache(self):
+        """
+        Drop all cached responses, e.g. after the LPAR changed state on its own
+        """
+        if self.response_cache is not None:
+            self.response_cache.clear()
+
+    def invalidate_fcp_topology(self, devices=None):
+        """
+        Drop the FCP index entries of the devices (default: all), they are
+        listed again on the next lookup
+        """
+        self.fcp_topology.invalidate(devices)
+
+    def iter_instances(self, url, key="instances"):
+        """
+        Perform GET request of a list resource and yield its instances
+        while the response is received. Memory use does not grow with the
+        size of the list, and the transfer is abandoned if the caller stops
+        iterating early.
+
+        Parameters:
+          url (string): The FQDN of the URL to query
+          key (string): Name of the list in the response (default: instances)
+
+        Returns:
+          Generator of the instances (dict)
+
+        Raises:
+          requests.HTTPError if the request did not succeed
+          ValueError if the response is not valid JSON
+        """
+        response = self._get(url, self._header, stream=True)
+        try:
+            if not response.ok:
+                self._get_data(response)
+            for instance in _iter_json_array(
+                response.iter_content(STREAM_CHUNK_SIZE), key
+            ):
+                yield instance
+        finally:
+            response.close()
+
     ###################################################################
 
     def getApiToken(self, lpar_access):
         """
-        Request and set the authentication token needed to interface with the API
+        Return and set the authentication token needed to interface with the API
+        The current token of the token manager is used while it is valid,
+        requests renew it lazily and replay a 401 with a new login.
 
         Parameters:
           lpar_access (Object): Adress of the LPAR, username and password
           lpar (string): Address of the LPAR, either IP or FQDN
         """
+        key = (lpar_access.address, lpar_access.username)
+        if key != self.token_manager.cache_key:
+            # another LPAR or user, nothing cached so far applies to it
+            self._set_lpar_access(lpar_access)
+            self.invalidate_cache()
+            self.invalidate_fcp_topology()
+        token = self.token_manager.get()
+        self._header["Authorization"] = "Bearer " + token
+        return token
+
+    def _renew_token(self):
+        """
+        Log in again, e.g. after the LPAR has been rebooted, and return the new token
+        """
+        token = self.token_manager.renew()
+        self._header["Authorization"] = "Bearer " + token
+        return token
+
+    def _set_lpar_access(self, lpar_access):
+        """
+        Set the target LPAR and the default headers
+        """
         self._header = {
             "Accept": "application/vnd.ibm.zaci.payload+json",
             "zACI-API": "com.ibm.zaci.system/1.0",
             "Content-Type": "application/vnd.ibm.zaci.payload+json;version=1.0",
         }
         self._lpar_address = lpar_access.address
-
+        self._lpar_access = lpar_access
+        self.reachability = ReachabilityProbe(lpar_access.address)
+        key = (lpar_access.address, lpar_access.username)
+        if key != self.token_manager.cache_key:
+            # the token of another LPAR or user is of no use
+            self.token_manager.token = None
+        self.token_manager.cache_key = key
+
+    def _login(self):
+        """
+        Log in with the credentials of the LPAR access and return the new token
+        """
         url = "/api/com.ibm.zaci.system/api-tokens"
+        header = self._header.copy()
+        header.pop("Authorization", None)
         data = json.dumps(
             {
                 "kind": "request",
                 "parameters": {
-                    "user": lpar_access.username,
-                    "password": lpar_access.password,
+                    "user": self._lpar_access.username,
+                    "password": self._lpar_access.password,
                 },
             }
         )
-        (response, jsn, content) = self.post(url, data)
+        response = self._post(url, header, data)
+        (jsn, content) = self._get_data(response)
         token = jsn["parameters"]["token"]
         self._header["Authorization"] = "Bearer " + token
+        return token
 
     def get_fcp_disks(self, device_bus_id):
         url = (
@@ -298,12 +4491,164 @@ class SecureServiceContainerAPI(object):
         )
         return self.get(url)
 
+    def iter_fcp_disks(self, device_bus_id):
+        url = (
+            "/api/com.ibm.zaci.system/fcp-disks?fcp-device={device}&status=free".format(
+                device=device_bus_id
+            )
+        )
+        return self.iter_instances(url)
+
     def get_ECKD(self):
         url = "/api/com.ibm.zaci.system/storage-devices?type=ECKD"
         return self.get(url)
 
-    def upload_image(self, image, lpar_boot_device, lpar_access):
-        url = "/api/com.ibm.zaci.system/sw-appliances/install?id={device_id}"
+    def iter_ECKD(self):
+        url = "/api/com.ibm.zaci.system/storage-devices?type=ECKD"
+        return self.iter_instances(url)
+
+    def upload_image(
+        self,
+        image,
+        lpar_boot_device,
+        lpar_access,
+        deadline=None,
+        chunk_size=None,
+        progress=None,
+        zero_copy=False,
+        checksum=None,
+        upload_url=None,
+        priority=None,
+    ):
+        """
+        Upload an image to the boot device of the LPAR
+        Image packages can be uploaded without extracting them, see open_image.
+
+        Parameters:
+          image (str, file or bytes): Image file name, binary file (e.g. an
+                                      ImageFile) or image data
+          lpar_boot_device (LPARBootDevice): Disk the image is installed on
+          lpar_access (Object): Adress of the LPAR, username and password
+          deadline (Deadline): Time budget of the upload including FCP discovery
+          chunk_size (int): Bytes read and sent at a time, bounds the memory used
+                            (default: DEFAULT_UPLOAD_CHUNK_SIZE, ZERO_COPY_CHUNK_SIZE)
+          progress (callable): Called with an UploadProgress after every chunk
+          zero_copy (bool): Send image files from a memory mapping in large writes
+          checksum (string): Expected CHECKSUM_ALGORITHM digest, verified while the
+                             image is sent, ChecksumMismatch aborts the upload
+          upload_url (string): Result of an earlier prepare_upload (default: prepare now)
+          priority (string): Bandwidth priority class (default: upload_priority)
+
+        If the upload to an FCP disk fails with a connection error or a server
+        error, it is repeated through the next healthy path of the FCP index
+        without a new discovery, as long as the image can be sent again.
+        The outcome of every attempt is recorded in path_health.
+
+        Returns:
+          tuple(response, None, "")
+        """
+        deadline = deadline or self.deadline
+        if upload_url is None:
+            upload_url = self.prepare_upload(lpar_boot_device, deadline)
+
+        if chunk_size is None:
+            chunk_size = (
+                ZERO_COPY_CHUNK_SIZE if zero_copy else DEFAULT_UPLOAD_CHUNK_SIZE
+            )
+        throttle = None
+        if self.bandwidth_limiter is not None:
+            throttle = self.bandwidth_limiter.throttle(
+                self._lpar_address, priority or self.upload_priority
+            )
+        stream = UploadStream(
+            image,
+            chunk_size,
+            progress,
+            use_mmap=zero_copy,
+            checksum=checksum,
+            throttle=throttle,
+        )
+        header = self._header.copy()
+        header["Content-type"] = "application/octet-stream"
+        if stream.size_known:
+            header["Content-length"] = "{0}".format(len(stream))
+            log.debug("Uploading %d bytes" % len(stream))
+        else:
+            log.debug("Uploading image of unknown size with chunked transfer")
+
+        # the upload keeps the token it was sent with, renew the token in the
+        # background so the requests after a long upload do not start with an
+        # expired one (a 401 is replayed with a new token, see _request)
+        tried = set()
+        try:
+            with self.token_manager.keepalive():
+                while True:
+                    path = self._url_path(upload_url)
+                    error = None
+                    try:
+                        response = self._post(upload_url, header, stream.body())
+                    except (requests.ConnectionError, requests.Timeout) as e:
+                        if stream.error is not None:
+                            # the local image failed, not the path
+                            raise stream.error
+                        if path is None:
+                            raise
+                        error = e
+                    else:
+                        if response.status_code >= 500:
+                            error = "HTTP status %d" % response.status_code
+                    if path is None:
+                        break
+                    tried.add(path)
+                    if error is None:
+                        if 200 <= response.status_code < 300:
+                            finished = stream.progress.finished or time.monotonic()
+                            self.path_health.record_success(
+                                path[0],
+                                stream.progress.sent,
+                                time.monotonic() - stream.progress.started,
+                                time.monotonic() - finished,
+                            )
+                            self._upload_paths[lpar_boot_device.boot_device_id] = path
+                        break
+                    self.path_health.record_failure(path[0], error)
+                    next_url = None
+                    if stream.seekable() and not deadline.expired():
+                        next_url = self._failover_url(lpar_boot_device, tried)
+                    if next_url is None:
+                        if isinstance(error, Exception):
+                            raise error
+                        break
+                    stream.seek(0)
+                    upload_url = next_url
+            if throttle is not None:
+                log.info(
+                    "Upload to %s: %.1f MB/s achieved, %.1f MB/s by all running uploads"
+                    % (
+                        self._lpar_address,
+                        throttle.rate / 1e6,
+                        self.bandwidth_limiter.achieved_rate() / 1e6,
+                    )
+                )
+        finally:
+            stream.close()
+            if throttle is not None:
+                throttle.close()
+        return (response, None, "")
+
+    def prepare_upload(self, lpar_boot_device, deadline=None):
+        """
+        Find the path to the boot device (FCP discovery for SCSI disks)
+        and return the URL the image is uploaded to
+
+        Parameters:
+          lpar_boot_device (LPARBootDevice): Disk the image is installed on
+          deadline (Deadline): Time budget of the FCP discovery
+
+        Returns:
+          The upload URL for upload_image
+        """
+        deadline = deadline or self.deadline
 
         _wwpn = None
         _lun = None
@@ -312,34 +4657,47 @@ class SecureServiceContainerAPI(object):
         _udid = lpar_boot_device.get_udid()
 
         if _udid:
-            max_attempts = 10
-            success = False
             triggerurl = "/api/com.ibm.zaci.system/fcp-disks?fcp-device=" + _device
-            url = url + "&wwpn={wwpn}&lun={lun}"
-
-            for attempt_number in range(max_attempts):
-                try:
-                    print("FCP discovery attempt #" + str(attempt_number))
-
-                    # refresh API token
-                    self.getApiToken(lpar_access)
-
-                    # trigger FCP discovery
-                    _discovery = self.get(triggerurl)
+            attempt_number = 0
+
+            def discover():
+                nonlocal attempt_number
+                print("FCP discovery attempt #" + str(attempt_number))
+                attempt_number += 1
+
+                # trigger FCP discovery
+                _discovery = self.get(triggerurl)
+
+                # poll for the FCP path while async discovery runs
+                return poll_until(
+                    lambda: self.get_fcp_path_by_udid(
+                        [_device], _udid, deadline, retry=False
+                    ),
+                    FCP_DISCOVERY_TIMEOUT,
+                    FCP_DISCOVERY_POLL_INTERVAL,
+                    FCP_DISCOVERY_MAX_POLL_INTERVAL,
+                    deadline=deadline,
+                    what="FCP discovery",
+                )
 
-                    # sleep while async discovery runs
-                    time.sleep(120)
+            def report(attempt, delay, outcome):
+                if isinstance(outcome, Exception):
+                    print("FCP discovery exception 1: " + str(outcome))
 
-                    # get FCP path
-                    _path = self.get_fcp_path_by_udid([_device], _udid)
-                    if _path:
-                        _wwpn, _lun, _dev = _path  # target wwpn and lun
-                        success = True
-                        break
-                except Exception as e:
-                    print("FCP discovery exception 1: " + str(e))
+            try:
+                _path = self.retry_policy("fcp-discovery").call(
+                    discover,
+                    accept=lambda path: path is not None,
+                    on_retry=report,
+                    deadline=deadline,
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                print("FCP discovery exception 1: " + str(e))
+                _path = None
 
-            if not success:
+            if not _path:
                 raise Exception(
                     "Cannot upload image to "
                     + self._lpar_address
@@ -351,21 +4709,43 @@ class SecureServiceContainerAPI(object):
                     + _device
                     + "."
                 )
-            else:
-                print("FCP discovery successful")
+            _wwpn, _lun, _dev = _path  # target wwpn and lun
+            print("FCP discovery successful")
 
-        header = self._header.copy()
-        header["Content-type"] = "application/octet-stream"
-        if isinstance(image, io.IOBase):
-            log.debug(os.fstat(image.fileno()))
-            header["Content-length"] = "{0}".format(os.fstat(image.fileno()).st_size)
-        else:
-            header["Content-length"] = "{0}".format(len(image))
+        return self._install_url(_device, _wwpn, _lun)
 
-        response = self._post(
-            url.format(device_id=_device, wwpn=_wwpn, lun=_lun), header, image
-        )
-        return (response, None, "")
+    @staticmethod
+    def _install_url(device, wwpn=None, lun=None):
+        url = "/api/com.ibm.zaci.system/sw-appliances/install?id={device_id}"
+        if wwpn is not None:
+            url = url + "&wwpn={wwpn}&lun={lun}"
+        return url.format(device_id=device, wwpn=wwpn, lun=lun)
+
+    def _failover_url(self, lpar_boot_device, tried):
+        """
+        Return the install URL for the healthiest path to the FCP boot disk
+        which has not been tried yet, None if there is none
+        """
+        _udid = lpar_boot_device.get_udid()
+        if not _udid:
+            return None
+        _device = lpar_boot_device.boot_device_id
+        paths = self.path_health.rank(self.fcp_topology.paths(_udid, [_device]))
+        for _wwpn, _lun, _dev in paths:
+            if (_wwpn, _lun) not in tried:
+                print("Failing over to FCP path %s, LUN %s" % (_wwpn, _lun))
+                return self._install_url(_device, _wwpn, _lun)
+        return None
+
+    @staticmethod
+    def _url_path(upload_url):
+        """
+        Return the (wwpn, lun) of an install URL, None for DASD
+        """
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(upload_url).query)
+        if "wwpn" not in query:
+            return None
+        return (query["wwpn"][0], query.get("lun", [None])[0])
 
     def switch_to_installer(self):
         url = "/api/com.ibm.zaci.system/maintenance-actions/switch-to-installer"
@@ -375,15 +4755,23 @@ class SecureServiceContainerAPI(object):
         url = "/api/com.ibm.zaci.system/maintenance-actions"
         return self.get(url)
 
-    def reboot(self, lpar_boot_device):
+    def reboot(self, lpar_boot_device, deadline=None):
+        """
+        Select the boot device and reboot the appliance from it. An FCP disk
+        is selected through the path upload_image wrote the image through,
+        without an upload through the healthiest path.
+        """
         url = "/api/com.ibm.zaci.system/sw-appliances/select"
 
         _device = lpar_boot_device.boot_device_id
         _udid = lpar_boot_device.get_udid()
 
         if _udid:
-            # FCP
-            _path = self.get_fcp_path_by_udid([_device], _udid)
+            _used = self._upload_paths.get(_device)
+            if _used is not None:
+                _path = _used + (FcpTopologyIndex.device_id(_device),)
+            else:
+                _path = self.get_fcp_path_by_udid([_device], _udid, deadline)
             if _path:
                 _wwpn, _lun, _dev = _path  # target wwpn and lun
             else:
@@ -395,7 +4783,7 @@ class SecureServiceContainerAPI(object):
                     + _udid
                     + " with  "
                     + "device "
-                    + _dev
+                    + _device
                     + "."
                 )
 
@@ -418,7 +4806,11 @@ class SecureServiceContainerAPI(object):
                     },
                 }
             )
-        return self.put(url, data)
+        try:
+            return self.put(url, data)
+        finally:
+            # the rebooted appliance may see the SAN differently
+            self.invalidate_fcp_topology()
 
     def get_appliance_status(self):
         url = "/api/com.ibm.zaci.system/appliance"
@@ -429,11 +4821,15 @@ class SecureServiceContainerAPI(object):
         return self.get(url)
 
     def ping_appliance(self, timeout):
+        # a single GET, its connect waits no longer than a reachability probe,
+        # so an LPAR which is down answers as fast as with a probe first
         url = "https://{0}{1}".format(self._lpar_address, "/")
         log.debug("GET: %s" % url)
-        log.debug("With timeout: %d" % timeout)
+        log.debug("With timeout: %s" % timeout)
         try:
-            r = requests.get(url, verify=False, timeout=timeout)
+            r = self._request(
+                "GET", url, timeout=(min(self.reachability.timeout, timeout), timeout)
+            )
             log.debug(r)
         except Exception as e:
             log.debug(e)
@@ -487,6 +4883,46 @@ class SecureServiceContainerAPI(object):
         log.debug(resultCode)
         return json["status"]
 
+    def status_poller(self, get_status):
+        """
+        Return the StatusPoller shared by all waits for the status, so
+        concurrent waits on the LPAR send a single stream of requests
+
+        Parameters:
+          get_status (callable): get_accelerator_status or get_accelerator_server_status
+        """
+        name = get_status.__name__
+        poller = self._status_pollers.get(name)
+        if poller is None:
+            poller = self._status_pollers.setdefault(
+                name,
+                StatusPoller(get_status, "%s %s" % (self._lpar_address, name)),
+            )
+        return poller
+
+    def lifecycle_labels(self):
+        """
+        Return the LPAR and appliance version the waits are recorded for
+        in the lifecycle history
+        """
+        return {"lpar": self._lpar_address, "version": self.appliance_version}
+
+    def wait_attempts(self, what, attempts=None, step=STATUS_WAIT_STEP):
+        """
+        Return the attempts of a wait for what: the given ones, else
+        DEFAULT_WAIT_ATTEMPTS[what], raised to enough 'step' seconds attempts
+        for the timeout the lifecycle history suggests. The history only
+        extends the budget, a run of quick waits never shortens it.
+        """
+        if attempts is not None:
+            return attempts
+        attempts = DEFAULT_WAIT_ATTEMPTS[what]
+        timeout = self.lifecycle_history.timeout(what, **self.lifecycle_labels())
+        if timeout is not None and timeout > attempts * step:
+            attempts = int(math.ceil(timeout / step))
+            log.debug("%s: %d attempts from the lifecycle history" % (what, attempts))
+        return attempts
+
     def export_configuration(self):
         print("exporting using 3 REST calls...")
         url = "/api/com.ibm.aqt/cluster/export_ssc_config"
@@ -537,7 +4973,7 @@ class SecureServiceContainerAPI(object):
                 return response.status_code
 
             current_retries += 1
-            time.sleep(retry_delay)
+            self.deadline.sleep(retry_delay, "Wait for dump")
 
         print("taking the dump took too long. Giving up.")
         return response.status_code
@@ -545,20 +4981,24 @@ class SecureServiceContainerAPI(object):
     def save_dump(self, dump_filename):
         # find latest dump. All dumps have msgid 'AZIZ0001E'
         url = "/api/com.ibm.zaci.system/alerts"
-        _, jsonDump, _ = self.get(url)
-        matching_entries = [
-            entry for entry in jsonDump["instances"] if entry["msgid"] == "AZIZ0001E"
-        ]
-        latest_self_url = max(matching_entries, key=lambda x: x["timestamp"])["self"]
-        dump_url = latest_self_url + "/diag-info"
+        latest = None
+        for entry in self.iter_instances(url):
+            if entry["msgid"] == "AZIZ0001E" and (
+                latest is None or entry["timestamp"] > latest["timestamp"]
+            ):
+                latest = entry
+        if latest is None:
+            raise Exception("No dump found")
+        dump_url = latest["self"] + "/diag-info"
         print(dump_url)
         # download dump
         header = self._header.copy()
         header["Accept"] = "application/octet-stream"
-        response = self._get(dump_url, header)
+        response = self._get(dump_url, header, stream=True)
         # save dump to file
-        with open(dump_filename, "wb") as file:
-            file.write(response.content)
+        with response, open(dump_filename, "wb") as file:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                file.write(chunk)
         return response.status_code
 
     def quiesce_force(self):
@@ -618,7 +5058,7 @@ class SecureServiceContainerAPI(object):
                 return True
         return False
 
-    def check_and_apply_license_accept(self, lic_path, ver):
+    def check_and_apply_license_accept(self, lic_path, ver, deadline=None):
         """
         Check if there is a file which denotes previous licence
         acceptance for this version.
@@ -631,32 +5071,26 @@ class SecureServiceContainerAPI(object):
                 log.debug("License for this version has been accepted previously")
                 url = "/api/com.ibm.zaci.system/software-license"
                 data = json.dumps({"kind": "request", "parameters": {"accept": True}})
-                response = requests.put(
-                    "https://{0}{1}".format(self._lpar_address, url),
-                    headers=self._header,
-                    verify=False,
-                    data=data,
-                )
+                response = self._put(url, self._header, data)
                 log.debug(response)
                 if response.status_code == 200:
                     log.debug("License accepted successfully")
-                    available = False
-                    attempts = 20
-                    while not available and attempts > 0:
-                        time.sleep(5)
-                        available = True
-                        attempts -= 1
-                        log.debug("Check appliance operational")
-                        (
-                            resultCode,
-                            jsonthing,
-                            message,
-                        ) = self.get_appliance_operational()
+
+                    def operational(result):
+                        (resultCode, jsonthing, message) = result
                         log.debug(resultCode)
                         log.debug(jsonthing)
                         if resultCode.status_code != 204:
                             log.debug("The appliance is not yet operational.")
-                            available = False
+                            return False
+                        return True
+
+                    log.debug("Check appliance operational")
+                    self.retry_policy("license-operational").call(
+                        self.get_appliance_operational,
+                        accept=operational,
+                        deadline=deadline or self.deadline,
+                    )
                 else:
                     raise Exception("License accept failed")
 
@@ -668,81 +5102,119 @@ class SecureServiceContainerAPI(object):
             raise Exception("License accept path does not exist")
         return True
 
-    def get_fcp_data(self, device):
+    def get_fcp_data(self, device, deadline=None):
         """
         GET https://<ip-address>1/api/com.ibm.zaci.system/fcp-disks?fcp-device=<device>
         returns response[1] including all instances (=udids) with all paths (target_wwpn+lun)
         """
-        attempt_count = 0
-        while attempt_count < 6:
-            if attempt_count > 0:
-                time.sleep(15)
-            attempt_count += 1
-            try:
-                response = self.get_fcp_disks(device)
-                if response and (response[0].status_code == 200):
-                    data = response[1]
-
-                    instance_count = 0
-                    if data.get("instances"):
-                        instance_count = len(data["instances"])
-                    if instance_count == 0:
-                        raise Exception("Received no instances.")
-
-                    log.debug(
-                        "get_fcp_data: returning data, number of instances is "
-                        + str(instance_count)
-                        + "."
-                    )
-                    return data
 
-                else:
-                    raise Exception("GET response " + str(response[0].status_code))
-            except Exception as e:
-                log.debug("get_fcp_data: Exception " + str(e))
+        def fetch():
+            response = self.get_fcp_disks(device)
+            if response and (response[0].status_code == 200):
+                data = response[1]
+
+                instance_count = 0
+                if data.get("instances"):
+                    instance_count = len(data["instances"])
+                if instance_count == 0:
+                    raise RetryableError("Received no instances.")
+
+                log.debug(
+                    "get_fcp_data: returning data, number of instances is "
+                    + str(instance_count)
+                    + "."
+                )
+                return data
+
+            else:
+                raise RetryableError("GET response " + str(response[0].status_code))
+
+        try:
+            return self.retry_policy("fcp-data").call(
+                fetch, deadline=deadline or self.deadline
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            log.debug("get_fcp_data: Exception " + str(e))
         raise Exception("get_fcp_data: No FCP data for device " + device)
 
-    def get_fcp_path_by_udid(self, devices, udid):
+    def get_fcp_instance_by_udid(self, device, udid, deadline=None, retry=True):
+        """
+        Stream the fcp-disks of device and return the first free instance with
+        the given udid, without reading the rest of the list.
+        Returns None if the udid is not found.
+        Without retry, a single attempt is made and None returned if the
+        device lists no disks yet.
+        """
+
+        def find_instance():
+            instance_count = 0
+            try:
+                for instance in self.iter_fcp_disks(device):
+                    instance_count += 1
+                    if instance.get("status") and (instance["status"] == "free"):
+                        local_udid = instance["id"]
+                        if len(local_udid) == 33:
+                            local_udid = local_udid[1:]
+                        if udid == local_udid:
+                            log.debug(
+                                "get_fcp_instance_by_udid: found udid %s on device %s "
+                                "after %d instances" % (udid, device, instance_count)
+                            )
+                            return instance
+            except requests.HTTPError as e:
+                raise RetryableError("GET response " + str(e.response.status_code))
+            if instance_count == 0:
+                raise RetryableError("Received no instances.")
+            log.debug(
+                "get_fcp_instance_by_udid: udid %s not in %d instances of device %s"
+                % (udid, instance_count, device)
+            )
+            return None
+
+        if not retry:
+            try:
+                return find_instance()
+            except RetryableError as e:
+                log.debug("get_fcp_instance_by_udid: " + str(e))
+                return None
+
+        try:
+            return self.retry_policy("fcp-data").call(
+                find_instance, deadline=deadline or self.deadline
+            )
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            log.debug("get_fcp_instance_by_udid: Exception " + str(e))
+        raise Exception("get_fcp_instance_by_udid: No FCP data for device " + device)
+
+    def get_fcp_path_by_udid(self, devices, udid, deadline=None, retry=True):
         """
-        returns random path as (wwpn, lun, device) if at least one path exists,
-        None otherwise
+        returns the healthiest path as (wwpn, lun, device) if at least one
+        path exists, None otherwise (see PathHealthStore.rank)
+        The path is looked up in the FCP index, devices which are not indexed
+        yet are listed in parallel. If the disk is not found, the devices are
+        listed again on the next attempt.
+        Without retry, the devices are listed once (for polling).
         """
+        deadline = deadline or self.deadline
 
         log.debug(f"get_fcp_path_by_udid: entering with {devices}")
+        attempt = 0
 
-        attempt_count = 0
-        while attempt_count < 6:
-            all_paths = list()  # all active paths to udid
-            for device in devices:
-                if len(device) == 4:
-                    device = (
-                        "0.0." + device
-                    )  # fixing device here, too, because it's returned
-                data = self.get_fcp_data(device)
-                all_matching_instances = list()  # all instances with matching udid
-                # should be exactly one
-                if data:
-                    for instance in data["instances"]:
-                        if instance.get("status") and (instance["status"] == "free"):
-                            local_udid = instance["id"]
-                            if len(local_udid) == 33:
-                                local_udid = local_udid[1:]
-                            if udid == local_udid:
-                                all_matching_instances.append(instance)
-
-                golden_instance = None  # first instance with matching udid
-                if len(all_matching_instances) >= 1:
-                    golden_instance = all_matching_instances[0]
-
-                    if golden_instance.get("paths"):
-                        for path in golden_instance["paths"]:
-                            if path.get("status") and (path["status"] == "active"):
-                                all_paths.append(path)
+        def find_path():
+            nonlocal attempt
+            attempt += 1
+            if not retry or attempt > 1:
+                self.fcp_topology.refresh(devices)
+            else:
+                self.fcp_topology.ensure(devices)
+            all_paths = self.fcp_topology.paths(udid, devices)
 
             if len(all_paths) >= 1:
-                # pick random path
-                path = all_paths[random.randint(0, len(all_paths) - 1)]
-                retval = (path["target"], path["lun"], device)
+                retval = self.path_health.rank(all_paths)[0]
                 log.debug(
                     "get_fcp_path_by_udid: returning "
                     + str(retval)
@@ -750,9 +5222,20 @@ class SecureServiceContainerAPI(object):
                     + udid
                 )
                 return retval
+            return None
 
-            attempt_count += 1
-            time.sleep(15)
+        if retry:
+            retval = self.retry_policy("fcp-path").call(
+                find_path, accept=lambda path: path is not None, deadline=deadline
+            )
+        else:
+            try:
+                retval = find_path()
+            except requests.HTTPError as e:
+                log.debug("get_fcp_path_by_udid: " + str(e))
+                retval = None
+        if retval is not None:
+            return retval
 
         log.debug(
             "get_fcp_path_by_udid: No FCP path found on "
@@ -761,13 +5244,11 @@ class SecureServiceContainerAPI(object):
             + "udid "
             + udid
             + " using "
-            + "device "
-            + device
+            + "devices "
+            + ", ".join(devices)
         )
         return None
 
-    ###################################################################
-
     def print_and_return_appliance_status(
         self,
         lparAccess,
@@ -776,7 +5257,6 @@ class SecureServiceContainerAPI(object):
         gets and prints appliance status
         """
 
-        self.getApiToken(lparAccess)
         resultCode, json, message = self.get_appliance_status()
         log.debug("Appliance status:")
         log.debug(resultCode)
@@ -784,6 +5264,7 @@ class SecureServiceContainerAPI(object):
         appliance_properties = json["properties"]
         appliance_name = appliance_properties["name"]
         appliance_version = appliance_properties["version"]
+        self.appliance_version = appliance_version
         print("***********************************************************")
         print("Appliance name: ", appliance_name)
         print("Version: ", appliance_version)
@@ -793,7 +5274,7 @@ class SecureServiceContainerAPI(object):
 
         # appliance_name is "Db2 Analytics Accelerator for z/OS"
         # or "Secure Service Container Installer"
-        if appliance_name != "Db2 Analytics Accelerator for z/OS":
+        if appliance_name != APPLIANCE_ACCELERATOR:
             print("LPAR not Db2 Analytics Accelerator (%s): " % appliance_name)
             log.debug("Not in Accelerator Appliance but: ", appliance_name)
 
@@ -804,7 +5285,6 @@ class SecureServiceContainerAPI(object):
         accepts the license if not already accepted
         """
 
-        self.getApiToken(lparAccess)
         if self.is_license_accepted():
             print("License has been accepted already")
         else:
@@ -819,34 +5299,72 @@ class SecureServiceContainerAPI(object):
                     "License has not been accepted before and no licpath parameter value provided"
                 )
 
-    def wait_until_accelerator_is_operational(
-        self, lparAccess, attempts, token_refresh_time
+    def _wait_for_status(
+        self,
+        get_status,
+        target,
+        attempts,
+        what,
+        deadline=None,
+        on_poll=None,
+        failures=(),
     ):
         """
-        waits for 'attempts' 40s steps that the accelerator becomes operational
-        refreshes access token every 'token_refresh_time' steps
+        Watch get_status until it returns target, for at most 'attempts'
+        STATUS_WAIT_STEP steps (default: see wait_attempts), or until it
+        returns one of the failure states of the endpoint. The status is
+        polled by its StatusPoller, shared with concurrent waits. Status
+        changes are printed, with the time left the lifecycle history predicts.
+        Returns True if the target was reached, False if the time is up.
+
+        Raises:
+          StateError if the status is one of failures
         """
+        printed = [None, time.monotonic()]
+
+        def report(status):
+            log.debug(status)
+            eta = None if status == target else watcher.eta(status)
+            if status != printed[0] or (
+                eta is not None and time.monotonic() - printed[1] >= STATUS_WAIT_STEP
+            ):
+                printed[:] = [status, time.monotonic()]
+                if eta is None:
+                    print("... ", status)
+                else:
+                    print("... ", status, "(ETA %s)" % _format_eta(eta))
+            if on_poll is not None:
+                on_poll(status)
+
+        watcher = StateWatcher(
+            (target,),
+            failures,
+            self.wait_attempts(what, attempts) * STATUS_WAIT_STEP,
+            what=what,
+            history=self.lifecycle_history,
+            labels=self.lifecycle_labels(),
+        )
+        poller = self.status_poller(get_status)
+        return poller.watch(watcher, deadline or self.deadline, report) is not None
 
+    def wait_until_accelerator_is_operational(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
+        """
+        waits up to 'attempts' 40s steps that the accelerator becomes operational
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
+        """
         print("Wait for operational accelerator")
 
-        # get a new token before waiting
-        self.getApiToken(lparAccess)
-
-        attempts = attempts
-        status = self.get_accelerator_status()
-        log.debug(status)
-        while status != "READY" and attempts > 0:
-            attempts -= 1
-            log.debug("attempts %d" % attempts)
-            time.sleep(40)
-
-            if attempts % token_refresh_time == 0:
-                self.getApiToken(lparAccess)
-
-            status = self.get_accelerator_status()
-            print("... ", status)
-
-        if attempts == 0:
+        if not self._wait_for_status(
+            self.get_accelerator_status,
+            "READY",
+            attempts,
+            "accelerator READY",
+            deadline,
+            failures=ACCELERATOR_FAILURE_STATES,
+        ):
             raise Exception("Accelerator base did not come up in time")
 
         print
@@ -855,33 +5373,23 @@ class SecureServiceContainerAPI(object):
         print("***********************************************************")
 
     def wait_until_accelerator_is_starting(
-        self, lparAccess, attempts, token_refresh_time
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
     ):
         """
-        waits for 'attempts' 40s steps that the accelerator ist starting
-        refreshes access token every 'token_refresh_time' steps
+        waits up to 'attempts' 40s steps that the accelerator ist starting
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
         """
-
         print("Wait for starting accelerator")
 
-        # get a new token before waiting
-        self.getApiToken(lparAccess)
-
-        attempts = attempts
-        status = self.get_accelerator_status()
-        log.debug(status)
-        while status != "STARTING" and attempts > 0:
-            attempts -= 1
-            log.debug("attempts %d" % attempts)
-            time.sleep(40)
-
-            if attempts % token_refresh_time == 0:
-                self.getApiToken(lparAccess)
-
-            status = self.get_accelerator_status()
-            print("... ", status)
-
-        if attempts == 0:
+        if not self._wait_for_status(
+            self.get_accelerator_status,
+            "STARTING",
+            attempts,
+            "accelerator STARTING",
+            deadline,
+            failures=ACCELERATOR_FAILURE_STATES,
+        ):
             raise Exception("Accelerator base did not come up in time")
 
         print
@@ -889,77 +5397,61 @@ class SecureServiceContainerAPI(object):
         print("Accelerator is starting")
         print("***********************************************************")
 
-    def wait_until_update_credentials(self, lparAccess, attempts, token_refresh_time):
+    def wait_until_update_credentials(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
         """
-        waits for 'attempts' 40s steps that the accelerator reaches credentials input state
-        refreshes access token every 'token_refresh_time' steps
+        waits up to 'attempts' 40s steps that the accelerator reaches credentials input state
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
         """
-
         print("Wait for credential update")
 
-        # get a new token before waiting
-        self.getApiToken(lparAccess)
-
-        attempts = attempts
-        status = status = self.get_accelerator_status()
-        log.debug(status)
-        while status != "UPDATE_CLUSTER_WAIT_CREDENTIALS" and attempts > 0:
-            attempts -= 1
-            log.debug("attempts %d" % attempts)
-            time.sleep(40)
-            if attempts % token_refresh_time == 0:
-                self.getApiToken(lparAccess)
-            status = self.get_accelerator_status()
-            print("... (waiting for UPDATE_CLUSTER_WAIT_CREDENTIALS)", status)
-
-        if attempts == 0:
+        if not self._wait_for_status(
+            self.get_accelerator_status,
+            "UPDATE_CLUSTER_WAIT_CREDENTIALS",
+            attempts,
+            "accelerator UPDATE_CLUSTER_WAIT_CREDENTIALS",
+            deadline,
+            failures=ACCELERATOR_FAILURE_STATES,
+        ):
             raise Exception(
                 "Waiting for UPDATE_CLUSTER_WAIT_CREDENTIALS did not complete in time"
             )
 
     def wait_until_server_is_operational(
-        self, lparAccess, attempts, token_refresh_time
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
     ):
         """
-        waits for 'attempts' 40s steps that the server becomes operational
-        refreshes access token every 'token_refresh_time' steps
+        waits up to 'attempts' 40s steps that the server becomes operational
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
         """
-
         print("Wait for server start")
+        pinged = [time.monotonic()]
 
-        # get a new token before waiting
-        self.getApiToken(lparAccess)
-
-        acceleratorServerStatus = self.get_accelerator_server_status()
-        log.debug(acceleratorServerStatus)
-        attempts = attempts
-        while acceleratorServerStatus != "RUNNING" and attempts > 0:
-            attempts -= 1
-            log.debug("attempts %d" % attempts)
-            time.sleep(40)
-
-            acceleratorServerStatus = self.get_accelerator_server_status()
-            if acceleratorServerStatus == "RUNNING":
-                print("... RUNNING")
+        def report(probe):
+            if probe.result():
+                print(lparAccess.address, "is reachable")
             else:
-                log.debug(acceleratorServerStatus)
-                print("... STARTING")
-
-            if attempts % token_refresh_time == 0:
-                self.getApiToken(lparAccess)
-
-            with open(os.devnull, "w") as DEVNULL:
-                try:
-                    subprocess.check_call(
-                        ["ping", "-c", "1", lparAccess.address],
-                        stdout=DEVNULL,  # suppress output
-                        stderr=DEVNULL,
-                    )
-                    print(lparAccess.address, "is pingable")
-                except subprocess.CalledProcessError:
-                    print(lparAccess.address, "is NOT pingable")
-
-        if attempts == 0:
+                print(lparAccess.address, "is NOT reachable")
+
+        def ping(status):
+            # reachability of the LPAR, at most once per step while waiting,
+            # probed in the background next to the status polls
+            if status == "RUNNING" or time.monotonic() - pinged[0] < STATUS_WAIT_STEP:
+                return
+            pinged[0] = time.monotonic()
+            self.reachability.probe_async().add_done_callback(report)
+
+        if not self._wait_for_status(
+            self.get_accelerator_server_status,
+            "RUNNING",
+            attempts,
+            "accelerator server RUNNING",
+            deadline,
+            ping,
+        ):
             raise Exception("Accelerator components did not come up in time")
 
         print
@@ -967,44 +5459,512 @@ class SecureServiceContainerAPI(object):
         print("Accelerator started successfully and is ready to use")
         print("***********************************************************")
 
-    def wait_for_reboot_to_complete(self, lparAccess, attempts):
-        """
-        After a reboot request, poll the server until it responds again.
-        Or return False after some defined retry attempts.
+    def wait_for_reboot_to_complete(
+        self,
+        lparAccess,
+        attempts=None,
+        deadline=None,
+        poll_interval=None,
+        expected_name=None,
+        prefix="",
+        prewarm=False,
+    ):
         """
+        After a reboot request, follow the reboot with a RebootTracker
+        until the appliance is up again, for at most 'attempts' 30s steps
+        (default: see wait_attempts). The tracker is kept as last_reboot,
+        with the timings of its phases.
+
+        Parameters:
+          poll_interval (float): Seconds between the probes
+                                 (default: REBOOT_PROBE_INTERVAL)
+          expected_name (string): Appliance name to wait for, e.g.
+                                  APPLIANCE_INSTALLER (default: any)
+          prefix (string): Printed in front of the progress messages
+          prewarm (bool): Log in as soon as the HTTPS port is open
 
+        Raises:
+          Exception if the reboot did not complete in time
+        """
         log.debug("Wait until reboot completed")
-        attempts = attempts
-        available = False
-        print("The appliance is rebooting. Please wait.")
-        while not available and attempts > 0:
-            attempts -= 1
-            print("... ", attempts)
-            log.debug("attempts %d" % attempts)
-            time.sleep(30)
-            log.debug("Ping appliance with 5 seconds timeout")
-            available = self.ping_appliance(5)
-            log.debug(available)
-
-        if available == True:
-            # after reboot, the API token needs to be re-established (new log in)
-            self.getApiToken(lparAccess)
-            log.debug("Get appliance status")
-            resultCode, json, message = self.get_appliance_status()
-            log.debug(resultCode)
-            log.debug(json)
-            if resultCode.status_code == 503:
-                log.debug("The appliance is rebooting.")
-                available = False
-            elif resultCode.status_code == 200:
-                appliance_name = json["properties"]["name"]
-                print("Appliance name: ", appliance_name)
-                log.debug("Appliance name: " + appliance_name)
-            else:
-                log.debug(resultCode.status_code)
-        else:
-            raise Exception("Reboot did not complete in time")
+        print(prefix + "The appliance is rebooting. Please wait.")
+        tracker = RebootTracker(
+            self,
+            lparAccess,
+            expected_name,
+            poll_interval or REBOOT_PROBE_INTERVAL,
+            prefix=prefix,
+            prewarm=prewarm,
+        )
+        self.last_reboot = tracker
+        attempts = self.wait_attempts(tracker.what, attempts, REBOOT_WAIT_STEP)
+        if not tracker.wait(attempts * REBOOT_WAIT_STEP, deadline or self.deadline):
+            raise Exception(
+                "Reboot did not complete in time (waiting for: %s)"
+                % dict(tracker.PHASES)[tracker.phase]
+            )
+        print(prefix + "Appliance name: ", tracker.appliance_name)
+        log.debug("Appliance name: " + tracker.appliance_name)
+        return True
+
+    ###################################################################
+
+
+###################################################################
+#
+# Command line options shared by the sample scripts
+#
+###################################################################
+
+
+def _timeout_spec(spec):
+    try:
+        TimeoutConfig().override(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def add_api_arguments(parser):
+    """
+    Add the command line options configuring the SecureServiceContainerAPI object
+
+    Parameters:
+      parser (argparse.ArgumentParser): Parser of the sample script
+    """
+    parser.add_argument(
+        "--token-cache",
+        dest="token_cache",
+        action="store",
+        type=str,
+        default=os.environ.get(TOKEN_CACHE_ENV),
+        help="File caching API tokens between script invocations "
+        "(default: $%s, no caching if not set)" % TOKEN_CACHE_ENV,
+    )
+    parser.add_argument(
+        "--cache-responses",
+        dest="cache_responses",
+        action="store_true",
+        help="Reuse responses of read-only API endpoints within the script run",
+    )
+    parser.add_argument(
+        "--trace-file",
+        dest="trace_file",
+        action="store",
+        type=str,
+        help="Append timings of every API request to this file (JSON lines)",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeouts",
+        action="append",
+        type=_timeout_spec,
+        metavar="[CLASS=]CONNECT[,READ]",
+        help="Override the connect and read timeouts (seconds) of all requests "
+        "or of one class: %s (can be repeated)" % ", ".join(DEFAULT_TIMEOUTS),
+    )
+    parser.add_argument(
+        "--max-rate",
+        dest="max_rate",
+        action="store",
+        type=float,
+        help="Upload bandwidth limit of all uploads of the script in MB/s",
+    )
+    parser.add_argument(
+        "--max-rate-per-lpar",
+        dest="max_rate_per_lpar",
+        action="store",
+        type=float,
+        help="Upload bandwidth limit per LPAR in MB/s",
+    )
+    parser.add_argument(
+        "--upload-priority",
+        dest="upload_priority",
+        action="store",
+        choices=list(UPLOAD_PRIORITIES),
+        default="normal",
+        help="Bandwidth priority of the uploads of the script (default: normal)",
+    )
+    parser.add_argument(
+        "--path-health",
+        dest="path_health",
+        action="store",
+        type=str,
+        default=os.environ.get(PATH_HEALTH_ENV),
+        help="File keeping the upload history of the FCP target ports between "
+        "script invocations, used to pick the fastest path "
+        "(default: $%s, history of the run only if not set)" % PATH_HEALTH_ENV,
+    )
+    parser.add_argument(
+        "--lifecycle-history",
+        dest="lifecycle_history",
+        action="store",
+        type=str,
+        default=os.environ.get(LIFECYCLE_HISTORY_ENV),
+        help="File keeping the state changes and durations of the waits and "
+        "reboots between script invocations (JSON lines), used to predict them "
+        "(default: $%s, history of the run only if not set)" % LIFECYCLE_HISTORY_ENV,
+    )
+    parser.add_argument(
+        "--deadline",
+        dest="deadline",
+        action="store",
+        type=int,
+        help="Seconds after which the script gives up, including all retries and waits "
+        "(default: no deadline)",
+    )
+
+
+def api_options(options):
+    """
+    Return the SecureServiceContainerAPI keyword arguments
+    for the options added by add_api_arguments
+
+    Parameters:
+      options (argparse.Namespace): Parsed command line options
+    """
+    kwargs = dict()
+    if options.token_cache:
+        kwargs["token_cache"] = TokenCache(options.token_cache)
+    if options.deadline:
+        kwargs["deadline"] = Deadline(options.deadline)
+    if options.max_rate or options.max_rate_per_lpar:
+        kwargs["bandwidth_limiter"] = shared_bandwidth_limiter(
+            options.max_rate * 1e6 if options.max_rate else None,
+            options.max_rate_per_lpar * 1e6 if options.max_rate_per_lpar else None,
+        )
+    kwargs["upload_priority"] = options.upload_priority
+    if options.path_health:
+        kwargs["path_health"] = PathHealthStore(options.path_health)
+    if options.lifecycle_history:
+        kwargs["lifecycle_history"] = LifecycleHistory(options.lifecycle_history)
+    if options.cache_responses:
+        kwargs["response_cache"] = ResponseCache()
+    if options.trace_file:
+        kwargs["instrumentation"] = TraceWriter(options.trace_file)
+    if options.timeouts:
+        timeouts = TimeoutConfig()
+        for spec in options.timeouts:
+            timeouts.override(spec)
+        kwargs["timeouts"] = timeouts
+    return kwargs
+
+
+###################################################################
+
+_async_executor = None
+_async_executor_lock = threading.Lock()
+
+
+def _get_async_executor():
+    """
+    Return the thread pool shared by all AsyncSecureServiceContainerAPI objects
+    """
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(
+                max_workers=ASYNC_MAX_WORKERS, thread_name_prefix="aqtSSC"
+            )
+        return _async_executor
+
+
+class AsyncSecureServiceContainerAPI(object):
+    """
+    Perform API requests against the SSC LPAR from asyncio coroutines
+
+    Mirrors SecureServiceContainerAPI. The HTTP calls themselves run on a shared
+    thread pool, all waiting is done with asyncio.sleep, so a single event loop
+    can drive many LPARs at once.
+
+    Create objects with:
+      ssc = await AsyncSecureServiceContainerAPI.create(lpar_access)
+    """
+
+    def __init__(self, api, executor=None):
+        """
+        Parameters:
+          api (SecureServiceContainerAPI): Logged in API object to wrap
+          executor (concurrent.futures.Executor): Runs the blocking HTTP calls
+            (default: thread pool shared by all objects)
+        """
+        self._api = api
+        self._executor = executor or _get_async_executor()
+
+    @classmethod
+    async def create(cls, lpar_access, executor=None, **kwargs):
+        """
+        Create the object and request the authentication token
+
+        Parameters:
+          lpar_access (Object): Adress of the LPAR, username and password
+          executor (concurrent.futures.Executor): Runs the blocking HTTP calls
+          kwargs: Passed on to SecureServiceContainerAPI
+        """
+        executor = executor or _get_async_executor()
+        loop = asyncio.get_running_loop()
+        api = await loop.run_in_executor(
+            executor,
+            functools.partial(SecureServiceContainerAPI, lpar_access, **kwargs),
+        )
+        return cls(api, executor)
+
+    @property
+    def api(self):
+        """
+        The wrapped SecureServiceContainerAPI object
+        """
+        return self._api
+
+    @property
+    def deadline(self):
+        return self._api.deadline
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(function, *args, **kwargs)
+        )
+
+    async def close(self):
+        await self._run(self._api.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def get(self, url):
+        return await self._run(self._api.get, url)
+
+    async def post(self, url, data=None):
+        return await self._run(self._api.post, url, data)
+
+    async def put(self, url, data=None):
+        return await self._run(self._api.put, url, data)
+
+    ###################################################################
+
+    async def getApiToken(self, lpar_access):
+        return await self._run(self._api.getApiToken, lpar_access)
 
-        return available
+    async def get_appliance_status(self):
+        return await self._run(self._api.get_appliance_status)
+
+    async def get_accelerator_status(self):
+        return await self._run(self._api.get_accelerator_status)
+
+    async def get_accelerator_server_status(self):
+        return await self._run(self._api.get_accelerator_server_status)
+
+    async def ping_appliance(self, timeout):
+        return await self._run(self._api.ping_appliance, timeout)
+
+    async def switch_to_installer(self):
+        return await self._run(self._api.switch_to_installer)
+
+    async def upload_image(
+        self, image, lpar_boot_device, lpar_access, deadline=None, **kwargs
+    ):
+        return await self._run(
+            self._api.upload_image,
+            image,
+            lpar_boot_device,
+            lpar_access,
+            deadline,
+            **kwargs,
+        )
+
+    async def reboot(self, lpar_boot_device, deadline=None):
+        return await self._run(self._api.reboot, lpar_boot_device, deadline)
 
     ###################################################################
+
+    async def _wait_for_status(
+        self,
+        get_status,
+        target,
+        lparAccess,
+        attempts,
+        message,
+        deadline=None,
+        what=None,
+        failures=(),
+    ):
+        """
+        Watch the status until it is target, for at most 'attempts'
+        STATUS_WAIT_STEP steps (see StateWatcher, default: see wait_attempts),
+        or until it is one of the failure states of the endpoint.
+        get_status is the method of the wrapped API object, its StatusPoller
+        does the polling. what is the key of the wait in the lifecycle history.
+        Returns True if the target was reached, False if the time is up.
+
+        Raises:
+          StateError if the status is one of failures
+        """
+
+        address = lparAccess.address
+        deadline = deadline or self._api.deadline
+        what = what or message
+        printed = [None, time.monotonic()]
+
+        def report(status):
+            log.debug("%s: %s" % (address, status))
+            eta = None if status == target else watcher.eta(status)
+            if status != printed[0] or (
+                eta is not None and time.monotonic() - printed[1] >= STATUS_WAIT_STEP
+            ):
+                printed[:] = [status, time.monotonic()]
+                if eta is None:
+                    print(address, "... (%s)" % message, status)
+                else:
+                    print(
+                        address,
+                        "... (%s)" % message,
+                        status,
+                        "(ETA %s)" % _format_eta(eta),
+                    )
+
+        watcher = StateWatcher(
+            (target,),
+            failures,
+            self._api.wait_attempts(what, attempts) * STATUS_WAIT_STEP,
+            what=what,
+            history=self._api.lifecycle_history,
+            labels=self._api.lifecycle_labels(),
+        )
+        poller = self._api.status_poller(get_status)
+        return await poller.async_watch(watcher, deadline, report) is not None
+
+    async def wait_until_accelerator_is_operational(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
+        """
+        waits up to 'attempts' 40s steps that the accelerator becomes operational
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
+        """
+
+        print(lparAccess.address, "Wait for operational accelerator")
+        reached = await self._wait_for_status(
+            self._api.get_accelerator_status,
+            "READY",
+            lparAccess,
+            attempts,
+            "waiting for READY",
+            deadline,
+            what="accelerator READY",
+            failures=ACCELERATOR_FAILURE_STATES,
+        )
+        if not reached:
+            raise Exception(
+                "Accelerator base on %s did not come up in time" % lparAccess.address
+            )
+        print(lparAccess.address, "Accelerator base started successfully")
+
+    async def wait_until_accelerator_is_starting(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
+        """
+        waits up to 'attempts' 40s steps that the accelerator ist starting
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
+        """
+
+        print(lparAccess.address, "Wait for starting accelerator")
+        reached = await self._wait_for_status(
+            self._api.get_accelerator_status,
+            "STARTING",
+            lparAccess,
+            attempts,
+            "waiting for STARTING",
+            deadline,
+            what="accelerator STARTING",
+            failures=ACCELERATOR_FAILURE_STATES,
+        )
+        if not reached:
+            raise Exception(
+                "Accelerator base on %s did not come up in time" % lparAccess.address
+            )
+        print(lparAccess.address, "Accelerator is starting")
+
+    async def wait_until_update_credentials(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
+        """
+        waits up to 'attempts' 40s steps that the accelerator reaches credentials input state
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
+        """
+
+        print(lparAccess.address, "Wait for credential update")
+        reached = await self._wait_for_status(
+            self._api.get_accelerator_status,
+            "UPDATE_CLUSTER_WAIT_CREDENTIALS",
+            lparAccess,
+            attempts,
+            "waiting for UPDATE_CLUSTER_WAIT_CREDENTIALS",
+            deadline,
+            what="accelerator UPDATE_CLUSTER_WAIT_CREDENTIALS",
+            failures=ACCELERATOR_FAILURE_STATES,
+        )
+        if not reached:
+            raise Exception(
+                "Waiting for UPDATE_CLUSTER_WAIT_CREDENTIALS on %s did not complete in time"
+                % lparAccess.address
+            )
+
+    async def wait_until_server_is_operational(
+        self, lparAccess, attempts=None, token_refresh_time=None, deadline=None
+    ):
+        """
+        waits up to 'attempts' 40s steps that the server becomes operational
+        (default: see wait_attempts)
+        token_refresh_time is ignored, the token manager keeps the token valid
+        """
+
+        print(lparAccess.address, "Wait for server start")
+        reached = await self._wait_for_status(
+            self._api.get_accelerator_server_status,
+            "RUNNING",
+            lparAccess,
+            attempts,
+            "waiting for RUNNING",
+            deadline,
+            what="accelerator server RUNNING",
+        )
+        if not reached:
+            raise Exception(
+                "Accelerator components on %s did not come up in time"
+                % lparAccess.address
+            )
+        print(
+            lparAccess.address, "Accelerator started successfully and is ready to use"
+        )
+
+    async def wait_for_reboot_to_complete(
+        self, lparAccess, attempts=None, deadline=None, expected_name=None
+    ):
+        """
+        After a reboot request, follow the reboot with a RebootTracker
+        until the appliance is up again, for at most 'attempts' 30s steps
+        (default: see wait_attempts). Only the probes run on the thread pool,
+        the tracker waits between them on the event loop.
+        """
+        address = lparAccess.address
+        print(address, "The appliance is rebooting. Please wait.")
+        tracker = RebootTracker(
+            self._api, lparAccess, expected_name, prefix=address + " "
+        )
+        self._api.last_reboot = tracker
+        attempts = self._api.wait_attempts(tracker.what, attempts, REBOOT_WAIT_STEP)
+        if not await tracker.async_wait(
+            attempts * REBOOT_WAIT_STEP, deadline or self._api.deadline, self._run
+        ):
+            raise Exception("Reboot of %s did not complete in time" % address)
+        print(address, "Appliance name: ", tracker.appliance_name)
+        return True
+
+
+###################################################################
@@ -41,6 +41,8 @@
 IP=$1
 RETRYTIME=300
 RETRYINTERVAL=30
+# the probe is next to this script, whatever the working directory
+PROBE="$(dirname "$0")/sample-probe.py"
 
 # if no IP then skip OK
 if [ -z $IP ]
@@ -54,7 +56,8 @@ fi
 
 # if wget returns appliance signature then OK
 # retry for 5mins with sleeptime of 30s
-until [[ 0 -lt `wget --no-check-certificate https://${IP}/ibmapp -qO- | grep "need to enable JavaScript" | wc -l` ]]
+# (wget only runs once the probe sees the HTTPS port accepting connections)
+until "${PROBE}" ${IP} > /dev/null && [[ 0 -lt `wget --no-check-certificate https://${IP}/ibmapp -qO- | grep "need to enable JavaScript" | wc -l` ]]
 do
       if (( RETRYTIME < RETRYINTERVAL ))
       then
@@ -42,6 +42,8 @@
 IP=$1
 RETRYTIME=300
 RETRYINTERVAL=30
+# the probe is next to this script, whatever the working directory
+PROBE="$(dirname "$0")/sample-probe.py"
 
 # if no IP then skip OK
 if [ -z $IP ]
@@ -55,7 +57,8 @@ fi
 
 # if curl/wget returns installer signature then OK
 # retry for 5mins with sleeptime of 30s
-until [[ 0 -lt `wget --no-check-certificate --timeout=5 https://${IP}/ibmapp -qO- | grep installer | wc -l` ]]
+# (wget only runs once the probe sees the HTTPS port accepting connections)
+until "${PROBE}" ${IP} > /dev/null && [[ 0 -lt `wget --no-check-certificate --timeout=5 https://${IP}/ibmapp -qO- | grep installer | wc -l` ]]
 do
       if (( RETRYTIME < RETRYINTERVAL ))
       then
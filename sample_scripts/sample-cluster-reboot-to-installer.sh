@@ -52,7 +52,7 @@ fi
 
 echo $MGMTIP
 echo "rebooting node ${MGMTIP}"
-./sample-reboot-to-installer.py ${MGMTIP} ${LPAR_USER} ${LPAR_PASSWORD}
+./sample-reboot-to-installer.py ${MGMTIP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
 
 if [ -z $DN1IP ]
 then
@@ -68,7 +68,7 @@ else
         else
         	sleep $sleeptime
                 echo "rebooting node ${DN1IP}"
-                ./sample-reboot-to-installer.py ${DN1IP} ${LPAR_USER} ${LPAR_PASSWORD}
+                ./sample-reboot-to-installer.py ${DN1IP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
         fi
 
         if [ -z $DN2IP ]
@@ -78,7 +78,7 @@ else
         else
                 sleep $sleeptime
                 echo "rebooting node ${DN2IP}"
-                ./sample-reboot-to-installer.py ${DN2IP} ${LPAR_USER} ${LPAR_PASSWORD}
+                ./sample-reboot-to-installer.py ${DN2IP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
         fi
 
         if [ -z $DN3IP ]
@@ -88,7 +88,7 @@ else
         else
                 sleep $sleeptime                
                 echo "rebooting node ${DN3IP}"
-                ./sample-reboot-to-installer.py ${DN3IP} ${LPAR_USER} ${LPAR_PASSWORD}
+                ./sample-reboot-to-installer.py ${DN3IP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
         fi
 
         if [ -z $DN4IP ]
@@ -98,7 +98,7 @@ else
         else
                 sleep $sleeptime                
                 echo "rebooting node ${DN4IP}"
-                ./sample-reboot-to-installer.py ${DN4IP} ${LPAR_USER} ${LPAR_PASSWORD}
+                ./sample-reboot-to-installer.py ${DN4IP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
         fi
 
         if [ -z $DN5IP ]
@@ -108,7 +108,7 @@ else
         else
                 sleep $sleeptime                
                 echo "rebooting node ${DN5IP}"
-                ./sample-reboot-to-installer.py ${DN5IP} ${LPAR_USER} ${LPAR_PASSWORD}
+                ./sample-reboot-to-installer.py ${DN5IP} ${LPAR_USER} ${LPAR_PASSWORD} --no-wait
         fi
 
 fi
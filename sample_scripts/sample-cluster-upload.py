@@ -0,0 +1,336 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------------------------
+#
+# Licensed Materials - Property of IBM
+# 5697-DA7
+# (C) Copyright IBM Corp. 2026.
+#
+# US Government Users Restricted Rights
+# Use, duplication or disclosure restricted by GSA ADP Schedule
+# Contract with IBM Corp.
+#
+# DISCLAIMER OF WARRANTIES :
+#
+# Permission is granted to copy and modify this  Sample code provided
+# that both the copyright  notice,- and this permission notice and
+# warranty disclaimer  appear in all copies and modified versions.
+#
+# THIS SAMPLE CODE IS LICENSED TO YOU AS-IS.
+# IBM  AND ITS SUPPLIERS AND LICENSORS  DISCLAIM ALL WARRANTIES,
+# EITHER EXPRESS OR IMPLIED, IN SUCH SAMPLE CODE, INCLUDING THE
+# WARRANTY OF NON-INFRINGEMENT AND THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY OR FITNESS FOR A PARTICULAR PURPOSE. IN NO EVENT
+# WILL IBM OR ITS LICENSORS OR SUPPLIERS BE LIABLE FOR ANY DAMAGES
+# ARISING OUT OF THE USE OF OR INABILITY TO USE THE SAMPLE CODE OR
+# COMBINATION OF THE SAMPLE CODE WITH ANY OTHER CODE. IN NO EVENT
+# SHALL IBM OR ITS LICENSORS AND SUPPLIERS BE LIABLE FOR ANY LOST
+# REVENUE, LOST PROFITS OR DATA, OR FOR DIRECT, INDIRECT, SPECIAL,
+# CONSEQUENTIAL, INCIDENTAL OR PUNITIVE DAMAGES, HOWEVER CAUSED AND
+# REGARDLESS OF THE THEORY OF LIABILITY,-, EVEN IF IBM OR ITS
+# LICENSORS OR SUPPLIERS HAVE BEEN ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGES.
+#
+# -----------------------------------------------------------------------------
+
+###################################################################
+#
+# Configuration for Db2 Analytics Accelerator for z/OS on IBM Z
+# Upload one image to all nodes of a multiple node Accelerator
+# (the image is read once and sent to all nodes concurrently,
+# the nodes must run the installer, see
+# sample-cluster-reboot-to-installer.sh)
+#
+###################################################################
+
+
+import os
+import sys
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from lib.aqtSSC import SecureServiceContainerAPI
+from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import LPARBootDevice
+from lib.aqtSSC import ProgressPrinter
+from lib.aqtSSC import broadcast_upload, read_checksum_file
+from lib.aqtSSC import DEFAULT_BROADCAST_BUFFER_CHUNKS
+from lib.aqtSSC import DEFAULT_BROADCAST_STALL_TIMEOUT, DEFAULT_UPLOAD_CHUNK_SIZE
+from lib.aqtSSC import add_api_arguments, api_options
+from lib.aqtSSC import APPLIANCE_INSTALLER, APPLIANCE_ACCELERATOR
+
+log = None
+
+
+def has_dasd(dasdId, instances):
+    for dasd in instances:
+        if dasdId in list(dasd.values()):
+            return True
+    return False
+
+
+def reboot(ssc, lparAccess, lparBootDevice):
+    """
+    Reboot a node into the accelerator and follow the reboot, the tracking
+    starts right after the request so the node is seen going down
+    """
+    print("Rebooting LPAR %s" % lparAccess.address)
+    resultCode, _, _ = ssc.reboot(lparBootDevice)
+    log.debug(resultCode)
+    if resultCode.status_code == 202:
+        log.debug("LPAR Reboot successfully submitted")
+    ssc.wait_for_reboot_to_complete(
+        lparAccess,
+        expected_name=APPLIANCE_ACCELERATOR,
+        prefix=lparAccess.address + " ",
+    )
+
+
+def panic(self, msg):
+    log.critical(msg)
+    self.error(msg)
+
+
+def parse_node(node):
+    """
+    Return (LPARAccess address, LPARBootDevice) of LPAR_IP,BOOTDEVICE_ID[,BOOTUDID]
+    """
+    fields = node.split(",")
+    if len(fields) not in (2, 3):
+        raise argparse.ArgumentTypeError(
+            "Node must be LPAR_IP,BOOTDEVICE_ID[,BOOTUDID], got " + node
+        )
+    boot_wwpn = None
+    boot_lun = None
+    if len(fields) == 3:
+        if len(fields[2]) != 32:
+            raise argparse.ArgumentTypeError(
+                "UDID must be 32 hex digits, got " + str(len(fields[2]))
+            )
+        # split into old wwpn lun
+        boot_wwpn = "0x" + fields[2][:16]
+        boot_lun = "0x" + fields[2][16:]
+    return (fields[0], LPARBootDevice(fields[1], boot_wwpn, boot_lun))
+
+
+def parseargv(argv):
+    """
+    Parse the command line options and validates them.
+    Return a tuple with the list of (lpar access, boot device),
+    the image, the upload options and the verbosity.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Db2 Analytics Accelerator image upload to all nodes."
+    )
+
+    parser.panic = lambda msg: panic(parser, msg)
+
+    parser.add_argument(
+        "lparusername",
+        metavar="LPAR_USERNAME",
+        action="store",
+        type=str,
+        help="Name of the Appliance user",
+    )
+    parser.add_argument(
+        "lparpassword",
+        metavar="LPAR_PASSWORD",
+        action="store",
+        type=str,
+        help="Password of the Appliance user",
+    )
+    parser.add_argument(
+        "image",
+        metavar="IMAGE_NAME",
+        action="store",
+        type=str,
+        help="Db2 Analytics Accelerator image to install",
+    )
+    parser.add_argument(
+        "nodes",
+        metavar="LPAR_IP,BOOTDEVICE_ID[,BOOTUDID]",
+        action="store",
+        type=parse_node,
+        nargs="+",
+        help="SSC LPAR and boot device of every node (UDID for SCSI disks only)",
+    )
+    parser.add_argument(
+        "--sha256",
+        dest="sha256",
+        action="store",
+        type=str,
+        help="Expected SHA-256 checksum of the image, verified while uploading",
+    )
+    parser.add_argument(
+        "--sha256-file",
+        dest="sha256_file",
+        action="store",
+        type=str,
+        help="File with the SHA-256 checksum of the image (sha256sum or BSD format)",
+    )
+    parser.add_argument(
+        "--buffer-chunks",
+        dest="buffer_chunks",
+        action="store",
+        type=int,
+        default=DEFAULT_BROADCAST_BUFFER_CHUNKS,
+        help="Image chunks (of %d KiB) buffered per node, limits how far the "
+        "fastest node gets ahead of the slowest (default: %d)"
+        % (DEFAULT_UPLOAD_CHUNK_SIZE // 1024, DEFAULT_BROADCAST_BUFFER_CHUNKS),
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        dest="stall_timeout",
+        action="store",
+        type=int,
+        default=DEFAULT_BROADCAST_STALL_TIMEOUT,
+        help="Seconds a node may hold up the others before its upload is "
+        "aborted (default: %d)" % DEFAULT_BROADCAST_STALL_TIMEOUT,
+    )
+
+    add_api_arguments(parser)
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="count",
+        default=0,
+        help="Increase output verbosity and logging",
+    )
+
+    options = parser.parse_args(argv[1:])
+    if options.sha256 and options.sha256_file:
+        parser.error("--sha256 and --sha256-file are mutually exclusive")
+    if options.sha256_file:
+        options.sha256 = read_checksum_file(options.sha256_file, options.image)
+
+    print("Name of Appliance user: ", options.lparusername)
+    print("Image name: ", options.image)
+    for address, lparBootDevice in options.nodes:
+        print("Node: %s, boot device %s" % (address, lparBootDevice.boot_device_id))
+    if options.sha256:
+        print("Image SHA-256 checksum: ", options.sha256)
+
+    nodes = [
+        (
+            LPARAccess(address, options.lparusername, options.lparpassword),
+            lparBootDevice,
+        )
+        for address, lparBootDevice in options.nodes
+    ]
+    uploadOptions = {
+        "checksum": options.sha256,
+        "buffer_chunks": options.buffer_chunks,
+        "stall_timeout": options.stall_timeout,
+    }
+    return (nodes, options.image, uploadOptions, options.verbose, api_options(options))
+
+
+def main(argv):
+    global log
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger(os.path.basename(argv[0]))
+
+    print("***********************************************************")
+    print()
+    print("  Db2 Analytics Accelerator image upload (all nodes)")
+    print()
+    print("***********************************************************")
+    try:
+        nodes, image, uploadOptions, verbose, apiOptions = parseargv(argv)
+        # set loglevel, higher levels also set the loglevel of the libraries.
+        if verbose >= 1:
+            log.setLevel(logging.INFO)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.INFO)
+        if verbose >= 2:
+            log.setLevel(logging.DEBUG)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.DEBUG)
+        if verbose >= 3:
+            logging.getLogger("requests").setLevel(logging.INFO)
+            logging.getLogger("urllib3").setLevel(logging.INFO)
+        if verbose >= 4:
+            logging.getLogger("requests").setLevel(logging.DEBUG)
+            logging.getLogger("urllib3").setLevel(logging.DEBUG)
+
+        uploads = list()
+        for lparAccess, lparBootDevice in nodes:
+            ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
+            appliance_name, _ = ssc.print_and_return_appliance_status(lparAccess)
+            if appliance_name != APPLIANCE_INSTALLER:
+                raise Exception(
+                    "%s does not run the installer, "
+                    "run sample-cluster-reboot-to-installer.sh first"
+                    % lparAccess.address
+                )
+            if lparBootDevice.boot_wwpn is None and lparBootDevice.boot_lun is None:
+                print(
+                    "Check if DASD %s is assigned to LPAR %s"
+                    % (lparBootDevice.boot_device_id, lparAccess.address)
+                )
+                if not has_dasd(lparBootDevice.boot_device_id, ssc.iter_ECKD()):
+                    raise Exception(
+                        "Missing boot DASD {0} on {1}".format(
+                            lparBootDevice.boot_device_id, lparAccess.address
+                        )
+                    )
+            uploads.append((ssc, lparBootDevice))
+
+        print()
+        print("Uploading image to %d nodes: %s" % (len(uploads), image))
+        printers = [
+            ProgressPrinter("  %s: " % lparAccess.address, in_place=False)
+            for lparAccess, _ in nodes
+        ]
+        results = broadcast_upload(
+            uploads,
+            image,
+            progress=lambda index, progress: printers[index](progress),
+            **uploadOptions,
+        )
+
+        print()
+        print("Node                    Result       MB/s")
+        print("------------------------------------------")
+        failed = 0
+        for (lparAccess, _), (result, progress) in zip(nodes, results):
+            if isinstance(result, Exception):
+                status = "failed"
+                failed += 1
+                log.error("%s: %s" % (lparAccess.address, result))
+            else:
+                status = str(result.status_code)
+                if not result.ok:
+                    failed += 1
+            rate = "%.1f" % (progress.rate / 1e6) if progress else "-"
+            print("%-22s %8s %10s" % (lparAccess.address, status, rate))
+        print("------------------------------------------")
+        if failed > 0:
+            raise Exception("Image upload failed on %d nodes" % failed)
+
+        # the nodes reboot at the same time, each followed by its own tracker
+        with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+            reboots = [
+                executor.submit(reboot, ssc, lparAccess, lparBootDevice)
+                for (ssc, lparBootDevice), (lparAccess, _) in zip(uploads, nodes)
+            ]
+        failed = 0
+        for future, (lparAccess, _) in zip(reboots, nodes):
+            if future.exception() is not None:
+                failed += 1
+                log.error("%s: %s" % (lparAccess.address, future.exception()))
+        if failed > 0:
+            raise Exception("Reboot failed on %d nodes" % failed)
+        print("***********************************************************")
+        print("Image upload completed")
+        print("***********************************************************")
+
+    except Exception as e:
+        log.critical(e)
+        sys.exit(2)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
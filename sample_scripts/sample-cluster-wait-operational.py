@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------------------------
+#
+# Licensed Materials - Property of IBM
+# 5697-DA7
+# (C) Copyright IBM Corp. 2026.
+#
+# US Government Users Restricted Rights
+# Use, duplication or disclosure restricted by GSA ADP Schedule
+# Contract with IBM Corp.
+#
+# DISCLAIMER OF WARRANTIES :
+#
+# Permission is granted to copy and modify this  Sample code provided
+# that both the copyright  notice,- and this permission notice and
+# warranty disclaimer  appear in all copies and modified versions.
+#
+# THIS SAMPLE CODE IS LICENSED TO YOU AS-IS.
+# IBM  AND ITS SUPPLIERS AND LICENSORS  DISCLAIM ALL WARRANTIES,
+# EITHER EXPRESS OR IMPLIED, IN SUCH SAMPLE CODE, INCLUDING THE
+# WARRANTY OF NON-INFRINGEMENT AND THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY OR FITNESS FOR A PARTICULAR PURPOSE. IN NO EVENT
+# WILL IBM OR ITS LICENSORS OR SUPPLIERS BE LIABLE FOR ANY DAMAGES
+# ARISING OUT OF THE USE OF OR INABILITY TO USE THE SAMPLE CODE OR
+# COMBINATION OF THE SAMPLE CODE WITH ANY OTHER CODE. IN NO EVENT
+# SHALL IBM OR ITS LICENSORS AND SUPPLIERS BE LIABLE FOR ANY LOST
+# REVENUE, LOST PROFITS OR DATA, OR FOR DIRECT, INDIRECT, SPECIAL,
+# CONSEQUENTIAL, INCIDENTAL OR PUNITIVE DAMAGES, HOWEVER CAUSED AND
+# REGARDLESS OF THE THEORY OF LIABILITY,-, EVEN IF IBM OR ITS
+# LICENSORS OR SUPPLIERS HAVE BEEN ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGES.
+#
+# -----------------------------------------------------------------------------
+
+###################################################################
+#
+# Configuration for Db2 Analytics Accelerator for z/OS on IBM Z
+# Wait until all nodes of a multiple node Accelerator are operational
+# (all nodes are watched concurrently from one process)
+#
+###################################################################
+
+
+import os
+import sys
+import logging
+import argparse
+import asyncio
+from lib.aqtSSC import AsyncSecureServiceContainerAPI
+from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
+
+log = None
+
+
+def panic(self, msg):
+    log.critical(msg)
+    self.error(msg)
+
+
+def parseargv(argv):
+    """
+    Parse the command line options and validates them.
+    Return a tuple with the list of lpar accesses and the verbosity.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Db2 Analytics Accelerator wait for operational cluster."
+    )
+
+    parser.panic = lambda msg: panic(parser, msg)
+
+    parser.add_argument(
+        "lparusername",
+        metavar="LPAR_USERNAME",
+        action="store",
+        type=str,
+        help="Name of the Appliance user",
+    )
+    parser.add_argument(
+        "lparpassword",
+        metavar="LPAR_PASSWORD",
+        action="store",
+        type=str,
+        help="Password of the Appliance user",
+    )
+    parser.add_argument(
+        "lparips",
+        metavar="LPAR_IP",
+        action="store",
+        type=str,
+        nargs="+",
+        help="The IP addresses or FQDNs of the SSC LPARs",
+    )
+
+    add_api_arguments(parser)
+
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="count",
+        default=0,
+        help="Increase output verbosity and logging",
+    )
+
+    options = parser.parse_args(argv[1:])
+
+    print("IP addresses or FQDNs of SSC LPARs: ", " ".join(options.lparips))
+    print("Name of Appliance user: ", options.lparusername)
+
+    lparAccesses = [
+        LPARAccess(lparip, options.lparusername, options.lparpassword)
+        for lparip in options.lparips
+    ]
+    return (lparAccesses, options.verbose, api_options(options))
+
+
+async def wait_operational(lparAccess, apiOptions):
+    ssc = await AsyncSecureServiceContainerAPI.create(lparAccess, **apiOptions)
+    async with ssc:
+        await ssc.wait_until_server_is_operational(lparAccess)
+
+
+async def wait_all_operational(lparAccesses, apiOptions):
+    results = await asyncio.gather(
+        *[wait_operational(lparAccess, apiOptions) for lparAccess in lparAccesses],
+        return_exceptions=True,
+    )
+    failed = 0
+    for lparAccess, result in zip(lparAccesses, results):
+        if isinstance(result, Exception):
+            log.critical("%s: %s" % (lparAccess.address, result))
+            failed += 1
+        else:
+            print(lparAccess.address, "is operational")
+    return failed
+
+
+def main(argv):
+    global log
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger(os.path.basename(argv[0]))
+
+    print("*************************************************************")
+    print()
+    print("  Db2 Analytics Accelerator wait operational (all nodes)")
+    print()
+    print("*************************************************************")
+    try:
+        lparAccesses, verbose, apiOptions = parseargv(argv)
+        # set loglevel, higher levels also set the loglevel of the libraries.
+        if verbose >= 1:
+            log.setLevel(logging.INFO)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.INFO)
+        if verbose >= 2:
+            log.setLevel(logging.DEBUG)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.DEBUG)
+        if verbose >= 3:
+            logging.getLogger("requests").setLevel(logging.INFO)
+            logging.getLogger("urllib3").setLevel(logging.INFO)
+        if verbose >= 4:
+            logging.getLogger("requests").setLevel(logging.DEBUG)
+            logging.getLogger("urllib3").setLevel(logging.DEBUG)
+
+        failed = asyncio.run(wait_all_operational(lparAccesses, apiOptions))
+        if failed > 0:
+            raise Exception("%d nodes did not become operational" % failed)
+
+    except Exception as e:
+        log.critical(e)
+        sys.exit(2)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------------------------
+#
+# Licensed Materials - Property of IBM
+# 5697-DA7
+# (C) Copyright IBM Corp. 2026.
+#
+# US Government Users Restricted Rights
+# Use, duplication or disclosure restricted by GSA ADP Schedule
+# Contract with IBM Corp.
+#
+# DISCLAIMER OF WARRANTIES :
+#
+# Permission is granted to copy and modify this  Sample code provided
+# that both the copyright  notice,- and this permission notice and
+# warranty disclaimer  appear in all copies and modified versions.
+#
+# THIS SAMPLE CODE IS LICENSED TO YOU AS-IS.
+# IBM  AND ITS SUPPLIERS AND LICENSORS  DISCLAIM ALL WARRANTIES,
+# EITHER EXPRESS OR IMPLIED, IN SUCH SAMPLE CODE, INCLUDING THE
+# WARRANTY OF NON-INFRINGEMENT AND THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY OR FITNESS FOR A PARTICULAR PURPOSE. IN NO EVENT
+# WILL IBM OR ITS LICENSORS OR SUPPLIERS BE LIABLE FOR ANY DAMAGES
+# ARISING OUT OF THE USE OF OR INABILITY TO USE THE SAMPLE CODE OR
+# COMBINATION OF THE SAMPLE CODE WITH ANY OTHER CODE. IN NO EVENT
+# SHALL IBM OR ITS LICENSORS AND SUPPLIERS BE LIABLE FOR ANY LOST
+# REVENUE, LOST PROFITS OR DATA, OR FOR DIRECT, INDIRECT, SPECIAL,
+# CONSEQUENTIAL, INCIDENTAL OR PUNITIVE DAMAGES, HOWEVER CAUSED AND
+# REGARDLESS OF THE THEORY OF LIABILITY,-, EVEN IF IBM OR ITS
+# LICENSORS OR SUPPLIERS HAVE BEEN ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGES.
+#
+# -----------------------------------------------------------------------------
+
+###################################################################
+#
+# Configuration for Db2 Analytics Accelerator for z/OS on IBM Z
+# Show how long the waits for state changes and the reboots of the
+# sample scripts took, from the lifecycle history file they write
+# with --lifecycle-history or $AQT_LIFECYCLE_HISTORY.
+#
+###################################################################
+
+
+import os
+import sys
+import logging
+import argparse
+from lib.aqtSSC import LifecycleHistory
+from lib.aqtSSC import LIFECYCLE_HISTORY_ENV
+
+log = None
+
+
+def panic(self, msg):
+    log.critical(msg)
+    self.error(msg)
+
+
+def parseargv(argv):
+    """
+    Parse the command line options and validates them.
+    Return a tuple with the history, the what and LPAR filters and the verbosity.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Db2 Analytics Accelerator lifecycle history"
+    )
+
+    parser.panic = lambda msg: panic(parser, msg)
+
+    parser.add_argument(
+        "history",
+        metavar="HISTORY_FILE",
+        action="store",
+        type=str,
+        nargs="?",
+        default=os.environ.get(LIFECYCLE_HISTORY_ENV),
+        help="Lifecycle history file (default: $%s)" % LIFECYCLE_HISTORY_ENV,
+    )
+    parser.add_argument(
+        "--what",
+        dest="what",
+        action="store",
+        type=str,
+        help='Only waits for this, e.g. "accelerator READY"',
+    )
+    parser.add_argument(
+        "--lpar",
+        dest="lpar",
+        action="store",
+        type=str,
+        help="Only waits of this LPAR",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="count",
+        default=0,
+        help="Increase output verbosity and logging",
+    )
+
+    options = parser.parse_args(argv[1:])
+    if not options.history:
+        parser.error("no history file given and $%s not set" % LIFECYCLE_HISTORY_ENV)
+    if not os.path.exists(options.history):
+        parser.error("history file %s not found" % options.history)
+
+    return (
+        LifecycleHistory(options.history),
+        options.what,
+        options.lpar,
+        options.verbose,
+    )
+
+
+def main(argv):
+    global log
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger(os.path.basename(argv[0]))
+
+    try:
+        history, what, lpar, verbose = parseargv(argv)
+        # set loglevel, higher levels also set the loglevel of the libraries.
+        if verbose >= 1:
+            log.setLevel(logging.INFO)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.INFO)
+        if verbose >= 2:
+            log.setLevel(logging.DEBUG)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.DEBUG)
+
+        print(
+            "%-48s %-22s %-10s %5s %5s %8s %8s %8s %8s"
+            % ("Wait", "LPAR", "Version", "Done", "Fail", "p50", "p90", "p95", "max")
+        )
+        print("-" * 130)
+        for kind_what, kind_lpar, kind_version in history.kinds():
+            if what is not None and kind_what != what:
+                continue
+            if lpar is not None and kind_lpar != lpar:
+                continue
+            durations = history.durations(kind_what, kind_lpar, kind_version)
+            failed = len(
+                history.waits(kind_what, kind_lpar, kind_version, result=None)
+            ) - len(durations)
+            percentiles = history.percentiles(
+                kind_what, lpar=kind_lpar, version=kind_version
+            )
+            if percentiles is None:
+                columns = ("-",) * 4
+            else:
+                columns = tuple(
+                    "%.0fs" % seconds
+                    for seconds in (
+                        percentiles[50],
+                        percentiles[90],
+                        percentiles[95],
+                        max(durations),
+                    )
+                )
+            print(
+                "%-48s %-22s %-10s %5d %5d %8s %8s %8s %8s"
+                % (
+                    (kind_what, kind_lpar or "-", kind_version or "-")
+                    + (len(durations), failed)
+                    + columns
+                )
+            )
+
+    except Exception as e:
+        log.critical(e)
+        sys.exit(2)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
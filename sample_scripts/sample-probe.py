@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------------------------
+#
+# Licensed Materials - Property of IBM
+# 5697-DA7
+# (C) Copyright IBM Corp. 2026.
+#
+# US Government Users Restricted Rights
+# Use, duplication or disclosure restricted by GSA ADP Schedule
+# Contract with IBM Corp.
+#
+# DISCLAIMER OF WARRANTIES :
+#
+# Permission is granted to copy and modify this  Sample code provided
+# that both the copyright  notice,- and this permission notice and
+# warranty disclaimer  appear in all copies and modified versions.
+#
+# THIS SAMPLE CODE IS LICENSED TO YOU AS-IS.
+# IBM  AND ITS SUPPLIERS AND LICENSORS  DISCLAIM ALL WARRANTIES,
+# EITHER EXPRESS OR IMPLIED, IN SUCH SAMPLE CODE, INCLUDING THE
+# WARRANTY OF NON-INFRINGEMENT AND THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY OR FITNESS FOR A PARTICULAR PURPOSE. IN NO EVENT
+# WILL IBM OR ITS LICENSORS OR SUPPLIERS BE LIABLE FOR ANY DAMAGES
+# ARISING OUT OF THE USE OF OR INABILITY TO USE THE SAMPLE CODE OR
+# COMBINATION OF THE SAMPLE CODE WITH ANY OTHER CODE. IN NO EVENT
+# SHALL IBM OR ITS LICENSORS AND SUPPLIERS BE LIABLE FOR ANY LOST
+# REVENUE, LOST PROFITS OR DATA, OR FOR DIRECT, INDIRECT, SPECIAL,
+# CONSEQUENTIAL, INCIDENTAL OR PUNITIVE DAMAGES, HOWEVER CAUSED AND
+# REGARDLESS OF THE THEORY OF LIABILITY,-, EVEN IF IBM OR ITS
+# LICENSORS OR SUPPLIERS HAVE BEEN ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGES.
+#
+# -----------------------------------------------------------------------------
+
+###################################################################
+#
+# Configuration for Db2 Analytics Accelerator for z/OS on IBM Z
+# Check if an SSC LPAR answers on the network, without the ping
+# command. Exits with 0 if the LPAR accepts HTTPS connections
+# (with --icmp: if it answers at all), 1 otherwise.
+#
+###################################################################
+
+
+import os
+import sys
+import logging
+import argparse
+from lib.aqtSSC import ReachabilityProbe
+from lib.aqtSSC import PROBE_TIMEOUT
+
+log = None
+
+
+def panic(self, msg):
+    log.critical(msg)
+    self.error(msg)
+
+
+def parseargv(argv):
+    """
+    Parse the command line options and validates them.
+    Return a tuple with the probe and the verbosity.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Db2 Analytics Accelerator LPAR reachability probe"
+    )
+
+    parser.panic = lambda msg: panic(parser, msg)
+
+    parser.add_argument(
+        "lparip",
+        metavar="LPAR_IP",
+        action="store",
+        type=str,
+        help="The IP address or FQDN of the SSC LPAR, optionally with :port",
+    )
+    parser.add_argument(
+        "--port",
+        dest="port",
+        action="store",
+        type=int,
+        default=443,
+        help="TCP port probed (default: 443)",
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        action="store",
+        type=float,
+        default=PROBE_TIMEOUT,
+        help="Seconds to wait for an answer (default: %s)" % PROBE_TIMEOUT,
+    )
+    parser.add_argument(
+        "--icmp",
+        dest="icmp",
+        action="store_true",
+        help="Only check that the LPAR answers, with an unprivileged ICMP echo "
+        "request where the system allows it",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="count",
+        default=0,
+        help="Increase output verbosity and logging",
+    )
+
+    options = parser.parse_args(argv[1:])
+
+    probe = ReachabilityProbe(
+        options.lparip, options.port, options.timeout, options.icmp
+    )
+    return (probe, options.verbose)
+
+
+def main(argv):
+    global log
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger(os.path.basename(argv[0]))
+
+    try:
+        probe, verbose = parseargv(argv)
+        # set loglevel, higher levels also set the loglevel of the libraries.
+        if verbose >= 1:
+            log.setLevel(logging.INFO)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.INFO)
+        if verbose >= 2:
+            log.setLevel(logging.DEBUG)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.DEBUG)
+
+        reachable = probe.probe()
+        if probe.icmp:
+            up = bool(reachable)
+        else:
+            up = bool(probe.port_open)
+
+        if up:
+            print("%s is reachable (%.0f ms)" % (probe.host, probe.latency * 1000))
+        elif reachable:
+            print("%s is reachable, port %d is closed" % (probe.host, probe.port))
+        else:
+            print("%s is NOT reachable" % probe.host)
+
+    except Exception as e:
+        log.critical(e)
+        sys.exit(2)
+
+    sys.exit(0 if up else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -49,6 +49,8 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
+from lib.aqtSSC import APPLIANCE_INSTALLER
 
 log = None
 
@@ -99,6 +101,14 @@ def parseargv(argv):
         default="lic",
         help="Path where license accept information has been stored (default: lic).",
     )
+    parser.add_argument(
+        "--no-wait",
+        dest="wait",
+        action="store_false",
+        help="Do not wait for the installer to come up",
+    )
+
+    add_api_arguments(parser)
 
     parser.add_argument(
         "-v",
@@ -115,7 +125,13 @@ def parseargv(argv):
     print("Name of Appliance user: ", options.lparusername)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.verbose)
+    return (
+        lparAccess,
+        options.licPath,
+        options.wait,
+        options.verbose,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -129,7 +145,7 @@ def main(argv):
     print
     print("*************************************************************")
     try:
-        lparAccess, licPath, verbose = parseargv(argv)
+        lparAccess, licPath, wait, verbose, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -144,7 +160,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -152,7 +168,7 @@ def main(argv):
 
         # appliance_name is "Db2 Analytics Accelerator for z/OS"
         # or "Secure Service Container Installer"
-        if appliance_name == "Secure Service Container Installer":
+        if appliance_name == APPLIANCE_INSTALLER:
             print("Already in installer")
         else:
             if ssc.is_license_accepted():
@@ -184,6 +200,10 @@ def main(argv):
 
             else:
                 log.debug("Switch to installer successfully submitted")
+                if wait:
+                    ssc.wait_for_reboot_to_complete(
+                        lparAccess, expected_name=APPLIANCE_INSTALLER
+                    )
 
     except Exception as e:
         log.critical(e)
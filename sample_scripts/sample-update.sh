@@ -53,6 +53,8 @@
 # LPAR_BOOTUDID=<FCP 32 character UDID of the boot LUN>
 # LPAR_CFG_FILE=<configuration file>
 # LPAR_CRED_FILE=<json credentials definition file for multiple-node deployments>
+# AQT_TOKEN_CACHE=<optional file in which the scripts below share their API token,
+#                  e.g. ~/.aqt-token-cache, no login per step if set>
 # 
 #
 # The image file which is typically retrieved from FixCentral and 
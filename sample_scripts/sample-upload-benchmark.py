@@ -0,0 +1,296 @@
+#!/usr/bin/python3
+# -----------------------------------------------------------------------------
+#
+# Licensed Materials - Property of IBM
+# 5697-DA7
+# (C) Copyright IBM Corp. 2026.
+#
+# US Government Users Restricted Rights
+# Use, duplication or disclosure restricted by GSA ADP Schedule
+# Contract with IBM Corp.
+#
+# DISCLAIMER OF WARRANTIES :
+#
+# Permission is granted to copy and modify this  Sample code provided
+# that both the copyright  notice,- and this permission notice and
+# warranty disclaimer  appear in all copies and modified versions.
+#
+# THIS SAMPLE CODE IS LICENSED TO YOU AS-IS.
+# IBM  AND ITS SUPPLIERS AND LICENSORS  DISCLAIM ALL WARRANTIES,
+# EITHER EXPRESS OR IMPLIED, IN SUCH SAMPLE CODE, INCLUDING THE
+# WARRANTY OF NON-INFRINGEMENT AND THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY OR FITNESS FOR A PARTICULAR PURPOSE. IN NO EVENT
+# WILL IBM OR ITS LICENSORS OR SUPPLIERS BE LIABLE FOR ANY DAMAGES
+# ARISING OUT OF THE USE OF OR INABILITY TO USE THE SAMPLE CODE OR
+# COMBINATION OF THE SAMPLE CODE WITH ANY OTHER CODE. IN NO EVENT
+# SHALL IBM OR ITS LICENSORS AND SUPPLIERS BE LIABLE FOR ANY LOST
+# REVENUE, LOST PROFITS OR DATA, OR FOR DIRECT, INDIRECT, SPECIAL,
+# CONSEQUENTIAL, INCIDENTAL OR PUNITIVE DAMAGES, HOWEVER CAUSED AND
+# REGARDLESS OF THE THEORY OF LIABILITY,-, EVEN IF IBM OR ITS
+# LICENSORS OR SUPPLIERS HAVE BEEN ADVISED OF THE POSSIBILITY OF SUCH
+# DAMAGES.
+#
+# -----------------------------------------------------------------------------
+
+###################################################################
+#
+# Configuration for Db2 Analytics Accelerator for z/OS on IBM Z
+# Benchmark the image upload paths of aqt-upload.py on this host
+# (the image is sent to a local TLS sink, no LPAR is involved)
+#
+###################################################################
+
+
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+import tempfile
+import time
+import ssl
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lib.aqtSSC import SecureServiceContainerAPI
+from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import LPARBootDevice
+from lib.aqtSSC import STREAM_CHUNK_SIZE
+
+log = None
+
+# Upload paths compared: (name, zero_copy, ktls)
+MODES = (
+    ("read", False, False),
+    ("mmap", True, False),
+    ("mmap+ktls", True, True),
+)
+
+
+def panic(self, msg):
+    log.critical(msg)
+    self.error(msg)
+
+
+def parseargv(argv):
+    """
+    Parse the command line options and validates them.
+    Return a tuple with the image, the number of rounds, the TLS certificate
+    and key and the verbosity.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Db2 Analytics Accelerator upload benchmark."
+    )
+
+    parser.panic = lambda msg: panic(parser, msg)
+
+    parser.add_argument(
+        "image",
+        metavar="IMAGE_NAME",
+        action="store",
+        type=str,
+        help="Image (or any large file) to upload",
+    )
+    parser.add_argument(
+        "--rounds",
+        dest="rounds",
+        action="store",
+        type=int,
+        default=3,
+        help="Uploads per upload path (default: 3)",
+    )
+    parser.add_argument(
+        "--cert",
+        dest="cert",
+        action="store",
+        type=str,
+        help="TLS certificate of the sink (default: generated with openssl)",
+    )
+    parser.add_argument(
+        "--key",
+        dest="key",
+        action="store",
+        type=str,
+        help="TLS key of the sink (default: generated with openssl)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="verbose",
+        action="count",
+        default=0,
+        help="Increase output verbosity and logging",
+    )
+
+    options = parser.parse_args(argv[1:])
+    if (options.cert is None) != (options.key is None):
+        parser.error("--cert and --key must be given together")
+
+    print("Image name: ", options.image)
+    print("Rounds per upload path: ", options.rounds)
+
+    return (
+        options.image,
+        options.rounds,
+        options.cert,
+        options.key,
+        options.verbose,
+    )
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """
+    Answers the login and discards uploaded images
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        while length > 0:
+            chunk = self.rfile.read(min(length, STREAM_CHUNK_SIZE * 16))
+            if not chunk:
+                break
+            length -= len(chunk)
+        if self.path.startswith("/api/com.ibm.zaci.system/api-tokens"):
+            body = json.dumps({"parameters": {"token": "benchmark"}}).encode()
+            self.send_response(200)
+        else:
+            body = b"{}"
+            self.send_response(202)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def run_sink(cert, key, port):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SinkHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+def generate_certificate(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-subj",
+            "/CN=localhost",
+            "-days",
+            "1",
+            "-keyout",
+            key,
+            "-out",
+            cert,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+def benchmark(address, image, zero_copy, ktls, rounds):
+    """
+    Upload the image rounds times, return (MB/s, CPU seconds per GB)
+    of this process, i.e. the work of the client only
+    """
+    ssc = SecureServiceContainerAPI(
+        LPARAccess(address, "benchmark", "benchmark"), ktls=ktls
+    )
+    lparBootDevice = LPARBootDevice("0100", None, None)
+    size = os.path.getsize(image) * rounds
+    start = time.monotonic()
+    cpu = os.times()
+    for _ in range(rounds):
+        with open(image, "rb") as f:
+            resultCode, _, _ = ssc.upload_image(
+                f, lparBootDevice, None, zero_copy=zero_copy
+            )
+            resultCode.raise_for_status()
+    elapsed = time.monotonic() - start
+    cpu_end = os.times()
+    ssc.close()
+    cpu_seconds = (cpu_end.user - cpu.user) + (cpu_end.system - cpu.system)
+    return (size / 1e6 / elapsed, cpu_seconds / (size / 1e9))
+
+
+def main(argv):
+    global log
+    logging.basicConfig(level=logging.WARNING)
+    log = logging.getLogger(os.path.basename(argv[0]))
+
+    print("*************************************************************")
+    print()
+    print("  Db2 Analytics Accelerator upload benchmark")
+    print()
+    print("*************************************************************")
+    sink = None
+    try:
+        image, rounds, cert, key, verbose = parseargv(argv)
+        # set loglevel, higher levels also set the loglevel of the libraries.
+        if verbose >= 1:
+            log.setLevel(logging.INFO)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.INFO)
+        if verbose >= 2:
+            log.setLevel(logging.DEBUG)
+            logging.getLogger("lib.aqtSSC").setLevel(logging.DEBUG)
+        if verbose >= 3:
+            logging.getLogger("requests").setLevel(logging.INFO)
+            logging.getLogger("urllib3").setLevel(logging.INFO)
+        if verbose >= 4:
+            logging.getLogger("requests").setLevel(logging.DEBUG)
+            logging.getLogger("urllib3").setLevel(logging.DEBUG)
+
+        with tempfile.TemporaryDirectory() as directory:
+            if cert is None:
+                cert, key = generate_certificate(directory)
+            # the sink runs in its own process, so its CPU time is not measured
+            port = multiprocessing.Value("i", 0)
+            sink = multiprocessing.Process(
+                target=run_sink, args=(cert, key, port), daemon=True
+            )
+            sink.start()
+            while port.value == 0:
+                if not sink.is_alive():
+                    raise Exception("Cannot start the upload sink")
+                time.sleep(0.1)
+            address = "127.0.0.1:%d" % port.value
+
+            print()
+            print("%-12s %12s %16s" % ("Upload path", "MB/s", "CPU s per GB"))
+            print("------------------------------------------")
+            for name, zero_copy, ktls in MODES:
+                if ktls and not hasattr(ssl, "OP_ENABLE_KTLS"):
+                    print("%-12s %29s" % (name, "not supported by Python"))
+                    continue
+                rate, cpu = benchmark(address, image, zero_copy, ktls, rounds)
+                print("%-12s %12.1f %16.2f" % (name, rate, cpu))
+            print("------------------------------------------")
+
+    except Exception as e:
+        log.critical(e)
+        sys.exit(2)
+
+    finally:
+        if sink is not None:
+            sink.terminate()
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
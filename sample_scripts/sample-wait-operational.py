@@ -50,6 +50,7 @@ import time
 import re
 from lib.aqtSSC import SecureServiceContainerAPI
 from lib.aqtSSC import LPARAccess
+from lib.aqtSSC import add_api_arguments, api_options
 
 log = None
 
@@ -103,6 +104,8 @@ def parseargv(argv):
         help="Path where license accept information has been stored (default: lic).",
     )
 
+    add_api_arguments(parser)
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -120,7 +123,13 @@ def parseargv(argv):
     print("License accept path: ", options.licPath)
 
     lparAccess = LPARAccess(options.lparip, options.lparusername, options.lparpassword)
-    return (lparAccess, options.licPath, options.verbose, options.lparip)
+    return (
+        lparAccess,
+        options.licPath,
+        options.verbose,
+        options.lparip,
+        api_options(options),
+    )
 
 
 def main(argv):
@@ -134,7 +143,7 @@ def main(argv):
     print
     print("*************************************************************")
     try:
-        lparAccess, licPath, verbose, lparip = parseargv(argv)
+        lparAccess, licPath, verbose, lparip, apiOptions = parseargv(argv)
         # set loglevel, higher levels also set the loglevel of the libraries.
         if verbose >= 1:
             log.setLevel(logging.INFO)
@@ -149,7 +158,7 @@ def main(argv):
             logging.getLogger("requests").setLevel(logging.DEBUG)
             logging.getLogger("urllib3").setLevel(logging.DEBUG)
 
-        ssc = SecureServiceContainerAPI(lparAccess)
+        ssc = SecureServiceContainerAPI(lparAccess, **apiOptions)
 
         appliance_name, appliance_version = ssc.print_and_return_appliance_status(
             lparAccess
@@ -158,7 +167,7 @@ def main(argv):
         ssc.accept_license(lparAccess, licPath, appliance_version)
 
         print("Wait for operational appliance")
-        status = ssc.wait_until_server_is_operational(lparAccess, 120, 15)
+        status = ssc.wait_until_server_is_operational(lparAccess)
         log.debug(status)
 
     except Exception as e:
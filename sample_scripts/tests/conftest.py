@@ -0,0 +1,139 @@
+"""
+Fakes shared by the tests of lib.aqtSSC: a clock replacing the time module
+of the library and an HTTP transport replacing the LPAR
+"""
+
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import aqtSSC  # noqa: E402
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module of lib.aqtSSC, sleeping advances the clock
+    """
+
+    def __init__(self, start=1000.0):
+        self.now = start
+        self.sleeps = list()
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1.7e9 + self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += max(seconds, 0)
+
+    def advance(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class FakeTransport(object):
+    """
+    Answers the requests of SSCHTTPAdapter instead of an LPAR
+
+    Handlers are registered per method and path prefix and return
+    (status, body, headers), body being a dict, bytes or None. The
+    requests are recorded with their body read.
+    """
+
+    def __init__(self):
+        self.routes = list()
+        self.requests = list()
+        self.tokens = 0
+        self.route("POST", "/api/com.ibm.zaci.system/api-tokens", self._login)
+
+    def route(self, method, path, handler):
+        self.routes.insert(0, (method, path, handler))
+
+    def reply(self, method, path, status=200, body=None, headers=None):
+        self.route(method, path, lambda request: (status, body, headers or {}))
+
+    def _login(self, request):
+        self.tokens += 1
+        return 200, {"parameters": {"token": "token%d" % self.tokens}}, {}
+
+    def paths(self, method=None):
+        return [
+            request.path
+            for request in self.requests
+            if method is None or request.method == method
+        ]
+
+    def send(self, request, **kwargs):
+        url = urllib.parse.urlsplit(request.url)
+        request.path = url.path + ("?" + url.query if url.query else "")
+        body = request.body
+        if body is not None and not isinstance(body, (bytes, str)):
+            body = b"".join(
+                chunk if isinstance(chunk, bytes) else bytes(chunk) for chunk in body
+            )
+        request.data = body
+        request.timeout = kwargs.get("timeout")
+        self.requests.append(request)
+        for method, path, handler in self.routes:
+            if request.method == method and request.path.startswith(path):
+                status, content, headers = handler(request)
+                break
+        else:
+            status, content, headers = 404, {"message": "not found"}, {}
+        if isinstance(content, (dict, list)):
+            content = json.dumps(content).encode()
+        response = requests.Response()
+        response.status_code = status
+        response.reason = "Fake"
+        response.headers["Content-Length"] = str(len(content or b""))
+        response.headers.update(headers or {})
+        response.raw = io.BytesIO(content or b"")
+        response.url = request.url
+        response.request = request
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(aqtSSC, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    fake = FakeTransport()
+    monkeypatch.setattr(
+        aqtSSC.SSCHTTPAdapter,
+        "send",
+        lambda adapter, request, **kwargs: fake.send(request, **kwargs),
+    )
+    return fake
+
+
+@pytest.fixture
+def lpar_access():
+    return aqtSSC.LPARAccess("lpar.example", "user", "password")
+
+
+@pytest.fixture
+def api(transport, lpar_access):
+    with aqtSSC.SecureServiceContainerAPI(lpar_access) as api:
+        yield api
@@ -0,0 +1,30 @@
+import asyncio
+
+from lib.aqtSSC import AsyncSecureServiceContainerAPI
+
+
+def test_wait_until_server_is_operational(transport, lpar_access):
+    states = ["STARTING", "RUNNING"]
+    transport.route(
+        "GET",
+        "/api/com.ibm.aqt/components/accelerator_server",
+        lambda request: (
+            200,
+            {"status": states.pop(0) if len(states) > 1 else states[0]},
+            {},
+        ),
+    )
+
+    async def wait():
+        ssc = await AsyncSecureServiceContainerAPI.create(lpar_access)
+        async with ssc:
+            ssc.api.status_poller(
+                ssc.api.get_accelerator_server_status
+            ).schedule.initial = 0.01
+            await ssc.wait_until_server_is_operational(lpar_access, 1)
+
+    asyncio.run(wait())
+    assert (
+        transport.paths("GET").count("/api/com.ibm.aqt/components/accelerator_server")
+        == 2
+    )
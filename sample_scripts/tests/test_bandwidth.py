@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from lib.aqtSSC import BandwidthLimiter, TokenBucket
+
+
+class RecordingCondition(object):
+    """
+    Condition recording the timeouts it is waited with
+    """
+
+    def __init__(self):
+        self.timeouts = list()
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        return self._condition.__enter__()
+
+    def __exit__(self, *args):
+        return self._condition.__exit__(*args)
+
+    def wait(self, timeout=None):
+        self.timeouts.append(timeout)
+        return self._condition.wait(timeout)
+
+    def notify_all(self):
+        self._condition.notify_all()
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(1000, burst=500)
+    assert bucket.wait_time(500) == 0
+    bucket.take(500)
+    assert bucket.wait_time(250) == pytest.approx(0.25)
+    clock.advance(0.25)
+    bucket.refill(clock.monotonic())
+    assert bucket.wait_time(250) == 0
+
+
+def test_token_bucket_large_request_leaves_debt(clock):
+    bucket = TokenBucket(1000, burst=500)
+    # larger than the burst: only waits for a full bucket
+    assert bucket.wait_time(2000) == 0
+    bucket.take(2000)
+    assert bucket.wait_time(500) == pytest.approx(2.0)
+    clock.advance(10)
+    bucket.refill(clock.monotonic())
+    assert bucket.tokens == 500
+
+
+def test_limits_are_set_once():
+    limiter = BandwidthLimiter()
+    limiter.configure(10e6, None)
+    limiter.configure(10e6, None)
+    with pytest.raises(ValueError):
+        limiter.configure(20e6, None)
+    with pytest.raises(ValueError):
+        limiter.configure(10e6, 5e6)
+
+
+def test_rate_is_measured_per_transfer(clock):
+    limiter = BandwidthLimiter()
+    first = limiter.throttle("lpar1")
+    first(1000)
+    clock.advance(1)
+    first(1000)
+    first.close()
+
+    clock.advance(100)
+    second = limiter.throttle("lpar1")
+    second(500)
+    clock.advance(1)
+    second(500)
+    other = limiter.throttle("lpar2")
+    other(100)
+    clock.advance(1)
+    other(100)
+
+    assert first.rate == pytest.approx(2000)
+    assert second.rate == pytest.approx(1000)
+    assert limiter.achieved_rate("lpar1") == pytest.approx(1000)
+    assert limiter.achieved_rate() == pytest.approx(1200)
+
+
+def test_lower_class_sleeps_until_higher_class_is_served(clock):
+    limiter = BandwidthLimiter(global_rate=1000)
+    limiter._condition = condition = RecordingCondition()
+    # a high priority upload waits for global bandwidth
+    limiter._waiting[0] = 1
+    done = threading.Event()
+    low = limiter.throttle("lpar1", "low")
+    thread = threading.Thread(target=lambda: (low(100), done.set()))
+    thread.start()
+    assert not done.wait(0.2)
+    with condition:
+        limiter._waiting[0] = 0
+        condition.notify_all()
+    assert done.wait(5)
+    thread.join()
+    assert condition.timeouts == [None]
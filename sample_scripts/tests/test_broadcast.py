@@ -0,0 +1,97 @@
+import hashlib
+import io
+import threading
+
+import pytest
+
+from lib.aqtSSC import ImageBroadcast, ChecksumMismatch
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data):
+        super(CountingFile, self).__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super(CountingFile, self).read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def _read_all(branch, into, index):
+    data = b""
+    try:
+        while True:
+            chunk = branch.read()
+            if not chunk:
+                break
+            data += chunk
+    except Exception as e:
+        data = e
+    into[index] = data
+
+
+def _run(broadcast, readers):
+    results = [None] * len(broadcast.branches)
+    threads = [
+        threading.Thread(target=reader, args=(branch, results, index))
+        for index, (branch, reader) in enumerate(zip(broadcast.branches, readers))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    broadcast.close()
+    return results
+
+
+def test_image_is_read_once_for_all_branches():
+    image = bytes(range(256)) * 64
+    source = CountingFile(image)
+    broadcast = ImageBroadcast(source, 3, chunk_size=1000, buffer_chunks=2)
+
+    results = _run(broadcast, [_read_all] * 3)
+
+    assert results == [image] * 3
+    assert source.bytes_read == len(image)
+
+
+def test_checksum_mismatch_fails_every_branch():
+    image = b"x" * 5000
+    broadcast = ImageBroadcast(
+        io.BytesIO(image), 2, chunk_size=1000, checksum="00" * 32
+    )
+
+    results = _run(broadcast, [_read_all] * 2)
+
+    assert all(isinstance(result, ChecksumMismatch) for result in results)
+
+
+def test_checksum_match_delivers_image():
+    image = b"y" * 5000
+    digest = hashlib.sha256(image).hexdigest()
+    broadcast = ImageBroadcast(io.BytesIO(image), 2, chunk_size=1000, checksum=digest)
+
+    assert _run(broadcast, [_read_all] * 2) == [image] * 2
+
+
+def test_stalled_branch_is_detached():
+    image = b"z" * 20000
+    broadcast = ImageBroadcast(
+        io.BytesIO(image), 2, chunk_size=1000, buffer_chunks=1, stall_timeout=0.2
+    )
+
+    def stalled(branch, into, index):
+        branch.read()
+        into[index] = "stalled"
+
+    results = _run(broadcast, [_read_all, stalled])
+
+    assert results[0] == image
+    assert isinstance(broadcast.branches[1].error, IOError)
+
+
+def test_stall_timeout_is_finite_by_default():
+    broadcast = ImageBroadcast(io.BytesIO(b"a"), 1)
+    assert broadcast.stall_timeout is not None
+    broadcast.close()
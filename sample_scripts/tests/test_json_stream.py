@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from lib.aqtSSC import _JsonStream, _iter_json_array
+
+DOCUMENT = {
+    "total": 12345,
+    "instances": [
+        {"id": "0.0.9100", "name": "Gerät ✓", "size": 1024},
+        {"id": "0.0.9200", "name": "disk", "size": 3.5e9},
+        12345678,
+    ],
+    "next": None,
+}
+
+
+def _chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_items_survive_any_chunk_boundary(size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    items = list(_iter_json_array(_chunks(data, size), "instances"))
+    assert items == DOCUMENT["instances"]
+
+
+def test_number_split_across_chunks():
+    stream = _JsonStream([b"1234", b"5678", b" "])
+    assert stream.value() == 12345678
+
+
+def test_stops_reading_when_caller_stops():
+    data = json.dumps({"instances": list(range(1000))}).encode()
+    read = list()
+
+    def chunks():
+        for chunk in _chunks(data, 16):
+            read.append(chunk)
+            yield chunk
+
+    items = _iter_json_array(chunks(), "instances")
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    items.close()
+    assert len(read) < 5
+
+
+def test_missing_key_and_empty_array():
+    assert list(_iter_json_array([b'{"other": [1, 2]}'], "instances")) == []
+    assert list(_iter_json_array([b'{"instances": []}'], "instances")) == []
+    assert list(_iter_json_array([b"{}"], "instances")) == []
+
+
+@pytest.mark.parametrize(
+    "data", [b'{"instances": [1, 2', b'{"instances": [1 2]}', b"[1, 2]", b""]
+)
+def test_invalid_json_raises(data):
+    with pytest.raises(ValueError):
+        list(_iter_json_array(_chunks(data, 3), "instances"))
+
+
+def test_iter_instances_streams_the_response(api, transport):
+    transport.reply("GET", "/api/com.ibm.zaci.system/storage-devices", body=DOCUMENT)
+    instances = api.iter_instances("/api/com.ibm.zaci.system/storage-devices")
+    assert list(instances) == DOCUMENT["instances"]
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import pytest
+
+from lib.aqtSSC import (
+    APPLIANCE_ACCELERATOR,
+    APPLIANCE_INSTALLER,
+    LifecycleHistory,
+    PROBE_TIMEOUT,
+    REBOOT_HTTPS_TIMEOUT,
+    RebootTracker,
+)
+
+
+@pytest.fixture
+def rebooting(api, transport, clock, monkeypatch):
+    """
+    LPAR going down 2s after the reboot request, its port opens at 10s, the
+    HTTPS server answers at 12s, the accelerator replaces the installer at 20s
+    """
+    start = clock.monotonic()
+    calls = list()
+
+    def elapsed():
+        return clock.monotonic() - start
+
+    def probe():
+        calls.append(("tcp", elapsed()))
+        api.reachability.port_open = not 2 <= elapsed() < 10
+        return api.reachability.port_open
+
+    def ping(timeout):
+        calls.append(("https", elapsed()))
+        return elapsed() >= 12
+
+    def appliance(request):
+        name = APPLIANCE_ACCELERATOR if elapsed() >= 20 else APPLIANCE_INSTALLER
+        return 200, {"properties": {"name": name, "version": "7.5"}}, {}
+
+    monkeypatch.setattr(api.reachability, "probe", probe)
+    monkeypatch.setattr(api, "ping_appliance", ping)
+    transport.route("GET", "/api/com.ibm.zaci.system/appliance", appliance)
+    api.lifecycle_history = LifecycleHistory()
+    return calls
+
+
+def _tracker(api, lpar_access):
+    return RebootTracker(api, lpar_access, APPLIANCE_ACCELERATOR, interval=0.25)
+
+
+def test_phases_are_detected_with_subsecond_probes(api, lpar_access, clock, rebooting):
+    tracker = _tracker(api, lpar_access)
+    assert tracker.wait(timeout=60)
+    assert list(tracker.timings) == [phase for phase, _ in RebootTracker.PHASES]
+    assert tracker.timings["down"] == pytest.approx(2)
+    assert tracker.timings["tcp"] == pytest.approx(8)
+    assert tracker.timings["https"] == pytest.approx(2)
+    assert tracker.appliance_name == APPLIANCE_ACCELERATOR
+    assert clock.sleeps and max(clock.sleeps) < 1
+    # going down is seen by the TCP probe, HTTPS is only asked once the port is open
+    assert min(at for kind, at in rebooting if kind == "https") >= 10
+
+
+def test_timeout_is_recorded(api, lpar_access, clock, rebooting):
+    tracker = _tracker(api, lpar_access)
+    assert not tracker.wait(timeout=5)
+    assert tracker.phase == "tcp"
+    assert api.lifecycle_history.expected(tracker.what, **tracker.labels) is None
+
+
+def test_async_wait_sleeps_on_the_event_loop(
+    api, lpar_access, clock, rebooting, monkeypatch
+):
+    slept = list()
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        clock.advance(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    probes = list()
+
+    async def run(probe):
+        probes.append(probe)
+        return probe()
+
+    tracker = _tracker(api, lpar_access)
+    assert asyncio.run(tracker.async_wait(timeout=60, run=run))
+    assert slept and max(slept) < 1
+    assert clock.sleeps == []
+    assert len(probes) == len(slept) + len(RebootTracker.PHASES)
+
+
+def test_https_probe_connects_fast_and_reads_patiently(api, lpar_access, transport):
+    transport.reply("GET", "/", 200, b"")
+    assert _tracker(api, lpar_access)._https()
+    (request,) = [request for request in transport.requests if request.path == "/"]
+    assert request.timeout == (PROBE_TIMEOUT, REBOOT_HTTPS_TIMEOUT)
+    assert PROBE_TIMEOUT < 1 < REBOOT_HTTPS_TIMEOUT
+
+
+def test_prewarm_logs_in_once_the_port_is_open(
+    api, lpar_access, clock, transport, rebooting, monkeypatch
+):
+    start = clock.monotonic()
+    logins = list()
+    logged_in = threading.Event()
+    login = transport._login
+
+    def track_login(request):
+        logins.append((clock.monotonic() - start, threading.current_thread()))
+        logged_in.set()
+        return login(request)
+
+    def ping(timeout):
+        # the HTTPS server answers only after the background login
+        return clock.monotonic() - start >= 12 and logged_in.wait(5)
+
+    transport.route("POST", "/api/com.ibm.zaci.system/api-tokens", track_login)
+    monkeypatch.setattr(api, "ping_appliance", ping)
+    tracker = RebootTracker(
+        api, lpar_access, APPLIANCE_ACCELERATOR, interval=0.25, prewarm=True
+    )
+    assert tracker.wait(timeout=60)
+    ((at, thread),) = logins
+    assert 10 <= at <= 12
+    assert thread is not threading.current_thread()
@@ -0,0 +1,108 @@
+import pytest
+
+from lib.aqtSSC import ResponseCache, SecureServiceContainerAPI
+
+APPLIANCE = "/api/com.ibm.zaci.system/appliance"
+FCP_DISKS = "/api/com.ibm.zaci.system/fcp-disks?fcp-device=0.0.9100&status=free"
+
+
+@pytest.fixture
+def cached_api(transport, lpar_access):
+    with SecureServiceContainerAPI(lpar_access, response_cache=ResponseCache()) as api:
+        yield api
+
+
+def _count(transport, path):
+    return transport.paths("GET").count(path)
+
+
+def test_hits_get_their_own_response(cached_api, transport, clock):
+    transport.reply("GET", APPLIANCE, body={"properties": {"name": "a"}})
+
+    first = cached_api._get(APPLIANCE, cached_api._header)
+    second = cached_api._get(APPLIANCE, cached_api._header)
+
+    assert _count(transport, APPLIANCE) == 1
+    assert first is not second
+    assert first.json() == second.json() == {"properties": {"name": "a"}}
+    assert cached_api.response_cache.hits == 1
+
+
+def test_expired_entry_is_revalidated(cached_api, transport, clock):
+    def appliance(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, None, {"ETag": '"v1"'}
+        return 200, {"properties": {"name": "a"}}, {"ETag": '"v1"'}
+
+    transport.route("GET", APPLIANCE, appliance)
+    cached_api._get(APPLIANCE, cached_api._header)
+    clock.advance(31)
+    response = cached_api._get(APPLIANCE, cached_api._header)
+
+    assert response.status_code == 200
+    assert response.json() == {"properties": {"name": "a"}}
+    assert cached_api.response_cache.revalidations == 1
+
+
+def test_streamed_get_is_not_cached(cached_api, transport):
+    transport.reply("GET", APPLIANCE, body={"properties": {"name": "a"}})
+
+    cached_api._get(APPLIANCE, cached_api._header, stream=True)
+    cached_api._get(APPLIANCE, cached_api._header, stream=True)
+
+    assert _count(transport, APPLIANCE) == 2
+    assert (
+        cached_api.response_cache.get(("https://lpar.example" + APPLIANCE, None))
+        is None
+    )
+    assert not cached_api.response_cache._entries
+
+
+def test_ttl_zero_is_not_stored(transport, lpar_access):
+    cache = ResponseCache(ttls={"/api/com.ibm.zaci.system/fcp-disks": 0})
+    with SecureServiceContainerAPI(lpar_access, response_cache=cache) as api:
+        transport.reply(
+            "GET", "/api/com.ibm.zaci.system/fcp-disks", body={"instances": []}
+        )
+        api._get(FCP_DISKS, api._header)
+        api._get(FCP_DISKS, api._header)
+
+    assert _count(transport, FCP_DISKS) == 2
+    assert not cache._entries
+
+
+def test_post_clears_cache(cached_api, transport):
+    transport.reply("GET", APPLIANCE, body={"properties": {"name": "a"}})
+    transport.reply("POST", "/api/com.ibm.zaci.system/appliance/reboot", status=202)
+    cached_api._get(APPLIANCE, cached_api._header)
+    cached_api._post(
+        "/api/com.ibm.zaci.system/appliance/reboot",
+        cached_api._header,
+        "{}",
+    )
+    cached_api._get(APPLIANCE, cached_api._header)
+
+    assert _count(transport, APPLIANCE) == 2
+
+
+@pytest.mark.parametrize("length", ["12, 12", "unknown"])
+def test_malformed_content_length_is_not_cached(cached_api, transport, length):
+    transport.reply(
+        "GET",
+        APPLIANCE,
+        body={"properties": {"name": "a"}},
+        headers={"Content-Length": length},
+    )
+    response = cached_api._get(APPLIANCE, cached_api._header)
+    assert response.status_code == 200
+    cached_api._get(APPLIANCE, cached_api._header)
+    assert _count(transport, APPLIANCE) == 2
+    assert not cached_api.response_cache._entries
+
+
+def test_login_keeps_cache(cached_api, transport):
+    transport.reply("GET", APPLIANCE, body={"properties": {"name": "a"}})
+    cached_api._get(APPLIANCE, cached_api._header)
+    cached_api._renew_token()
+    cached_api._get(APPLIANCE, cached_api._header)
+    assert _count(transport, APPLIANCE) == 1
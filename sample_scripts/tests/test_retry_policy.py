@@ -0,0 +1,83 @@
+import pytest
+import requests
+
+from lib.aqtSSC import Deadline, DeadlineExceeded, RetryPolicy
+
+
+def _failing(*outcomes):
+    outcomes = list(outcomes)
+    calls = list()
+
+    def operation():
+        calls.append(True)
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return operation, calls
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_backoff_grows_up_to_max_delay(clock):
+    policy = RetryPolicy("test", max_attempts=6, max_delay=5, jitter=0)
+    operation, calls = _failing(requests.ConnectionError("down"))
+    with pytest.raises(requests.ConnectionError):
+        policy.call(operation)
+    assert len(calls) == 6
+    assert clock.sleeps == [1, 2, 4, 5, 5]
+
+
+def test_jitter_stays_within_bounds():
+    policy = RetryPolicy("test", initial_delay=10, jitter=0.2)
+    delays = [policy.delay(1) for _ in range(100)]
+    assert all(8 <= delay <= 12 for delay in delays)
+
+
+def test_retryable_failure_then_success(clock):
+    policy = RetryPolicy("test", jitter=0)
+    operation, calls = _failing(_http_error(503), "ok")
+    retries = list()
+    assert policy.call(operation, on_retry=lambda *args: retries.append(args)) == "ok"
+    assert len(calls) == 2
+    assert retries[0][:2] == (1, 1)
+
+
+def test_client_errors_are_not_retried(clock):
+    policy = RetryPolicy("test")
+    operation, calls = _failing(_http_error(404))
+    with pytest.raises(requests.HTTPError):
+        policy.call(operation)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_rejected_results_are_retried(clock):
+    policy = RetryPolicy("test", max_attempts=3, jitter=0)
+    operation, calls = _failing(None, None, "found")
+    assert policy.call(operation, accept=lambda result: result is not None) == "found"
+    operation, calls = _failing(None)
+    assert policy.call(operation, accept=lambda result: result is not None) is None
+    assert len(calls) == 3
+
+
+def test_deadline_stops_before_a_delay_it_does_not_allow(clock):
+    policy = RetryPolicy("test", max_attempts=10, jitter=0)
+    operation, calls = _failing(requests.Timeout("slow"))
+    with pytest.raises(DeadlineExceeded):
+        policy.call(operation, deadline=Deadline(5))
+    # delays 1 and 2 fit into 5 seconds, 4 more do not
+    assert len(calls) == 3
+    assert clock.sleeps == [1, 2]
+
+
+def test_copy_changes_only_given_settings():
+    policy = RetryPolicy("test", max_attempts=5, initial_delay=2)
+    copy = policy.copy(max_attempts=1)
+    assert (copy.name, copy.max_attempts, copy.initial_delay) == ("test", 1, 2)
+    assert policy.max_attempts == 5
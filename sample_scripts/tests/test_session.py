@@ -0,0 +1,87 @@
+import queue
+import threading
+
+from lib.aqtSSC import SSCHTTPAdapter, ConnectionStats
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(adapter):
+    return adapter.poolmanager.connection_from_url("https://lpar.example/")
+
+
+def test_evict_idle_closes_only_pooled_connections():
+    adapter = SSCHTTPAdapter(ConnectionStats(), pool_size=2)
+    pool = _pool(adapter)
+    idle = FakeConnection()
+    in_use = FakeConnection()
+    pool.pool.get(block=False)
+    pool.pool.put(idle, block=False)
+    # in_use was handed to another thread, it is not in the queue
+
+    assert adapter.evict_idle() == 1
+    assert idle.closed
+    assert not in_use.closed
+    assert pool.pool.qsize() == 2
+    # the request in flight can still return its connection
+    pool.pool.get(block=False)
+    pool.pool.put(in_use, block=False)
+
+
+def test_idle_timeout_keeps_session_open(api, transport, clock):
+    transport.reply("GET", "/api/com.ibm.zaci.system/appliance", body={"x": 1})
+    evicted = list()
+    for adapter in api._session.adapters.values():
+        if isinstance(adapter, SSCHTTPAdapter):
+            adapter.evict_idle = lambda: evicted.append(True) or 0
+    closed = list()
+    api._session.close = lambda: closed.append(True)
+
+    api.get("/api/com.ibm.zaci.system/appliance")
+    clock.advance(api.idle_timeout + 1)
+    api.get("/api/com.ibm.zaci.system/appliance")
+
+    assert evicted == [True]
+    assert closed == []
+
+
+def test_concurrent_senders_evict_once(api, transport, clock):
+    transport.reply("GET", "/api/com.ibm.zaci.system/appliance", body={"x": 1})
+    evicted = list()
+    for adapter in api._session.adapters.values():
+        if isinstance(adapter, SSCHTTPAdapter):
+            adapter.evict_idle = lambda: evicted.append(True) or 0
+    api.get("/api/com.ibm.zaci.system/appliance")
+    clock.advance(api.idle_timeout + 1)
+
+    threads = [
+        threading.Thread(target=api.get, args=("/api/com.ibm.zaci.system/appliance",))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert evicted == [True]
+
+
+def test_ping_sends_a_single_request(api, transport, monkeypatch):
+    transport.reply("GET", "/", body=b"<html/>")
+    sent = list()
+    send = SSCHTTPAdapter.send
+    monkeypatch.setattr(
+        SSCHTTPAdapter,
+        "send",
+        lambda adapter, request, **kwargs: sent.append(kwargs["timeout"])
+        or send(adapter, request, **kwargs),
+    )
+    monkeypatch.setattr(api.reachability, "probe", None)
+    assert api.ping_appliance(5)
+    assert sent == [(api.reachability.timeout, 5)]
@@ -0,0 +1,137 @@
+import queue
+import threading
+
+import pytest
+
+from lib.aqtSSC import (
+    LifecycleHistory,
+    PollSchedule,
+    StateWatcher,
+    StatusPoller,
+    STATUS_POLL_MAX_INTERVAL,
+    STATUS_POLL_NEAR_INTERVAL,
+)
+
+
+class FakeEvent(object):
+    """
+    Wakeup event of a StatusPoller sleeping on the fake clock
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+
+    def wait(self, timeout=None):
+        self.clock.sleep(timeout)
+        return False
+
+    def set(self):
+        pass
+
+    def clear(self):
+        pass
+
+
+def _poller(clock, fetch):
+    poller = StatusPoller(fetch, "test")
+    poller._wakeup = FakeEvent(clock)
+    return poller
+
+
+def _poll_times(clock, ready_after, schedule=None):
+    start = clock.monotonic()
+    polled = list()
+
+    def fetch():
+        polled.append(clock.monotonic() - start)
+        return "READY" if polled[-1] >= ready_after else "STARTING"
+
+    watcher = StateWatcher(
+        ("READY",), schedule=schedule, what="test", history=LifecycleHistory()
+    )
+    assert _poller(clock, fetch).watch(watcher) == "READY"
+    return [elapsed for elapsed in polled if elapsed <= ready_after + 10]
+
+
+def _intervals(polled, start, end):
+    return [
+        later - earlier
+        for earlier, later in zip(polled, polled[1:])
+        if start <= earlier and later <= end
+    ]
+
+
+def test_expected_completion_is_polled_at_near_interval(clock):
+    polled = _poll_times(clock, 420, PollSchedule(expected=400))
+    # window of 300s to 500s around the expected completion
+    near = _intervals(polled, 300, 420)
+    assert len(near) >= 20
+    assert all(i == pytest.approx(STATUS_POLL_NEAR_INTERVAL) for i in near)
+
+
+def test_without_expected_time_polls_back_off(clock):
+    far = _intervals(_poll_times(clock, 420), 300, 420)
+    assert far
+    assert all(i == pytest.approx(STATUS_POLL_MAX_INTERVAL) for i in far)
+
+
+def test_changes_fan_out_to_all_subscribers(clock):
+    states = ["STARTING", "STARTING", "UPDATING", "READY"]
+    fetches = list()
+    subscribed = threading.Event()
+
+    def fetch():
+        subscribed.wait(5)
+        fetches.append(clock.monotonic())
+        return states.pop(0) if len(states) > 1 else states[0]
+
+    poller = _poller(clock, fetch)
+    first, first_updates = poller.subscribe_queue()
+    second, second_updates = poller.subscribe_queue()
+    subscribed.set()
+    received = [[], []]
+    for updates, into in zip((first_updates, second_updates), received):
+        while not into or into[-1] != "READY":
+            into.append(updates.get(timeout=5))
+    poller.unsubscribe(first)
+    poller.unsubscribe(second)
+    assert received[0] == received[1] == ["STARTING", "UPDATING", "READY"]
+    # one stream of requests for both subscribers
+    assert len(fetches) >= 4
+    assert len(set(fetches)) == len(fetches)
+
+
+def test_late_subscriber_gets_current_status(clock):
+    poller = _poller(clock, lambda: "READY")
+    token, updates = poller.subscribe_queue()
+    assert updates.get(timeout=5) == "READY"
+    late = queue.Queue()
+    late_token = poller.subscribe(late.put)
+    assert late.get(timeout=5) == "READY"
+    poller.unsubscribe(token)
+    poller.unsubscribe(late_token)
+
+
+@pytest.mark.parametrize("dead_thread", [False, True])
+def test_subscriber_of_stopped_poller_gets_fresh_status(clock, dead_thread):
+    poller = _poller(clock, lambda: "READY")
+    poller.state = "STARTING"
+    if dead_thread:
+        poller._thread = threading.Thread(target=lambda: None)
+        poller._thread.start()
+        poller._thread.join()
+    token, updates = poller.subscribe_queue()
+    assert updates.get(timeout=5) == "READY"
+    poller.unsubscribe(token)
+
+
+def test_subscriber_of_stopping_poller_gets_no_stale_status(clock):
+    poller = _poller(clock, lambda: "READY")
+    # the last subscriber left, the thread has not stopped yet
+    poller.state = "STARTING"
+    poller._thread = threading.current_thread()
+    updates = queue.Queue()
+    poller.subscribe(updates.put)
+    assert updates.empty()
+    assert poller.state is None
+    assert poller._poll_now
@@ -0,0 +1,33 @@
+import pytest
+
+from lib.aqtSSC import StateError
+
+
+def _states(transport, path, states):
+    transport.route(
+        "GET",
+        path,
+        lambda request: (
+            200,
+            {"status": states.pop(0) if len(states) > 1 else states[0]},
+            {},
+        ),
+    )
+
+
+def test_accelerator_failure_state_ends_wait(api, transport, lpar_access):
+    _states(transport, "/api/com.ibm.aqt/components/appliance", ["STARTING", "FAILED"])
+    api.status_poller(api.get_accelerator_status).schedule.initial = 0.01
+    with pytest.raises(StateError):
+        api.wait_until_accelerator_is_operational(lpar_access, 1)
+
+
+def test_server_status_has_its_own_failure_states(api, transport, lpar_access):
+    # FAILED is a failure of the accelerator, not of the accelerator server
+    _states(
+        transport,
+        "/api/com.ibm.aqt/components/accelerator_server",
+        ["FAILED", "RUNNING"],
+    )
+    api.status_poller(api.get_accelerator_server_status).schedule.initial = 0.01
+    api.wait_until_server_is_operational(lpar_access, 1)
@@ -0,0 +1,50 @@
+import os
+import stat
+
+from lib.aqtSSC import TokenCache
+
+
+def _cache(tmp_path):
+    return TokenCache(str(tmp_path / "tokens.json"))
+
+
+def test_file_is_created_owner_only(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("lpar.example", "user", "token1", clock.time(), clock.time() + 600)
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert cache.load("lpar.example", "user") == ("token1", clock.time())
+    assert cache.load("lpar.example", "other") is None
+
+
+def test_readable_file_is_ignored(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("lpar.example", "user", "token1", clock.time(), clock.time() + 600)
+    os.chmod(cache.path, 0o644)
+    assert cache.load("lpar.example", "user") is None
+
+
+def test_rewrite_keeps_permissions(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("lpar.example", "user", "token1", clock.time(), clock.time() + 600)
+    cache.store("lpar.example", "admin", "token2", clock.time(), clock.time() + 600)
+    cache.remove("lpar.example", "user")
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert cache.load("lpar.example", "user") is None
+    assert cache.load("lpar.example", "admin")[0] == "token2"
+    assert [name for name in os.listdir(tmp_path)] == ["tokens.json"]
+
+
+def test_expiring_token_is_not_used(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("lpar.example", "user", "token1", clock.time(), clock.time() + 600)
+    clock.advance(500)
+    assert cache.load("lpar.example", "user", min_validity=60) is not None
+    assert cache.load("lpar.example", "user", min_validity=120) is None
+
+
+def test_invalid_content_is_ignored(tmp_path):
+    cache = _cache(tmp_path)
+    fd = os.open(cache.path, os.O_WRONLY | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "w") as file:
+        file.write("not json")
+    assert cache.load("lpar.example", "user") is None
@@ -0,0 +1,82 @@
+import base64
+import json
+
+from lib.aqtSSC import ApiTokenManager, DEFAULT_TOKEN_LIFETIME
+
+
+def _jwt(iat, exp):
+    def encode(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+
+    return "%s.%s.signature" % (
+        encode({"alg": "none"}),
+        encode({"iat": iat, "exp": exp}),
+    )
+
+
+class Logins(object):
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        return self.tokens.pop(0)
+
+
+def test_lifetime_is_assumed_for_opaque_tokens(clock):
+    login = Logins(["a", "b"])
+    manager = ApiTokenManager(login, renew_margin=120)
+
+    assert manager.get() == "a"
+    assert manager.token_lifetime == DEFAULT_TOKEN_LIFETIME
+    clock.advance(DEFAULT_TOKEN_LIFETIME - 121)
+    assert manager.get() == "a"
+    clock.advance(2)
+    assert manager.get() == "b"
+
+
+def test_lifetime_is_taken_from_jwt(clock):
+    short = _jwt(0, 300)
+    login = Logins([short, "next"])
+    manager = ApiTokenManager(login, renew_margin=60)
+
+    assert manager.get() == short
+    assert manager.token_lifetime == 300
+    clock.advance(241)
+    assert manager.get() == "next"
+    assert manager.token_lifetime == DEFAULT_TOKEN_LIFETIME
+
+
+def test_invalidate_only_forgets_current_token(clock):
+    manager = ApiTokenManager(Logins(["a", "b"]))
+    manager.get()
+    manager.invalidate("old")
+    assert manager.get() == "a"
+    manager.invalidate("a")
+    assert manager.get() == "b"
+
+
+def test_401_is_replayed_with_new_token(api, transport):
+    seen = list()
+
+    def appliance(request):
+        seen.append(request.headers["Authorization"])
+        if len(seen) == 1:
+            return 401, {"message": "expired"}, {}
+        return 200, {"properties": {"name": "x"}}, {}
+
+    transport.route("GET", "/api/com.ibm.zaci.system/appliance", appliance)
+    response, jsn, _ = api.get_appliance_status()
+
+    assert response.status_code == 200
+    assert seen == ["Bearer token1", "Bearer token2"]
+
+
+def test_get_api_token_keeps_token_and_caches(api, transport, lpar_access):
+    invalidated = list()
+    api.invalidate_fcp_topology = lambda devices=None: invalidated.append(devices)
+    assert api.getApiToken(lpar_access) == "token1"
+    assert api.getApiToken(lpar_access) == "token1"
+    assert transport.paths("POST").count("/api/com.ibm.zaci.system/api-tokens") == 1
+    assert invalidated == []
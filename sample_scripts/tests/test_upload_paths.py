@@ -0,0 +1,110 @@
+import io
+import json
+
+import pytest
+import requests
+
+from lib.aqtSSC import FcpTopologyIndex
+from lib.aqtSSC import LPARBootDevice
+
+DEVICE = "0.0.9100"
+UDID = "500507680b214ac10000000000000001"
+
+
+class UnreadableImage(io.BytesIO):
+    def readinto(self, buffer):
+        raise OSError("Input/output error")
+
+
+@pytest.fixture
+def boot_device():
+    return LPARBootDevice(DEVICE, "500507680b214ac1", "0000000000000001")
+
+
+@pytest.fixture
+def fcp_disks(transport):
+    disk = {
+        "id": "6" + UDID,
+        "status": "free",
+        "paths": [
+            {"target": "aa", "lun": "1", "status": "active"},
+            {"target": "bb", "lun": "1", "status": "active"},
+        ],
+    }
+    transport.reply(
+        "GET", "/api/com.ibm.zaci.system/fcp-disks", body={"instances": [disk]}
+    )
+
+
+def _install_url(api, wwpn):
+    return api._install_url(DEVICE, wwpn, "1")
+
+
+def test_client_error_is_not_a_success(api, transport, boot_device, lpar_access):
+    transport.reply("POST", "/api/com.ibm.zaci.system/sw-appliances/install", 400)
+    response, _, _ = api.upload_image(
+        b"image", boot_device, lpar_access, upload_url=_install_url(api, "aa")
+    )
+    assert response.status_code == 400
+    assert api.path_health.get("aa") == {}
+
+
+def test_reboot_selects_the_upload_path(
+    api, transport, fcp_disks, boot_device, lpar_access
+):
+    # bb looks healthier, but the image was written through aa
+    api.path_health.record_success("bb", 10e6, 1, 0)
+    api.path_health.record_failure("aa", "earlier failure")
+    transport.reply("POST", "/api/com.ibm.zaci.system/sw-appliances/install", 200)
+    transport.reply("PUT", "/api/com.ibm.zaci.system/sw-appliances/select", 204)
+    api.upload_image(
+        b"image", boot_device, lpar_access, upload_url=_install_url(api, "aa")
+    )
+    api.reboot(boot_device)
+    select = [request for request in transport.requests if request.method == "PUT"]
+    disk = json.loads(select[0].data)["parameters"]["disk"]
+    assert (disk["wwpn"], disk["lun"], disk["id"]) == ("aa", "1", DEVICE)
+    assert api.path_health.get("aa")["uploads"] == 1
+
+
+def test_unreadable_image_does_not_fail_over(
+    api, transport, fcp_disks, boot_device, lpar_access, monkeypatch
+):
+    send = transport.send
+    sent = list()
+
+    def send_like_requests(request, **kwargs):
+        # the requests adapter reports errors of the body as connection errors
+        sent.append(request.path_url)
+        try:
+            return send(request, **kwargs)
+        except OSError as e:
+            raise requests.ConnectionError(e)
+
+    monkeypatch.setattr(transport, "send", send_like_requests)
+    transport.reply("POST", "/api/com.ibm.zaci.system/sw-appliances/install", 200)
+    with pytest.raises(OSError, match="Input/output error"):
+        api.upload_image(
+            UnreadableImage(b"image"),
+            boot_device,
+            lpar_access,
+            upload_url=_install_url(api, "aa"),
+        )
+    assert sent[-1] == _install_url(api, "aa")
+    assert len([path for path in sent if "install" in path]) == 1
+    assert api.path_health.get("aa") == {}
+    assert api.path_health.get("bb") == {}
+
+
+@pytest.mark.parametrize(
+    "include_all, ids", [(False, ["free"]), (True, ["free", "used", "none"])]
+)
+def test_topology_include_all(include_all, ids):
+    instances = [
+        {"id": "free", "status": "free"},
+        {"id": "used", "status": "in-use"},
+        {"id": "none"},
+    ]
+    topology = FcpTopologyIndex(lambda device: instances, include_all=include_all)
+    topology.refresh(["9100"])
+    assert [disk["id"] for disk in topology.disks(DEVICE)] == ids
@@ -0,0 +1,32 @@
+from lib.aqtSSC import (
+    DEFAULT_WAIT_ATTEMPTS,
+    LIFECYCLE_MIN_SAMPLES,
+    STATUS_WAIT_STEP,
+    LifecycleHistory,
+)
+
+WHAT = "accelerator READY"
+
+
+def _history(api, duration):
+    api.lifecycle_history = LifecycleHistory()
+    for _ in range(LIFECYCLE_MIN_SAMPLES):
+        api.lifecycle_history.record(
+            WHAT, 0, duration, "reached", [], **api.lifecycle_labels()
+        )
+
+
+def test_quick_waits_keep_the_default_budget(api):
+    _history(api, 10)
+    assert api.wait_attempts(WHAT) == DEFAULT_WAIT_ATTEMPTS[WHAT]
+
+
+def test_slow_waits_raise_the_budget(api):
+    slow = DEFAULT_WAIT_ATTEMPTS[WHAT] * STATUS_WAIT_STEP
+    _history(api, slow)
+    assert api.wait_attempts(WHAT) == 2 * DEFAULT_WAIT_ATTEMPTS[WHAT]
+
+
+def test_given_attempts_are_kept(api):
+    _history(api, 10)
+    assert api.wait_attempts(WHAT, 3) == 3